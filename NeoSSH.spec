@@ -10,7 +10,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=data_files,
-    hiddenimports=[],
+    hiddenimports=['zstandard', 'lz4.frame'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,93 @@
+# bench_sftp_pipeline.py
+"""
+Throughput of sftp.put / sftp.get against PipelinedSFTP over a loopback link
+with added latency.
+
+    python bench/bench_sftp_pipeline.py [--size-mb 32] [--rtt-ms 0,20,50,100]
+
+Each RTT gets its own local paramiko server (bench/ssh_server.py) that
+delays every packet it sends. Rows:
+
+- sftp.put / sftp.get on a default open_sftp() session (2 MB channel window)
+- PipelinedSFTP with the old defaults, 64 x 32K, on the same session
+- PipelinedSFTP with the shipped defaults on a transfer session opened with
+  the default sftp_channel_window, whatever the local config holds
+"""
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+import paramiko
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import ssh_server  # noqa: E402
+from tools.setting_config import SCM  # noqa: E402
+from tools.sftp_pipeline import PipelinedSFTP  # noqa: E402
+
+
+def timed(size, func):
+    start = time.perf_counter()
+    func()
+    return size / (time.perf_counter() - start) / 1e6
+
+
+def run_rtt(rtt, src, workdir):
+    size = os.path.getsize(src)
+    client = ssh_server.connect(ssh_server.serve(delay=rtt))
+    try:
+        plain = client.open_sftp()
+        defaults = SCM().default_config
+        window = defaults["sftp_pipeline_window"]
+        chunk = defaults["sftp_pipeline_chunk_size"]
+        channel = defaults["sftp_channel_window"]
+        transfer = paramiko.SFTPClient.from_transport(
+            client.get_transport(), window_size=channel)
+        engines = [
+            ("sftp.put / sftp.get", plain.put, plain.get),
+            ("pipelined 64 x 32K, 2 MB win",
+             *_pipelined(PipelinedSFTP(plain, window=64, chunk_size=32768))),
+            (f"pipelined {window} x {chunk // 1024}K, {channel // 1048576} MB win",
+             *_pipelined(PipelinedSFTP(transfer, window=window, chunk_size=chunk))),
+        ]
+        rows = []
+        for index, (label, upload, download) in enumerate(engines):
+            remote = os.path.join(workdir, f"remote{index}.bin")
+            local = os.path.join(workdir, f"local{index}.bin")
+            up = timed(size, lambda: upload(src, remote))
+            down = timed(size, lambda: download(remote, local))
+            if not filecmp.cmp(src, local, shallow=False):
+                raise RuntimeError(f"{label}: downloaded copy differs")
+            rows.append((label, up, down))
+        return rows
+    finally:
+        client.close()
+
+
+def _pipelined(engine):
+    return engine.upload, engine.download
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--rtt-ms", default="0,20,50,100",
+                        help="comma-separated added round-trip times")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        src = os.path.join(workdir, "src.bin")
+        with open(src, "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        print(f"{args.size_mb} MB file, MB/s")
+        print(f"  {'RTT':>6}  {'engine':32s} {'up':>6} {'down':>6}")
+        for rtt_ms in (int(x) for x in args.rtt_ms.split(",")):
+            for i, (label, up, down) in enumerate(run_rtt(rtt_ms / 1000, src, workdir)):
+                rtt = f"{rtt_ms} ms" if i == 0 else ""
+                print(f"  {rtt:>6}  {label:32s} {up:6.1f} {down:6.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
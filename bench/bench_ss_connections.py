@@ -0,0 +1,84 @@
+# bench_ss_connections.py
+"""
+Cost of the connections collector on a host with many sockets.
+
+    python bench/bench_ss_connections.py [--sockets 25000] [--pids 42]
+
+Writes a synthetic `ss -tunpiH` dump (two lines per socket: the socket and
+its tcp_info line), runs the collector's awk aggregation over it locally in
+place of `ss`, and times Monitor._parse_connections on the result.
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.monitor import Monitor  # noqa: E402
+
+SS_COMMAND = "ss -tunpiH 2>/dev/null |"
+
+
+def write_dump(path, sockets, pids, rng):
+    names = ["nginx", "sshd", "python3", "java", "node", "redis-server", "postgres"]
+    owners = [(1000 + i, names[i % len(names)]) for i in range(pids)]
+    with open(path, "w") as f:
+        for i in range(sockets):
+            pid, name = rng.choice(owners)
+            local = f"10.0.{i // 60000 % 256}.1:{1024 + i % 60000}"
+            peer = f"192.168.{rng.randrange(256)}.{rng.randrange(1, 255)}:{rng.randrange(1024, 65535)}"
+            f.write(f"tcp   ESTAB 0      0      {local:<22} {peer:<22} "
+                    f'users:(("{name}",pid={pid},fd={i % 1000 + 3}))\n')
+            sent = rng.randrange(10 ** 9)
+            f.write(f"\t cubic wscale:7,7 rto:204 rtt:0.5/0.25 mss:1448 cwnd:10 "
+                    f"bytes_sent:{sent} bytes_acked:{sent} bytes_received:{rng.randrange(10 ** 9)} "
+                    f"segs_out:{rng.randrange(10 ** 6)} segs_in:{rng.randrange(10 ** 6)} "
+                    f"send 231.7Mbps lastsnd:120 lastrcv:120 lastack:120 pacing_rate 463.4Mbps\n")
+
+
+def best_of(runs, func):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=25000)
+    parser.add_argument("--pids", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    script = Monitor._connections_script()
+    if SS_COMMAND not in script:
+        raise SystemExit("connections script no longer starts with " + SS_COMMAND)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        dump = os.path.join(workdir, "ss.txt")
+        write_dump(dump, args.sockets, args.pids, random.Random(8))
+        command = script.replace(SS_COMMAND, f"cat '{dump}' |")
+        awk_time, output = best_of(args.runs, lambda: subprocess.run(
+            ["sh", "-c", command], capture_output=True, text=True, check=True).stdout)
+
+    monitor = Monitor.__new__(Monitor)
+    monitor._parse_connections(output, now=1000.0)
+    parse_time, result = best_of(
+        args.runs, lambda: monitor._parse_connections(output, now=1001.0))
+
+    rows = result["connections"]
+    total = sum(c["connections"] for c in rows)
+    print(f"{args.sockets * 2} ss lines, {args.sockets} sockets, {args.pids} pids")
+    print(f"  awk aggregation  {awk_time * 1000:8.1f} ms  ({len(output.splitlines())} pid lines)")
+    print(f"  local parse      {parse_time * 1000:8.2f} ms  (top {len(rows)} pids, {total} sockets)")
+
+
+if __name__ == "__main__":
+    main()
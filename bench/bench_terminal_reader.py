@@ -0,0 +1,175 @@
+# bench_terminal_reader.py
+"""
+Keystroke echo latency, idle cost and bulk throughput of the terminal output
+path, TerminalReader against the 50 ms polling loop it replaced.
+
+    python bench/bench_terminal_reader.py [--keys 60] [--idle 3] [--bulk-mb 8]
+
+Both readers run on the shell channel of a local paramiko server
+(bench/ssh_server.py) that echoes keystrokes like a tty and prints bulk
+output on request. Keystrokes are sent with mixed gaps; an echo that has
+not arrived after STALL_AFTER seconds counts as stalled.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import ssh_server  # noqa: E402
+from tools.terminal_reader import TerminalReader  # noqa: E402
+
+STALL_AFTER = 0.5
+KEY_GAPS = (0.005, 0.02, 0.03, 0.08, 0.2)
+
+
+class PolledReader(threading.Thread):
+    """The pre-TerminalReader output path: a 50 ms timer that drains the channel
+    and emits when 8 KB are buffered or 50 ms passed since the last emit."""
+
+    def __init__(self, channel, on_output):
+        super().__init__(daemon=True)
+        self.channel = channel
+        self.on_output = on_output
+        self._output_buffer = b""
+        self._last_emit_time = 0
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        # QTimer 按固定节拍触发，不会在每次处理之后再等满 50 ms
+        tick = time.monotonic()
+        while not self._stopped:
+            tick += 0.05
+            time.sleep(max(0.0, tick - time.monotonic()))
+            if self.channel.recv_ready():
+                while self.channel.recv_ready():
+                    self._output_buffer += self.channel.recv(8192)
+                if len(self._output_buffer) >= 8192:
+                    self._flush()
+                elif time.time() - self._last_emit_time >= 0.05:
+                    self._flush()
+            if self.channel.closed:
+                return
+
+    def _flush(self):
+        if self._output_buffer:
+            self.on_output(self._output_buffer)
+            self._output_buffer = b""
+            self._last_emit_time = time.time()
+
+
+class CountingChannel:
+    """Channel proxy counting recv / recv_ready calls, i.e. how often the reader touches it."""
+
+    def __init__(self, channel):
+        self._channel = channel
+        self.calls = 0
+
+    def recv(self, nbytes):
+        self.calls += 1
+        return self._channel.recv(nbytes)
+
+    def recv_ready(self):
+        self.calls += 1
+        return self._channel.recv_ready()
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class Sink:
+    """on_output target counting the bytes and flushes that arrived."""
+
+    def __init__(self):
+        self.received = 0
+        self.flushes = 0
+        self._cond = threading.Condition()
+
+    def __call__(self, data):
+        with self._cond:
+            self.received += len(data)
+            self.flushes += 1
+            self._cond.notify_all()
+
+    def wait_for(self, count, timeout):
+        """Seconds until `count` bytes had arrived, or None on timeout."""
+        start = time.perf_counter()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.received >= count, timeout):
+                return None
+        return time.perf_counter() - start
+
+
+def run(reader_cls, port, args):
+    client = ssh_server.connect(port)
+    channel = client.invoke_shell()
+    counting = CountingChannel(channel)
+    sink = Sink()
+    reader = reader_cls(counting, sink)
+    reader.start()
+    rng = random.Random(21)
+    try:
+        latencies, stalled = [], 0
+        for i in range(args.keys):
+            time.sleep(rng.choice(KEY_GAPS))
+            expected = sink.received + 1
+            channel.send(b"abcdefghijklmnopqrstuvwxyz"[i % 26:i % 26 + 1])
+            elapsed = sink.wait_for(expected, STALL_AFTER)
+            if elapsed is None:
+                stalled += 1
+            else:
+                latencies.append(elapsed * 1000)
+        # 让滞留的回显在空闲统计之前排空
+        channel.send(b" ")
+        sink.wait_for(args.keys + 1, STALL_AFTER)
+
+        calls = counting.calls
+        time.sleep(args.idle)
+        idle_calls = counting.calls - calls
+
+        bulk = args.bulk_mb * 1024 * 1024
+        flushes = sink.flushes
+        expected = sink.received + bulk
+        channel.send(ssh_server.BULK_TRIGGER)
+        elapsed = sink.wait_for(expected, 120)
+        return {
+            "p50": statistics.median(latencies) if latencies else float("nan"),
+            "p95": (statistics.quantiles(latencies, n=20)[-1]
+                    if len(latencies) > 1 else float("nan")),
+            "stalled": stalled,
+            "idle": idle_calls,
+            "bulk": bulk / elapsed / 1e6 if elapsed else 0.0,
+            "flushes": sink.flushes - flushes,
+        }
+    finally:
+        reader.stop()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=60)
+    parser.add_argument("--idle", type=float, default=3.0)
+    parser.add_argument("--bulk-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    port = ssh_server.serve(bulk_size=args.bulk_mb * 1024 * 1024)
+    print(f"{args.keys} keystrokes, {args.idle:g} s idle, {args.bulk_mb} MB of output")
+    print(f"  {'reader':16s} {'echo p50 / p95':>18s} {'stalled':>8s} "
+          f"{'idle polls':>11s} {'bulk':>10s} {'flushes':>8s}")
+    for label, reader_cls in (("50 ms polling", PolledReader), ("TerminalReader", TerminalReader)):
+        r = run(reader_cls, port, args)
+        print(f"  {label:16s} {r['p50']:7.2f} / {r['p95']:6.2f} ms "
+              f"{r['stalled']:>5d}/{args.keys:<2d} {r['idle']:>11d} "
+              f"{r['bulk']:>5.0f} MB/s {r['flushes']:>8d}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
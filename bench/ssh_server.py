@@ -0,0 +1,220 @@
+# ssh_server.py
+"""
+Local paramiko SSH server for the benchmarks in this directory.
+
+It serves SFTP over the real filesystem and an echoing shell, and can delay
+every packet it sends by `delay` seconds to simulate a high-latency link.
+Requests and acks both cross the delayed direction, so the delay is the RTT
+added to every round trip. Any username and password are accepted; bind it
+to loopback only.
+"""
+import os
+import queue
+import socket
+import threading
+import time
+import paramiko
+from paramiko import (AUTH_SUCCESSFUL, OPEN_SUCCEEDED, SFTP_OK, SFTPAttributes,
+                      SFTPHandle, SFTPServer, SFTPServerInterface, ServerInterface)
+
+HOST_KEY = paramiko.RSAKey.generate(2048)
+# 向 shell 发送这个字节时，服务端输出 BULK_SIZE 字节的文本而不是回显
+BULK_TRIGGER = b"\x02"
+BULK_LINE = b"0123456789abcdefghijklmnopqrstuvwxyz" * 3 + b"\r\n"
+
+
+def _errno(e):
+    return SFTPServer.convert_errno(e.errno)
+
+
+class _Handle(SFTPHandle):
+    def stat(self):
+        return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+    def chattr(self, attr):
+        return SFTP_OK
+
+
+class _FileSystem(SFTPServerInterface):
+    def list_folder(self, path):
+        try:
+            return [SFTPAttributes.from_stat(os.lstat(os.path.join(path, name)), name)
+                    for name in os.listdir(path)]
+        except OSError as e:
+            return _errno(e)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return _errno(e)
+
+    def lstat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.lstat(path))
+        except OSError as e:
+            return _errno(e)
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(path, flags, 0o644)
+        except OSError as e:
+            return _errno(e)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _Handle(flags)
+        handle.filename = path
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            return _errno(e)
+        return SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        try:
+            os.replace(oldpath, newpath)
+        except OSError as e:
+            return _errno(e)
+        return SFTP_OK
+
+    posix_rename = rename
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            return _errno(e)
+        return SFTP_OK
+
+    def rmdir(self, path):
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            return _errno(e)
+        return SFTP_OK
+
+    def chattr(self, path, attr):
+        try:
+            if attr._flags & attr.FLAG_PERMISSIONS:
+                os.chmod(path, attr.st_mode)
+            if attr._flags & attr.FLAG_AMTIME:
+                os.utime(path, (attr.st_atime, attr.st_mtime))
+            if attr._flags & attr.FLAG_SIZE:
+                os.truncate(path, attr.st_size)
+        except OSError as e:
+            return _errno(e)
+        return SFTP_OK
+
+    def canonicalize(self, path):
+        return os.path.realpath(path)
+
+
+class _Server(ServerInterface):
+    def __init__(self, bulk_size):
+        self.bulk_size = bulk_size
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self._shell, args=(channel,), daemon=True).start()
+        return True
+
+    def _shell(self, channel):
+        """Echo every keystroke like a tty; BULK_TRIGGER prints bulk_size bytes instead."""
+        lines = BULK_LINE * max(1, 32768 // len(BULK_LINE))
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                break
+            if BULK_TRIGGER not in data:
+                channel.sendall(data)
+                continue
+            left = self.bulk_size
+            while left > 0:
+                chunk = lines[:left]
+                channel.sendall(chunk)
+                left -= len(chunk)
+        channel.close()
+
+
+class _DelayedSocket:
+    """Socket wrapper delivering every send `delay` seconds later, in order."""
+
+    def __init__(self, sock, delay):
+        self.sock = sock
+        self.delay = delay
+        self._queue = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        while True:
+            due, data = self._queue.get()
+            if data is None:
+                return
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                return
+
+    def send(self, data):
+        self._queue.put((time.monotonic() + self.delay, bytes(data)))
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def close(self):
+        self._queue.put((0, None))
+        self.sock.close()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def serve(delay: float = 0.0, bulk_size: int = 8 * 1024 * 1024) -> int:
+    """Start the server on a free loopback port in the background and return the port."""
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+
+    def accept_loop():
+        while True:
+            sock, _ = listener.accept()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(_DelayedSocket(sock, delay) if delay else sock)
+            transport.add_server_key(HOST_KEY)
+            transport.set_subsystem_handler("sftp", SFTPServer, _FileSystem)
+            transport.start_server(server=_Server(bulk_size))
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def connect(port: int) -> paramiko.SSHClient:
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect("127.0.0.1", port, "bench", "bench",
+                   look_for_keys=False, allow_agent=False)
+    return client
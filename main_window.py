@@ -19,6 +19,7 @@ from tools.session_manager import SessionManager
 from tools.logger import setup_global_logging, main_logger
 from tools.ssh import SSHWorker
 from tools.remote_file_manage import RemoteFileManager, FileManagerHandler
+from tools.bandwidth import BandwidthShaper
 from widgets.sync_widget import SycnWidget
 import os
 import shutil
@@ -559,6 +560,9 @@ class Window(FramelessWindow):
                     metrics["load"] = result["load"]
                 if "cpu_percent" in result:
                     metrics["cpu_percent"] = result["cpu_percent"]
+                for key in ("cpu_per_core", "cpu_iowait", "cpu_steal"):
+                    if key in result:
+                        metrics[key] = result[key]
                 if "mem_percent" in result:
                     metrics["ram_percent"] = result["mem_percent"]
                 if "mem_used" in result:
@@ -774,25 +778,52 @@ class Window(FramelessWindow):
         if not session_widget:
             return
 
+        data = self._apply_progress(
+            path, percentage, bytes_so_far, total_bytes, widget_key, transfer_type)
+        if data is not None:
+            session_widget.transfer_progress.update_transfer_item(
+                data["id"], data)
+
+    def _show_progress_frame(self, updates, rate, eta, widget_key):
+        """One coalesced frame from the file manager's ProgressBus."""
+        session_widget = self.session_widgets[widget_key]
+        if not session_widget:
+            return
+
+        items = {}
+        for path, transfer_type, percentage, bytes_so_far, total_bytes, item_rate, item_eta in updates:
+            data = self._apply_progress(
+                path, percentage, bytes_so_far, total_bytes, widget_key, transfer_type)
+            if data is not None:
+                data["rate"] = item_rate
+                data["eta"] = item_eta
+                items[data["id"]] = data
+        session_widget.transfer_progress.update_transfer_items(items)
+        session_widget.transfer_progress.set_throughput(rate, eta)
+
+    def _apply_progress(self, path, percentage, bytes_so_far, total_bytes, widget_key, transfer_type):
+        """Store a progress sample in active_transfers; returns the item data."""
         # 'path' is the unique identifier (local for upload, remote for download)
         if path not in self.active_transfers:
             self._add_transfer_item_if_not_exists(
                 widget_key, path, transfer_type)
 
-        if path in self.active_transfers:
-            file_id = self.active_transfers[path]["id"]
-            data = self.active_transfers[path]
-            data["progress"] = percentage
-            data["bytes_so_far"] = bytes_so_far
-            data["total_bytes"] = total_bytes
-            if percentage >= 100:
-                if data.get("type") == "compression":
-                    data["type"] = "download"
-                    data["progress"] = 0
-                elif data.get("type") == "download":
-                    data["type"] = "completed"
-            session_widget.transfer_progress.update_transfer_item(
-                file_id, data)
+        if path not in self.active_transfers:
+            return None
+        data = self.active_transfers[path]
+        data["progress"] = percentage
+        data["bytes_so_far"] = bytes_so_far
+        data["total_bytes"] = total_bytes
+        if percentage < 0 or percentage >= 100:
+            data.pop("rate", None)
+            data.pop("eta", None)
+        if percentage >= 100:
+            if data.get("type") == "compression":
+                data["type"] = "download"
+                data["progress"] = 0
+            elif data.get("type") == "download":
+                data["type"] = "completed"
+        return data
 
     def update_user_info(self, name, qid, local=True):
         config = configer.read_config()
@@ -978,7 +1009,8 @@ class Window(FramelessWindow):
 
         if file_manager:
             self._handle_upload_request(widget_key=widget_name, local_path=local_path,
-                                        remote_path=remote_path, compression=False, file_manager=file_manager)
+                                        remote_path=remote_path, compression=False, file_manager=file_manager,
+                                        delta=True)
 
     def _start_ssh_connect(self, widget_key):
         mode = config.get("terminal_mode", 0)
@@ -1030,6 +1062,8 @@ class Window(FramelessWindow):
             # processes.key_verification.connect(key_verification)
             worker.sys_resource.connect(
                 lambda usage, key=widget_key: self._set_usage(key, usage))
+            worker.monitor.set_visible(
+                session_widget is self.get_active_ssh_widget() and not self.isMinimized())
 
             file_manager = RemoteFileManager(session)
             handler = FileManagerHandler(
@@ -1062,6 +1096,8 @@ class Window(FramelessWindow):
 
             self.file_tree_object[widget_key] = file_manager
             self.file_tree_object[f"{widget_key}-handler"] = handler
+            session_widget.transfer_progress.set_bandwidth_key(
+                file_manager.bandwidth_key)
 
             # worker.connected.connect(
             #     lambda success, msg: self._on_ssh_connected(success, msg))
@@ -1078,6 +1114,7 @@ class Window(FramelessWindow):
                 mode = configer.read_config().get("terminal_mode", 0)
                 if mode == 1:
                     client = SshClient(channel=worker.channel)
+                    client.bandwidth_key = file_manager.bandwidth_key
                     client.start()
                     child_widget.ssh_widget.set_ssh_thread(client)
 
@@ -1444,6 +1481,19 @@ class Window(FramelessWindow):
             widget.transfer_progress.open_file.connect(
                 self.open_in_explorer
             )
+
+            # 单个传输限速
+            widget.transfer_progress.rateLimitRequested.connect(
+                self._handle_transfer_rate_limit
+            )
+
+            # 暂停 / 恢复排队中的传输
+            widget.transfer_progress.pauseRequested.connect(
+                partial(self._handle_transfer_pause, widget_key=widget_key)
+            )
+            widget.transfer_progress.pauseAllRequested.connect(
+                partial(self._handle_transfer_pause_all, widget_key=widget_key)
+            )
             self.windowResized.connect(widget.on_main_window_resized)
 
         name = session.name
@@ -1598,6 +1648,10 @@ class Window(FramelessWindow):
                              self.tr("Setting"), NavigationItemPosition.BOTTOM)
 
         self.stackWidget.currentChanged.connect(self.onCurrentInterfaceChanged)
+        self.stackWidget.currentChanged.connect(
+            self._update_monitor_visibility)
+        self.ssh_page.sshStack.currentChanged.connect(
+            self._update_monitor_visibility)
         self.stackWidget.setCurrentIndex(1)
         self.onCurrentInterfaceChanged(1)
 
@@ -1765,7 +1819,7 @@ class Window(FramelessWindow):
             if hasattr(self, 'expanderBar'):
                 self.expanderBar.hide()
 
-    def _handle_upload_request(self, widget_key, local_path, remote_path, compression, file_manager):
+    def _handle_upload_request(self, widget_key, local_path, remote_path, compression, file_manager, delta=False):
         """Pre-handles upload requests to determine if UI items should be pre-created."""
         # If compression is on and we have a list, create a single UI item for the batch.
         if compression and isinstance(local_path, list):
@@ -1779,13 +1833,14 @@ class Window(FramelessWindow):
         # Original logic for other cases (single files, non-compressed lists/dirs)
         paths = local_path if isinstance(local_path, list) else [local_path]
         print(f"Paths Len : {len(paths)}")
+        batch_upload = configer.read_config().get("transfer_batch_upload", True)
         for p in paths:
-            # For non-compressed dirs, we don't create items here.
-            # They will be created dynamically on first progress/finished signal.
-            if not (os.path.isdir(p) and not compression):
+            # Non-compressed dirs are one aggregate item in batch mode; otherwise
+            # per-file items are created dynamically on first progress/finished signal.
+            if batch_upload or not (os.path.isdir(p) and not compression):
                 self._add_transfer_item_if_not_exists(
                     widget_key, p, 'upload')
-            file_manager.upload_file(p, remote_path, compression)
+            file_manager.upload_file(p, remote_path, compression, delta=delta)
 
     def _add_transfer_item_if_not_exists(self, widget_key, path, transfer_type, task_id=None, open_it=False):
         """Helper to add a transfer item to the UI if it doesn't exist."""
@@ -1876,6 +1931,61 @@ class Window(FramelessWindow):
             else:
                 subprocess.Popen(["xdg-open", os.path.dirname(filepath)])
 
+    def _offer_interrupted_transfers(self, jobs, widget_key):
+        """Ask whether to resume the transfers an earlier run left unfinished."""
+        file_manager = self.file_tree_object.get(widget_key)
+        if not file_manager:
+            return
+        remaining = sum(max(0, job["total_bytes"] - job["bytes_done"]) for job in jobs)
+        failed = sum(1 for job in jobs if job["state"] == "failed")
+        text = self.tr("{0} transfers of this session did not finish last time ({1:.1f} MB left).").format(
+            len(jobs), remaining / (1024 * 1024))
+        if failed:
+            text += "\n" + self.tr("{0} of them failed.").format(failed)
+        text += "\n\n" + self.tr("Files that already arrived are not sent again.")
+        msg_box = MessageBox(self.tr("Resume transfers?"), text, self)
+        msg_box.yesButton.setText(self.tr("Resume"))
+        msg_box.cancelButton.setText(self.tr("Discard"))
+        if msg_box.exec():
+            file_manager.resume_interrupted(jobs)
+        else:
+            file_manager.discard_interrupted(jobs)
+
+    def _handle_transfer_rate_limit(self, file_id, rate):
+        for identifier, data in self.active_transfers.items():
+            if data.get("id") == file_id:
+                BandwidthShaper().set_task_limit(identifier, rate)
+                break
+
+    def _handle_transfer_pause(self, file_id, pause, widget_key):
+        file_manager = self.file_tree_object.get(widget_key)
+        if not file_manager:
+            return
+        for identifier, data in self.active_transfers.items():
+            if data.get("id") == file_id:
+                if pause:
+                    done = file_manager.pause_transfer(identifier)
+                else:
+                    done = file_manager.resume_transfer(identifier)
+                if done:
+                    self.session_widgets[widget_key].transfer_progress.set_item_paused(
+                        file_id, pause)
+                break
+
+    def _handle_transfer_pause_all(self, pause, widget_key):
+        file_manager = self.file_tree_object.get(widget_key)
+        if not file_manager:
+            return
+        if pause:
+            file_manager.pause_queued_transfers()
+        else:
+            file_manager.resume_queued_transfers()
+        transfer_progress = self.session_widgets[widget_key].transfer_progress
+        for identifier, data in self.active_transfers.items():
+            if "id" in data:
+                transfer_progress.set_item_paused(
+                    data["id"], file_manager.is_transfer_paused(identifier))
+
     def _handle_transfer_cancellation(self, file_id, widget_key):
         # import inspect
         # caller_frame = inspect.stack()[1]
@@ -2098,8 +2208,21 @@ class Window(FramelessWindow):
                 setting_.revise_config("maximized", True)
             else:
                 setting_.revise_config("maximized", False)
+            self._update_monitor_visibility()
         super().changeEvent(event)
 
+    def _update_monitor_visibility(self, *_):
+        """只有当前显示的会话全速监控，其余会话（及最小化时的所有会话）降频"""
+        if not hasattr(self, 'ssh_page'):
+            return
+        active = self.get_active_ssh_widget() if not self.isMinimized() else None
+        # 从 ssh_session 取 worker：两种终端模式下都有，TerminalScreen 没有 bridge
+        for widget_key, widget in list(self.session_widgets.items()):
+            monitor = getattr(self.ssh_session.get(widget_key), 'monitor', None)
+            if monitor is None:
+                continue
+            monitor.set_visible(widget is active)
+
     def get_active_ssh_widget(self):
         if self.stackWidget.currentWidget() == self.ssh_page:
             current_ssh_widget = self.ssh_page.sshStack.currentWidget()
@@ -0,0 +1,111 @@
+# NeoSSH 增量上传辅助脚本，由 DeltaUploader 以 `python3 -c "<本脚本>" <mode> ...` 在远程执行
+#
+#   sig <path> <block>
+#       stdout: >QQ 文件大小、mtime_ns，随后每个块 >I adler32 + 16 字节 md5（最后一块可能不满）
+#   patch <path> <block> <size> <mtime_ns>
+#       stdin: 指令流
+#           C >II  复制旧文件的第 index 块起连续 count 块
+#           L >I   后跟 n 字节新数据
+#           E      后跟 16 字节新文件的 md5，结束
+#       新文件写到同目录的临时文件，校验 md5、保留权限后 rename 覆盖，旧文件在此之前不被修改
+# 出错时向 stderr 输出原因并以非 0 退出。
+import hashlib
+import os
+import struct
+import sys
+import zlib
+
+COPY_CHUNK = 1024 * 1024
+
+
+def fail(msg, code=2):
+    sys.stderr.write(msg + "\n")
+    sys.exit(code)
+
+
+def read_exact(stream, n):
+    data = stream.read(n)
+    if len(data) != n:
+        raise IOError("unexpected end of instruction stream")
+    return data
+
+
+def sig(path, block):
+    out = sys.stdout.buffer
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        fail("cannot stat %s: %s" % (path, e.strerror))
+    out.write(struct.pack(">QQ", st.st_size, st.st_mtime_ns))
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(block)
+            if not data:
+                break
+            out.write(struct.pack(">I", zlib.adler32(data) & 0xffffffff))
+            out.write(hashlib.md5(data).digest())
+    out.flush()
+
+
+def patch(path, block, size, mtime_ns):
+    inp = sys.stdin.buffer
+    st = os.stat(path)
+    if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+        fail("remote file changed since signature")
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, ".%s.neossh-delta" % name)
+    md5 = hashlib.md5()
+    try:
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            while True:
+                op = inp.read(1)
+                if op == b"C":
+                    index, count = struct.unpack(">II", read_exact(inp, 8))
+                    src.seek(index * block)
+                    remaining = count * block
+                    while remaining > 0:
+                        data = src.read(min(COPY_CHUNK, remaining))
+                        if not data:
+                            break
+                        dst.write(data)
+                        md5.update(data)
+                        remaining -= len(data)
+                elif op == b"L":
+                    n = struct.unpack(">I", read_exact(inp, 4))[0]
+                    data = read_exact(inp, n)
+                    dst.write(data)
+                    md5.update(data)
+                elif op == b"E":
+                    expected = read_exact(inp, 16)
+                    break
+                else:
+                    raise IOError("bad instruction %r" % op)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if md5.digest() != expected:
+            raise IOError("checksum mismatch after patch")
+        os.chmod(tmp, st.st_mode & 0o7777)
+        try:
+            os.chown(tmp, st.st_uid, st.st_gid)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except BaseException as e:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        fail("patch failed: %s" % e)
+
+
+def main():
+    mode = sys.argv[1]
+    if mode == "sig":
+        sig(sys.argv[2], int(sys.argv[3]))
+    elif mode == "patch":
+        patch(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5]))
+    else:
+        fail("unknown mode %s" % mode)
+
+
+main()
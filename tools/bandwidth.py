@@ -0,0 +1,163 @@
+# bandwidth.py
+import threading
+import time
+from tools.setting_config import SCM
+
+KB = 1024
+# 节流时的最长单次 sleep，保证取消能及时生效
+MAX_SLEEP = 0.2
+
+
+class TokenBucket:
+    """
+    Token bucket in bytes. `rate` is bytes/s, 0 means unlimited.
+
+    `reserve(n)` always takes the tokens and may leave the bucket in debt, so a
+    chunk bigger than the burst still goes through; the caller sleeps for the
+    returned time and later callers wait the debt off.
+    """
+
+    def __init__(self, rate: int = 0, burst: int = None):
+        self._lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: int, burst: int = None):
+        with self._lock:
+            self.rate = max(0, int(rate or 0))
+            # 默认约 1/4 秒的量，太大的突发会让限速期间的终端依旧卡顿
+            self.burst = burst or max(self.rate // 4, 64 * KB)
+            self.tokens = self.burst
+            self.stamp = time.monotonic()
+
+    def reserve(self, n: int) -> float:
+        """Take `n` tokens, return how many seconds to wait before sending them."""
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthShaper:
+    """
+    Process-wide rate limits for bulk transfers.
+
+    A transfer loop calls `throttle(n)` (see `limiter`) before moving `n`
+    bytes; it waits for the global bucket, the bucket of its session
+    (user@host:port) and its own task bucket. With interactive priority on,
+    keystrokes in a terminal of a session cap that session's transfers at
+    `transfer_interactive_rate_kb` until the terminal has been idle for
+    `interactive_hold` seconds. All limits can be changed while transfers run.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        config = SCM().read_config()
+        self.global_bucket = TokenBucket(
+            int(config.get("transfer_rate_limit_kb", 0)) * KB)
+        self.interactive_priority = config.get(
+            "transfer_interactive_priority", True)
+        self.interactive_rate = int(
+            config.get("transfer_interactive_rate_kb", 256)) * KB
+        self.interactive_hold = 2.0
+        self._sessions = {}
+        self._tasks = {}
+        self._interactive = {}  # session key -> TokenBucket
+        self._last_keystroke = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(user, host, port) -> str:
+        return f"{user}@{host}:{port}"
+
+    # ---------------------------
+    # Limits
+    # ---------------------------
+    def set_global_limit(self, rate: int):
+        self.global_bucket.set_rate(rate)
+
+    def global_limit(self) -> int:
+        return self.global_bucket.rate
+
+    def _bucket(self, table, key):
+        with self._lock:
+            bucket = table.get(key)
+            if bucket is None:
+                bucket = table[key] = TokenBucket()
+            return bucket
+
+    def set_session_limit(self, session: str, rate: int):
+        self._bucket(self._sessions, session).set_rate(rate)
+
+    def session_limit(self, session: str) -> int:
+        bucket = self._sessions.get(session)
+        return bucket.rate if bucket else 0
+
+    def set_task_limit(self, task: str, rate: int):
+        self._bucket(self._tasks, task).set_rate(rate)
+
+    def task_limit(self, task: str) -> int:
+        bucket = self._tasks.get(task)
+        return bucket.rate if bucket else 0
+
+    def forget_task(self, task: str):
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def set_interactive_priority(self, enabled: bool):
+        self.interactive_priority = enabled
+
+    # ---------------------------
+    # Interactive priority
+    # ---------------------------
+    def note_interactive(self, session: str):
+        """Called for terminal input; throttles the session's bulk traffic for a while."""
+        if not self.interactive_priority:
+            return
+        now = time.monotonic()
+        if now - self._last_keystroke.get(session, 0) > self.interactive_hold:
+            # 新的一段交互：从空桶开始，避免之前积攒的突发量
+            self._bucket(self._interactive, session).set_rate(
+                self.interactive_rate, burst=16 * KB)
+        self._last_keystroke[session] = now
+
+    def _interactive_active(self, session) -> bool:
+        return (self.interactive_priority and session is not None and
+                time.monotonic() - self._last_keystroke.get(session, 0) < self.interactive_hold)
+
+    # ---------------------------
+    # Throttling
+    # ---------------------------
+    def throttle(self, n: int, session: str = None, task: str = None, is_stopped=None):
+        """Block until `n` bytes may be sent. Returns early when `is_stopped()` becomes true."""
+        wait = self.global_bucket.reserve(n)
+        if session is not None:
+            bucket = self._sessions.get(session)
+            if bucket:
+                wait = max(wait, bucket.reserve(n))
+            if self._interactive_active(session):
+                wait = max(wait, self._interactive[session].reserve(n))
+        if task is not None:
+            bucket = self._tasks.get(task)
+            if bucket:
+                wait = max(wait, bucket.reserve(n))
+        deadline = time.monotonic() + wait
+        while wait > 0:
+            if is_stopped and is_stopped():
+                return
+            time.sleep(min(wait, MAX_SLEEP))
+            wait = deadline - time.monotonic()
+
+    def limiter(self, session: str = None, task: str = None, is_stopped=None):
+        """A `throttle(n)` callable bound to one transfer, for the transfer loops."""
+        return lambda n: self.throttle(n, session, task, is_stopped)
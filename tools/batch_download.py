@@ -0,0 +1,254 @@
+# batch_download.py
+import os
+import posixpath
+import queue
+import shlex
+import stat
+import threading
+import traceback
+from tools.batch_upload import PooledBatchWorker
+from tools.sftp_pipeline import PipelinedSFTP, copy_mtime_to_local
+
+READ_CHUNK = 64 * 1024
+
+
+class BatchDownloadWorker(PooledBatchWorker):
+    """
+    Downloads a remote directory tree as one transfer.
+
+    The tree is listed by a single remote `find -printf` (type, size, relative
+    path; NUL separated) whose output is parsed while it streams in: local
+    directories are created on the fly and files go into a bounded queue that
+    `sessions` threads drain over pooled SFTP sessions. Downloads start with
+    the first listed file. Since the queue holds the listing back, the totals
+    for progress and ETA come from a second, concurrent `find | awk` count.
+    Remotes without GNU find (busybox, BSD, macOS) are walked over SFTP instead.
+    """
+
+    QUEUE_SIZE = 1024
+
+    def __init__(self, connection, remote_dir, local_base="_ssh_download", identifier=None, pool=None, sessions=None, bandwidth_key=None):
+        """
+        :param remote_dir: remote directory to download
+        :param local_base: the tree lands in <local_base>/<directory name>
+        :param identifier: transfer id used for progress / finished signals
+        :param bandwidth_key: session key for BandwidthShaper limits
+        """
+        self.remote_dir = remote_dir.rstrip("/") or "/"
+        name = posixpath.basename(self.remote_dir) or "/"
+        super().__init__(connection, identifier or remote_dir, name, pool=pool,
+                         sessions=sessions, bandwidth_key=bandwidth_key)
+        self.local_dir = os.path.join(local_base, name.strip("/") or "root")
+        self.totals_known = False
+        self._listed_bytes = 0
+        self._listed_files = 0
+        self._channel = None
+
+    def stop(self):
+        super().stop()
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    # ---------------------------
+    # Run
+    # ---------------------------
+    def _run(self):
+        self.signals.progress.emit(self.identifier, -1, 0, 0)
+        tasks = queue.Queue(self.QUEUE_SIZE)
+        threads = []
+        try:
+            os.makedirs(self.local_dir, exist_ok=True)
+            threads = self._run_sessions(tasks, self.sessions)
+            threading.Thread(target=self._count_totals, daemon=True).start()
+            self._list_into(tasks)
+        except OSError as e:
+            if not self.is_stopped:
+                print(f"❌ Batch download error: {e}")
+                self._errors.append(str(e))
+        except Exception as e:
+            if not self.is_stopped:
+                tb = traceback.format_exc()
+                print(f"❌ Batch download error: {e}\n{tb}")
+                self._errors.append(f"{self.remote_dir}: {e}")
+        finally:
+            with self._lock:
+                # 列表跑完后以实际入队的为准
+                self.total_bytes = self._listed_bytes
+                self.total_files = self._listed_files
+                self.totals_known = True
+            for _ in threads:
+                self._enqueue(tasks, None)
+            for t in threads:
+                t.join()
+        print(f"📦 Batch download {self.remote_dir}: {self.total_files} files, "
+              f"{self.total_bytes} bytes")
+        self._emit_result()
+
+    def _enqueue(self, tasks, item):
+        """
+        Blocking put that gives up once the transfer is cancelled (the session
+        threads then leave on is_stopped and nobody drains the queue).
+        """
+        while True:
+            try:
+                tasks.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                if self.is_stopped:
+                    return False
+
+    def _count_totals(self):
+        """Sum up files and bytes of the tree remotely, ahead of the listing."""
+        # 链接到文件的按目标大小计，与列表一致
+        cmd = (f"find {shlex.quote(self.remote_dir)} -mindepth 1 "
+               "\\( -type l -xtype f -exec stat -L -c '%s' {} + \\) -o -type f -printf '%s\\n' 2>/dev/null"
+               " | awk '{n++; s+=$1} END {printf \"%d %.0f\\n\", n, s}'")
+        conn = None
+        try:
+            conn = self._acquire()
+            _, stdout, _ = conn.exec_command(cmd)
+            files, size = stdout.read().split()
+            if not int(files):
+                # find 失败（如不支持 -printf）时 awk 也输出 0：交给列表累计
+                return
+            with self._lock:
+                if not self.totals_known:
+                    self.total_files = max(int(files), self._listed_files)
+                    self.total_bytes = max(int(float(size)), self._listed_bytes)
+                    self.totals_known = True
+        except Exception as e:
+            # 只影响进度显示，列表结束时总数仍会准确
+            print(f"Cannot count {self.remote_dir}: {e}")
+        finally:
+            self._release(conn)
+
+    def _list_into(self, tasks):
+        """Stream the remote listing into `tasks`."""
+        # %Y：跟随符号链接后的类型，链接到文件的按文件下载；不进入链接的目录。
+        # %s 是链接本身的大小，链接到文件的改由 stat -L 输出目标大小（L 记录，带完整路径）。
+        # mtime 随记录带回，下载后写到本地文件上
+        cmd = (f"find {shlex.quote(self.remote_dir)} -mindepth 1 "
+               "\\( -type l -xtype f -exec stat -L --printf 'L %s %Y %n\\0' {} + \\) "
+               "-o -printf '%Y %s %T@ %P\\0'")
+        conn = self._acquire()
+        try:
+            _, stdout, stderr = conn.exec_command(cmd)
+            self._channel = stdout.channel
+            pending = b""
+            while not self.is_stopped:
+                data = self._channel.recv(READ_CHUNK)
+                if not data:
+                    break
+                records = (pending + data).split(b"\0")
+                pending = records.pop()
+                for record in records:
+                    if not self._handle_record(tasks, record):
+                        return
+            if self.is_stopped:
+                return
+            status = self._channel.recv_exit_status()
+            if status != 0:
+                message = stderr.read().decode(errors="ignore").strip()
+                if not self._listed_files:
+                    # 没有 GNU find（busybox 等）：改用 SFTP 遍历
+                    print(f"find failed for {self.remote_dir} ({message or status}), walking over SFTP")
+                    self._walk_into(tasks, conn)
+                    return
+                # 部分子目录不可读：已列出的照常下载，跳过的路径作为失败报告
+                skipped = message.splitlines() or [f"find exited with status {status}"]
+                print(f"⚠️ Batch download {self.remote_dir}: {len(skipped)} paths skipped")
+                self._errors.extend(skipped)
+        finally:
+            self._channel = None
+            self._release(conn)
+
+    def _walk_into(self, tasks, conn):
+        """
+        Fallback listing over SFTP, breadth first, with the same semantics as
+        the find: links are followed for their type and size, linked
+        directories are created but not entered. Unreadable directories are
+        reported as skipped.
+        """
+        sftp = conn.open_sftp()
+        try:
+            base = self.remote_dir.rstrip("/")
+            pending = [""]
+            while pending and not self.is_stopped:
+                rel_dir = pending.pop(0)
+                try:
+                    entries = sftp.listdir_attr(f"{base}/{rel_dir}" if rel_dir else self.remote_dir)
+                except IOError as e:
+                    self._errors.append(f"{base}/{rel_dir}: {e}")
+                    continue
+                for attr in entries:
+                    rel = f"{rel_dir}/{attr.filename}" if rel_dir else attr.filename
+                    linked = stat.S_ISLNK(attr.st_mode or 0)
+                    if linked:
+                        try:
+                            attr = sftp.stat(f"{base}/{rel}")
+                        except IOError:
+                            continue  # dangling link
+                    if stat.S_ISDIR(attr.st_mode or 0):
+                        self._add_entry(tasks, "d", rel, 0, 0)
+                        if not linked:
+                            pending.append(rel)
+                    elif stat.S_ISREG(attr.st_mode or 0):
+                        if not self._add_entry(tasks, "f", rel, attr.st_size or 0, attr.st_mtime or 0):
+                            return
+        finally:
+            sftp.close()
+
+    def _handle_record(self, tasks, record):
+        try:
+            kind, size, mtime, rel = record.split(b" ", 3)
+            size = int(size)
+            mtime = float(mtime)
+        except ValueError:
+            return True
+        rel = rel.decode("utf-8", errors="surrogateescape")
+        if kind == b"L":
+            # stat -L 的 %n 是 find 给出的完整路径
+            rel = rel[len(self.remote_dir.rstrip("/")) + 1:]
+            kind = b"f"
+        return self._add_entry(tasks, kind.decode(), rel, size, mtime)
+
+    def _add_entry(self, tasks, kind, rel, size, mtime):
+        """Create a listed directory or queue a listed file; False once cancelled."""
+        local_path = os.path.join(self.local_dir, *rel.split("/"))
+        if kind == "d":
+            # find 先列目录再列其中的文件，目录总在文件入队前建好
+            os.makedirs(local_path, exist_ok=True)
+            return True
+        if kind != "f":
+            return True
+        with self._lock:
+            self._listed_bytes += size
+            self._listed_files += 1
+            if not self.totals_known:
+                self.total_bytes, self.total_files = self._listed_bytes, self._listed_files
+        return self._enqueue(tasks, (rel, size, local_path, mtime))
+
+    def _transfer_one(self, sftp, item):
+        rel, size, local_path, mtime = item
+        remote_path = f"{self.remote_dir.rstrip('/')}/{rel}"
+        callback, downloaded = self._progress_callback()
+
+        try:
+            if self.use_pipeline:
+                PipelinedSFTP(sftp, is_stopped=lambda: self.is_stopped, throttle=self.throttle).download(
+                    remote_path, local_path, callback)
+            else:
+                def throttled(bytes_so_far, total):
+                    self.throttle(bytes_so_far - downloaded[0])
+                    callback(bytes_so_far, total)
+                sftp.get(remote_path, local_path, callback=throttled)
+        except Exception:
+            # A retry starts the file over
+            self._add_progress(-downloaded[0], 0)
+            raise
+        copy_mtime_to_local(sftp, remote_path, local_path, mtime)
+        self._add_progress(size - downloaded[0], 1)
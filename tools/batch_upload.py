@@ -0,0 +1,334 @@
+# batch_upload.py
+import os
+import queue
+import threading
+import time
+import traceback
+import paramiko
+from PyQt5.QtCore import QRunnable
+from tools.bandwidth import BandwidthShaper
+from tools.remote_dir_cache import RemoteDirCache
+from tools.setting_config import SCM
+from tools.sftp_pipeline import PipelinedSFTP, copy_mtime_to_remote, open_transfer_sftp
+from tools.transfer_worker import TransferSignals, TransferWorker
+
+
+def scan_local_tree(root):
+    """
+    Walk `root` with os.scandir, yielding ("dir", path) / ("file", path, size).
+
+    Entries are produced while the walk is in progress instead of being
+    collected per directory like os.walk does, and the size comes from the
+    DirEntry (no second stat on Windows). Like os.walk, symlinked directories
+    are not followed while symlinked files are uploaded as files.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        yield ("dir", current)
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            yield ("file", entry.path, entry.stat().st_size)
+                    except OSError as e:
+                        print(f"Skip unreadable entry {entry.path}: {e}")
+        except OSError as e:
+            print(f"Error scanning local directory {current}: {e}")
+
+
+class PooledBatchWorker(QRunnable):
+    """
+    Base of the directory batch transfers: one transfer item whose files are
+    moved by `sessions` threads, each with a long-lived SFTP session leased
+    from the transfer pool. Subclasses fill a queue of work items (None ends a
+    session thread) and implement `_transfer_one(sftp, item)`.
+
+    Besides the progress signal, about once a second the item is renamed to
+    "name (done/total files)" through `compression_finished`; throughput and
+    ETA come from the manager's ProgressBus like for any other transfer.
+    """
+
+    PROGRESS_INTERVAL = 0.1
+    STATUS_INTERVAL = 1.0
+
+    def __init__(self, connection, identifier, name, pool=None, sessions=None, bandwidth_key=None):
+        super().__init__()
+        config = SCM().read_config()
+        self.conn = connection
+        self.pool = pool
+        self.identifier = identifier
+        self.name = name
+        self.sessions = max(1, int(
+            sessions or config.get("transfer_batch_sessions", 4)))
+        self.use_pipeline = config.get("sftp_pipeline_enabled", True)
+        self.max_retries = int(config.get("transfer_max_retries", 5))
+        self.signals = TransferSignals()
+        self.is_stopped = False
+        # All sessions of the batch share the task's bucket
+        self.throttle = BandwidthShaper().limiter(
+            bandwidth_key, self.identifier, lambda: self.is_stopped)
+
+        self.total_bytes = 0
+        self.total_files = 0
+        # False while the totals are still growing (streamed listing)
+        self.totals_known = True
+        self._done_bytes = 0
+        self._done_files = 0
+        self._last_emit = 0
+        self._last_status = 0
+        self._errors = []
+        self._lock = threading.Lock()
+        self._sftps = set()
+
+    def stop(self):
+        self.is_stopped = True
+        with self._lock:
+            sftps = list(self._sftps)
+        for sftp in sftps:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+    def run(self):
+        try:
+            self._run()
+        finally:
+            BandwidthShaper().forget_task(self.identifier)
+
+    def _run_sessions(self, tasks, count):
+        threads = [threading.Thread(target=self._session_loop, args=(tasks,), daemon=True)
+                   for _ in range(count)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def _emit_result(self):
+        self.signals.compression_finished.emit(
+            self.identifier, f"{self.name} ({self.total_files} files)")
+        if self.is_stopped:
+            self.signals.finished.emit(
+                self.identifier, False, "Transfer was cancelled by user.")
+            return
+        if self._errors:
+            msg = "\n".join(self._errors[:10])
+            if self.total_files:
+                msg = f"{len(self._errors)} of {self.total_files} files failed:\n" + msg
+            self.signals.finished.emit(self.identifier, False, msg)
+            return
+        self.signals.progress.emit(
+            self.identifier, 100, self.total_bytes, self.total_bytes)
+        self.signals.finished.emit(self.identifier, True, "")
+
+    def _session_loop(self, tasks):
+        """One long-lived SFTP session transferring items until it gets None."""
+        conn = sftp = None
+        try:
+            while not self.is_stopped:
+                item = tasks.get()
+                if item is None:
+                    return
+                attempts = 0
+                while not self.is_stopped:
+                    try:
+                        if sftp is None:
+                            conn = conn or self._acquire()
+                            sftp = open_transfer_sftp(conn)
+                            with self._lock:
+                                self._sftps.add(sftp)
+                        self._transfer_one(sftp, item)
+                        break
+                    except Exception as e:
+                        if self.is_stopped:
+                            return
+                        if TransferWorker._is_transient(e) and attempts < self.max_retries:
+                            attempts += 1
+                            print(f"⚠️ Batch session interrupted ({e}), retry {attempts}/{self.max_retries}")
+                            self._close_sftp(sftp)
+                            sftp = None
+                            self._release(conn, broken=True)
+                            conn = None
+                            time.sleep(min(2 ** attempts, 30))
+                            continue
+                        with self._lock:
+                            self._errors.append(f"{item[0]}: {e}")
+                        break
+        finally:
+            self._close_sftp(sftp)
+            self._release(conn)
+
+    def _transfer_one(self, sftp, item):
+        raise NotImplementedError
+
+    def _progress_callback(self):
+        """paramiko-style callback feeding one file's progress into the aggregate."""
+        moved = [0]
+
+        def callback(bytes_so_far, _total):
+            self._add_progress(bytes_so_far - moved[0], 0)
+            moved[0] = bytes_so_far
+        return callback, moved
+
+    def _add_progress(self, delta_bytes, delta_files):
+        with self._lock:
+            self._done_bytes += delta_bytes
+            self._done_files += delta_files
+            now = time.monotonic()
+            if now - self._last_emit < self.PROGRESS_INTERVAL:
+                return
+            self._last_emit = now
+            done_bytes, done_files = self._done_bytes, self._done_files
+            total_bytes, total_files = self.total_bytes, self.total_files
+            status = now - self._last_status >= self.STATUS_INTERVAL
+            if status:
+                self._last_status = now
+        if not self.totals_known:
+            percentage = 0
+        elif total_bytes:
+            percentage = int(done_bytes * 100 / total_bytes)
+        else:
+            percentage = int(done_files * 100 / max(1, total_files))
+        self.signals.progress.emit(
+            self.identifier, min(percentage, 99), done_bytes, total_bytes)
+        if status:
+            self.signals.compression_finished.emit(
+                self.identifier, f"{self.name} ({done_files}/{total_files} files)")
+
+    # ---------------------------
+    # Connections
+    # ---------------------------
+    def _acquire(self):
+        conn = self.pool.acquire() if self.pool else self.conn
+        transport = conn.get_transport() if conn else None
+        if not transport or not transport.is_active():
+            self._release(conn, broken=True)
+            raise paramiko.ssh_exception.SSHException(
+                "SSH connection is not active or provided.")
+        return conn
+
+    def _release(self, conn, broken=False):
+        if self.pool and conn is not None:
+            self.pool.release(conn, broken)
+
+    def _close_sftp(self, sftp):
+        if sftp is None:
+            return
+        with self._lock:
+            self._sftps.discard(sftp)
+        try:
+            sftp.close()
+        except Exception:
+            pass
+
+
+class BatchUploadWorker(PooledBatchWorker):
+    """
+    Uploads a whole directory of (mostly small) files as one transfer.
+
+    Instead of one TransferWorker, SFTP session and path check per file, the
+    directory skeleton is created with a single remote `mkdir -p` and the files
+    are streamed over `sessions` long-lived SFTP sessions leased from the
+    transfer pool. Progress is reported as one aggregate item for the directory.
+    """
+
+    def __init__(self, connection, local_dir, remote_path, dirs, files, identifier=None, pool=None, dir_cache=None, sessions=None, bandwidth_key=None):
+        """
+        :param local_dir: local directory that was dropped
+        :param remote_path: remote directory the tree is uploaded into
+        :param dirs: local directories to recreate (from scan_local_tree)
+        :param files: [(local_path, size)] to upload in this batch
+        :param identifier: transfer id used for progress / finished signals
+        :param bandwidth_key: session key for BandwidthShaper limits
+        """
+        super().__init__(connection, identifier or local_dir,
+                         os.path.basename(local_dir.rstrip(os.sep)), pool=pool,
+                         sessions=sessions, bandwidth_key=bandwidth_key)
+        self.local_dir = local_dir
+        self.remote_root = f"{remote_path.rstrip('/')}/{os.path.basename(local_dir.rstrip(os.sep))}"
+        self.dirs = dirs
+        self.files = files
+        self.dir_cache = dir_cache if dir_cache is not None else RemoteDirCache()
+        self.total_bytes = sum(size for _, size in files)
+        self.total_files = len(files)
+
+    def _remote_path_for(self, local_path):
+        relative = os.path.relpath(local_path, self.local_dir)
+        if relative == ".":
+            return self.remote_root
+        return f"{self.remote_root}/{relative.replace(os.sep, '/')}"
+
+    # ---------------------------
+    # Run
+    # ---------------------------
+    def _run(self):
+        self.signals.progress.emit(self.identifier, -1, 0, self.total_bytes)
+        try:
+            self._create_skeleton()
+
+            tasks = queue.Queue()
+            count = min(self.sessions, len(self.files))
+            for item in self.files:
+                tasks.put(item)
+            for _ in range(count):
+                tasks.put(None)
+            for t in self._run_sessions(tasks, count):
+                t.join()
+        except Exception as e:
+            tb = traceback.format_exc()
+            print(f"❌ Batch upload error: {e}\n{tb}")
+            self._errors.append(f"{self.local_dir}: {e}")
+        self._emit_result()
+
+    def _create_skeleton(self):
+        """Create every remote directory of the tree with one `mkdir -p` exec."""
+        remote_dirs = [self._remote_path_for(d) for d in self.dirs]
+        missing = [d for d in remote_dirs if d not in self.dir_cache]
+        if not missing:
+            return
+        conn = self._acquire()
+        try:
+            # 目录列表走 stdin（NUL 分隔），不受命令行长度限制，也不用处理引号
+            stdin, stdout, stderr = conn.exec_command("xargs -0 mkdir -p --")
+            stdin.write("\0".join(missing).encode("utf-8"))
+            stdin.channel.shutdown_write()
+            status = stdout.channel.recv_exit_status()
+            if status == 0:
+                for d in missing:
+                    self.dir_cache.add(d)
+                return
+            print(f"⚠️ mkdir -p failed ({status}): {stderr.read().decode(errors='ignore')}")
+            # 没有 xargs 等情况：退回逐个创建
+            sftp = conn.open_sftp()
+            try:
+                for d in missing:
+                    self.dir_cache.ensure(sftp, d)
+            finally:
+                sftp.close()
+        finally:
+            self._release(conn)
+
+    def _transfer_one(self, sftp, item):
+        local_path, size = item
+        remote_path = self._remote_path_for(local_path)
+        callback, uploaded = self._progress_callback()
+
+        try:
+            if self.use_pipeline:
+                PipelinedSFTP(sftp, is_stopped=lambda: self.is_stopped, throttle=self.throttle).upload(
+                    local_path, remote_path, callback)
+            else:
+                def throttled(bytes_so_far, total):
+                    self.throttle(bytes_so_far - uploaded[0])
+                    callback(bytes_so_far, total)
+                sftp.put(local_path, remote_path, callback=throttled, confirm=False)
+        except Exception:
+            # A retry starts the file over
+            self._add_progress(-uploaded[0], 0)
+            raise
+        copy_mtime_to_remote(sftp, local_path, remote_path)
+        self._add_progress(size - uploaded[0], 1)
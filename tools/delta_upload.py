@@ -0,0 +1,207 @@
+# delta_upload.py
+import hashlib
+import math
+import os
+import shlex
+import struct
+import zlib
+import numpy as np
+from tools.atool import resource_path
+
+SIGNATURE_SIZE = 20  # >I adler32 + 16 字节 md5
+SCAN_CHUNK = 1024 * 1024  # 每次向量化计算滚动校验的偏移数（约 50MB 临时内存）
+LITERAL_CHUNK = 256 * 1024  # 限速时也能平稳发送
+
+
+class DeltaUnavailable(Exception):
+    """The remote side cannot do a delta transfer, upload the whole file instead."""
+
+
+def block_size_for(size: int) -> int:
+    """rsync-style block size: about sqrt(size), 2 KiB .. 256 KiB, multiple of 1 KiB."""
+    block = int(math.sqrt(max(size, 1))) // 1024 * 1024
+    return max(2048, min(block, 256 * 1024))
+
+
+def rolling_adler32(data: np.ndarray, block: int) -> np.ndarray:
+    """
+    zlib.adler32 of every `block`-byte window of `data`, computed at once
+    from prefix sums instead of rolling byte by byte in Python.
+    """
+    x = data.astype(np.int64)
+    s = np.concatenate(([0], np.cumsum(x)))
+    t = np.concatenate(([0], np.cumsum(x * np.arange(len(x), dtype=np.int64))))
+    k = np.arange(len(x) - block + 1, dtype=np.int64)
+    window_sum = s[k + block] - s[k]
+    # B = L + sum((L - j) * x_j)，j 为窗口内下标
+    weighted = (k + block) * window_sum - (t[k + block] - t[k])
+    a = (1 + window_sum) % 65521
+    b = (block + weighted) % 65521
+    return ((b << 16) | a).astype(np.uint32)
+
+
+class DeltaUploader:
+    """
+    rsync-like re-upload of a file that already exists on the server.
+
+    A helper (resource/delta_helper.py, run with the remote python3) sends
+    adler32 + md5 signatures of the remote file's blocks; blocks found anywhere
+    in the local file (rolling checksum, then md5) are copied on the server and
+    only the rest is sent. The helper writes the result next to the target,
+    checks the md5 of the whole new file and renames it over the old one.
+    """
+
+    def __init__(self, conn, is_stopped=None, throttle=None):
+        self.conn = conn
+        self.is_stopped = is_stopped or (lambda: False)
+        self.throttle = throttle
+
+    def _helper_command(self, *args):
+        with open(resource_path("resource/delta_helper.py"), encoding="utf-8") as f:
+            script = f.read()
+        return "python3 -c " + shlex.quote(script) + " " + " ".join(shlex.quote(str(a)) for a in args)
+
+    def _signature(self, remote_path, block):
+        _, stdout, stderr = self.conn.exec_command(
+            self._helper_command("sig", remote_path, block))
+        data = stdout.read()
+        status = stdout.channel.recv_exit_status()
+        if status != 0:
+            raise DeltaUnavailable(
+                f"signature failed ({status}): {stderr.read().decode(errors='ignore').strip()}")
+        size, mtime_ns = struct.unpack(">QQ", data[:16])
+        body = data[16:]
+        if len(body) % SIGNATURE_SIZE:
+            raise DeltaUnavailable("truncated signature")
+        records = np.frombuffer(body, dtype=np.uint8).reshape(-1, SIGNATURE_SIZE)
+        weak = records[:, :4].copy().view(">u4").ravel().astype(np.uint32)
+        strong = [bytes(r) for r in records[:, 4:]]
+        return size, mtime_ns, weak, strong
+
+    def _match(self, mm, block, remote_size, weak_sums, strong_sums):
+        """
+        Return the instruction list [("C", index, count) | ("L", start, end)]
+        rebuilding the local file from remote blocks plus literal ranges.
+
+        Like rsync, the block following the previous match is tried first at
+        the expected offset (adler32 + md5 at C speed), so an unchanged tail or a
+        shifted tail after an insertion costs no rolling search. Only where that
+        fails is the rolling checksum computed, one SCAN_CHUNK window at a time.
+        """
+        size = len(mm)
+        full_blocks = remote_size // block
+        table = {}
+        for index in range(full_blocks):
+            table.setdefault(int(weak_sums[index]), []).append(index)
+        # 24 位位图预筛，比 np.isin 的排序快得多；命中后再查 table
+        bitmap = np.zeros(1 << 24, dtype=bool)
+        bitmap[weak_sums[:full_blocks] & 0xFFFFFF] = True
+
+        ops = []
+        pos = literal_start = 0
+        last_index = -1
+
+        def emit_copy(index):
+            nonlocal last_index
+            if ops and ops[-1][0] == "C" and index == last_index + 1:
+                ops[-1] = ("C", ops[-1][1], ops[-1][2] + 1)
+            else:
+                ops.append(("C", index, 1))
+            last_index = index
+
+        def copy_at(o, index):
+            nonlocal pos, literal_start
+            if literal_start < o:
+                ops.append(("L", literal_start, o))
+            emit_copy(index)
+            pos = literal_start = o + block
+
+        while pos + block <= size:
+            if self.is_stopped():
+                raise InterruptedError("Transfer was cancelled by user.")
+            expected = last_index + 1
+            if expected < full_blocks:
+                window = mm[pos:pos + block]
+                if zlib.adler32(window) == weak_sums[expected] and \
+                        hashlib.md5(window).digest() == strong_sums[expected]:
+                    copy_at(pos, expected)
+                    continue
+
+            chunk_end = min(pos + SCAN_CHUNK, size - block + 1)
+            weak = rolling_adler32(mm[pos:chunk_end + block - 1], block)
+            found = False
+            for offset in np.nonzero(bitmap[weak & 0xFFFFFF])[0]:
+                offset = int(offset)
+                candidates = table.get(int(weak[offset]))
+                if not candidates:
+                    continue
+                o = pos + offset
+                strong = hashlib.md5(mm[o:o + block]).digest()
+                matches = [j for j in candidates if strong_sums[j] == strong]
+                if matches:
+                    copy_at(o, last_index + 1 if last_index + 1 in matches else matches[0])
+                    found = True
+                    break
+            if not found:
+                # 整个窗口都没有可复用的块，作为新数据发送
+                pos = chunk_end
+
+        # 远程最后一个不满的块
+        tail = remote_size - full_blocks * block
+        if tail and size - tail >= literal_start and \
+                hashlib.md5(mm[size - tail:]).digest() == strong_sums[full_blocks]:
+            if literal_start < size - tail:
+                ops.append(("L", literal_start, size - tail))
+            emit_copy(full_blocks)
+            literal_start = size
+        if literal_start < size:
+            ops.append(("L", literal_start, size))
+        return ops
+
+    def upload(self, local_path, remote_path, callback=None):
+        """
+        Patch `remote_path` to match `local_path`. Returns (sent_bytes, total_bytes).
+        Raises DeltaUnavailable when the helper cannot run (no python3, no remote file).
+        """
+        total = os.path.getsize(local_path)
+        block = block_size_for(total)
+        remote_size, mtime_ns, weak_sums, strong_sums = self._signature(remote_path, block)
+        mm = np.memmap(local_path, dtype=np.uint8, mode="r") if total else np.zeros(0, np.uint8)
+        try:
+            ops = self._match(mm, block, remote_size, weak_sums, strong_sums)
+            digest = hashlib.md5()
+            for start in range(0, total, LITERAL_CHUNK):
+                digest.update(mm[start:start + LITERAL_CHUNK])
+
+            stdin, stdout, stderr = self.conn.exec_command(self._helper_command(
+                "patch", remote_path, block, remote_size, mtime_ns))
+            channel = stdout.channel
+            sent = done = 0
+            for op in ops:
+                if self.is_stopped():
+                    channel.close()
+                    raise InterruptedError("Transfer was cancelled by user.")
+                if op[0] == "C":
+                    channel.sendall(b"C" + struct.pack(">II", op[1], op[2]))
+                    done += min(op[2] * block, remote_size - op[1] * block)
+                else:
+                    for start in range(op[1], op[2], LITERAL_CHUNK):
+                        data = mm[start:min(start + LITERAL_CHUNK, op[2])].tobytes()
+                        if self.throttle:
+                            self.throttle(len(data))
+                        channel.sendall(b"L" + struct.pack(">I", len(data)) + data)
+                        sent += len(data)
+                        done += len(data)
+                        if callback:
+                            callback(min(done, total), total)
+                if callback:
+                    callback(min(done, total), total)
+            channel.sendall(b"E" + digest.digest())
+            channel.shutdown_write()
+            status = channel.recv_exit_status()
+            if status != 0:
+                raise IOError(
+                    f"delta patch failed ({status}): {stderr.read().decode(errors='ignore').strip()}")
+        finally:
+            del mm
+        return sent, total
@@ -0,0 +1,202 @@
+# metrics_store.py
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size (timestamp, value) ring buffer backed by two numpy arrays."""
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._ts = np.zeros(self.capacity, dtype=np.float64)
+        self._values = np.zeros(self.capacity, dtype=np.float32)
+        self._head = 0  # next write position
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, ts: float, value: float):
+        self._ts[self._head] = ts
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def last(self):
+        if not self._count:
+            return None
+        i = (self._head - 1) % self.capacity
+        return float(self._ts[i]), float(self._values[i])
+
+    def snapshot(self, since: float = None):
+        """Return (timestamps, values) in chronological order, optionally only ts >= since."""
+        if self._count < self.capacity:
+            ts = self._ts[:self._count]
+            values = self._values[:self._count]
+        else:
+            ts = np.roll(self._ts, -self._head)
+            values = np.roll(self._values, -self._head)
+        if since is not None:
+            start = int(np.searchsorted(ts, since, side="left"))
+            ts, values = ts[start:], values[start:]
+        return ts.copy(), values.copy()
+
+
+class MetricSeries:
+    """
+    One metric kept at several resolutions. Raw samples go to the 1s tier and
+    are averaged into the coarser tiers when their bucket closes.
+    """
+
+    # (step seconds, capacity): 1 小时的 1s、6 小时的 10s、1 天的 1min
+    # 每个序列约 86KB（float64 时间戳 + float32 数值）
+    TIERS = ((1, 3600), (10, 2160), (60, 1440))
+
+    def __init__(self):
+        self.tiers = [(step, RingBuffer(capacity))
+                      for step, capacity in self.TIERS]
+        # 每个粗粒度 tier 当前桶的 [bucket_start, sum, count]
+        self._pending = [None] * len(self.tiers)
+        self.updated = 0.0
+
+    def add(self, ts: float, value: float):
+        self.updated = ts
+        for i, (step, buffer) in enumerate(self.tiers):
+            if step == 1:
+                buffer.append(ts, value)
+                continue
+            bucket = ts - ts % step
+            pending = self._pending[i]
+            if pending is not None and pending[0] != bucket:
+                buffer.append(pending[0], pending[1] / pending[2])
+                pending = None
+            if pending is None:
+                self._pending[i] = [bucket, value, 1]
+            else:
+                pending[1] += value
+                pending[2] += 1
+
+    def query(self, seconds: float, now: float = None, step: int = None):
+        """
+        Return (timestamps, values) covering the last `seconds`. Without `step`
+        the finest tier whose span covers the window is used.
+        """
+        now = now or time.time()
+        since = now - seconds
+        chosen = None
+        for tier_step, buffer in self.tiers:
+            if step is not None:
+                if tier_step >= step:
+                    chosen = buffer
+                    break
+                continue
+            if tier_step * buffer.capacity >= seconds:
+                chosen = buffer
+                break
+        if chosen is None:
+            chosen = self.tiers[-1][1]
+        return chosen.snapshot(since)
+
+
+class MetricsStore:
+    """
+    Per-session history of everything Monitor collects.
+
+    `record()` takes the same dicts Monitor hands to its callbacks and splits
+    them into named series such as "cpu", "cpu.core0", "mem", "net.eth0.rx_kbps"
+    or "disk./.used_percent". Memory is bounded: every series has fixed-size
+    buffers and at most MAX_SERIES series are kept (the least recently updated
+    one is dropped when a new one appears, e.g. short-lived veth interfaces).
+    """
+
+    # 最多约 22MB
+    MAX_SERIES = 256
+
+    def __init__(self):
+        self._series: Dict[str, MetricSeries] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value, ts: float = None):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        ts = ts or time.time()
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                if len(self._series) >= self.MAX_SERIES:
+                    oldest = min(self._series,
+                                 key=lambda k: self._series[k].updated)
+                    del self._series[oldest]
+                series = self._series[name] = MetricSeries()
+            series.add(ts, value)
+
+    def record(self, result: Dict, ts: float = None):
+        """Extract the numeric series from one Monitor result dict."""
+        if not isinstance(result, dict) or result.get("type") != "info":
+            return
+        ts = ts or time.time()
+        if "cpu_percent" in result:
+            self.add("cpu", result["cpu_percent"], ts)
+            for i, value in enumerate(result.get("cpu_per_core") or []):
+                self.add(f"cpu.core{i}", value, ts)
+            for key in ("cpu_iowait", "cpu_steal"):
+                if key in result:
+                    self.add(f"cpu.{key[4:]}", result[key], ts)
+        if "mem_percent" in result:
+            self.add("mem", result["mem_percent"], ts)
+        if "mem_used" in result:
+            self.add("mem.used_mb", result["mem_used"], ts)
+        load = result.get("load")
+        if isinstance(load, (list, tuple)) and load:
+            self.add("load1", load[0], ts)
+        for iface in result.get("net_usage") or []:
+            name = iface.get("iface")
+            if name:
+                self.add(f"net.{name}.rx_kbps", iface.get("rx_kbps"), ts)
+                self.add(f"net.{name}.tx_kbps", iface.get("tx_kbps"), ts)
+        for disk in result.get("disk_usage") or []:
+            mount = disk.get("mount")
+            if mount:
+                for key in ("used_percent", "read_kbps", "write_kbps"):
+                    self.add(f"disk.{mount}.{key}", disk.get(key), ts)
+
+    def series_names(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            return sorted(k for k in self._series if k.startswith(prefix))
+
+    def latest(self, name: str):
+        """(ts, value) of the newest sample, or None."""
+        with self._lock:
+            series = self._series.get(name)
+            return series.tiers[0][1].last() if series else None
+
+    def query(self, name: str, seconds: float = 3600, step: int = None):
+        """
+        Return (timestamps, values) numpy arrays for the last `seconds` of a
+        series, at the finest resolution that covers the window (or `step`).
+        """
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float32)
+            return series.query(seconds, step=step)
+
+    def summary(self, name: str, seconds: float = 3600) -> Optional[Dict]:
+        """min/avg/max/last over the window, convenient for text consumers such as the AI tools."""
+        ts, values = self.query(name, seconds)
+        if not len(values):
+            return None
+        return {
+            "series": name,
+            "samples": int(len(values)),
+            "min": round(float(values.min()), 2),
+            "avg": round(float(values.mean()), 2),
+            "max": round(float(values.max()), 2),
+            "last": round(float(values[-1]), 2),
+            "from": float(ts[0]),
+            "to": float(ts[-1]),
+        }
@@ -4,11 +4,31 @@ from typing import Dict, Optional, Callable
 import time
 import json
 import threading
+import base64
+from array import array
+import shlex
+import socket
+import random
+from tools.atool import resource_path
+from tools.setting_config import SCM
+from tools.metrics_store import MetricsStore
 
 
 class Monitor:
     """通过 paramiko SSHClient 获取系统资源信息的监控类"""
 
+    # register_poll 接受的 kind 同义词 -> 规范名（也是 agent 中 collect_<kind> 的名字）
+    KIND_ALIASES = {
+        "top": "top", "top_processes": "top",
+        "net": "net", "net_usage": "net",
+        "conn": "connections", "connections": "connections",
+        "disks": "disk", "disk": "disk", "storage": "disk",
+        "sysinfo": "sysinfo",
+        "all_processes": "all_processes", "allprocs": "all_processes",
+        "processes": "all_processes", "all": "all_processes",
+        "metrics": "metrics", "system_metrics": "metrics", "combined": "metrics",
+    }
+
     def __init__(self, channel: Optional[paramiko.Channel] = None, ssh_client: Optional[paramiko.SSHClient] = None):
         """
         初始化 Monitor 类
@@ -25,6 +45,8 @@ class Monitor:
         self._result_cache_duration = 0.5  # 缓存结果 0.5 秒，避免频繁调用
         # 用于保存上次的网卡字节数与时间戳，计算速率
         self._net_prev = {}
+        # 上次 /proc/stat 的 jiffies：每行 cpu/cpuN 8 个计数，按行展开存放
+        self._cpu_prev = array('Q')
 
         # --- 新增：轮询器相关状态（单线程轮询所有回调） ---
         self._poll_lock = threading.Lock()
@@ -34,6 +56,29 @@ class Monitor:
         self._poll_thread_stop = threading.Event()
         # 轮询主循环精度（秒）
         self._poll_tick = 0.2
+        # register_poll / set_visible 时唤醒轮询线程重新计算等待时间
+        self._poll_wakeup = threading.Event()
+
+        # --- 自适应调度：不可见的会话降频，重量级 kind 暂停 ---
+        config = SCM().read_config()
+        self.visible = True
+        self.hidden_slowdown = max(
+            1.0, float(config.get("monitor_hidden_slowdown", 5)))
+        self.hidden_pause_kinds = {
+            self._canonical_kind(k) for k in config.get(
+                "monitor_hidden_pause_kinds", ["top", "all_processes", "connections"])}
+        # 每台主机固定的抖动随机源，避免大量会话同时轮询
+        self._jitter = random.Random()
+
+        # --- 流式模式：一个常驻 agent 通过单个 channel 推送所有 kind 的数据 ---
+        self.streaming = config.get("monitor_streaming", True)
+        self._agent_channel = None
+        # 正在运行的 agent 的 {kind: interval}
+        self._agent_intervals = {}
+        self._stream_restart = threading.Event()
+
+        # 本会话的历史数据（环形缓冲，1s/10s/1min 三档），供图表和 AI 工具查询
+        self.history = MetricsStore()
 
     def _execute_command_fast(self, command: str, timeout: float = 2.0) -> str:
         """
@@ -126,6 +171,110 @@ class Monitor:
         except Exception as e:
             raise Exception(f"执行命令失败: {e}")
 
+    @staticmethod
+    def _metrics_script() -> str:
+        return """mem_info=$(free | grep Mem) && \
+mem_percent=$(echo "$mem_info" | awk '{printf "%.1f", $3/$2 * 100.0}') && \
+mem_used_mb=$(echo "$mem_info" | awk '{printf "%d", $3/1024}') && \
+load_1min=$(awk '{printf "%.2f", $1}' /proc/loadavg) && \
+load_5min=$(awk '{printf "%.2f", $2}' /proc/loadavg) && \
+load_15min=$(awk '{printf "%.2f", $3}' /proc/loadavg) && \
+uptime_sec=$(awk '{print int($1)}' /proc/uptime) && \
+echo "MEM_PERCENT:$mem_percent" && \
+echo "MEM_USED_MB:$mem_used_mb" && \
+echo "LOAD_1MIN:$load_1min" && \
+echo "LOAD_5MIN:$load_5min" && \
+echo "LOAD_15MIN:$load_15min" && \
+echo "UPTIME:$uptime_sec" && \
+grep '^cpu' /proc/stat
+"""
+
+    def _parse_metrics(self, output: str) -> Dict:
+        """解析 _metrics_script 的 key:value 输出"""
+        # 解析输出
+        cpu_rows = []
+        mem_percent = 0.0
+        mem_used = 0
+        load_1min = 0.0
+        load_5min = 0.0
+        load_15min = 0.0
+        uptime_seconds = 0
+
+        for line in output.split('\n'):
+            line = line.strip()
+            if line.startswith('cpu'):
+                # cpu/cpuN user nice system idle iowait irq softirq steal ...
+                fields = line.split()[1:9]
+                if len(fields) == 8 and all(f.isdigit() for f in fields):
+                    cpu_rows.append([int(f) for f in fields])
+                continue
+            if ':' in line:
+                key, value = line.split(':', 1)
+                try:
+                    if key == 'MEM_PERCENT':
+                        mem_percent = float(value)
+                    elif key == 'MEM_USED_MB':
+                        mem_used = int(float(value))
+                    elif key == 'LOAD_1MIN':
+                        load_1min = float(value)
+                    elif key == 'LOAD_5MIN':
+                        load_5min = float(value)
+                    elif key == 'LOAD_15MIN':
+                        load_15min = float(value)
+                    elif key == 'UPTIME':
+                        uptime_seconds = int(float(value))
+                except ValueError:
+                    continue
+
+        # 返回符合 _set_usage 函数期望的格式
+        return {
+            'type': 'info',  # 标识数据类型
+            **self._cpu_usage(cpu_rows),
+            'mem_percent': round(mem_percent, 1),
+            'mem_used': mem_used,  # 整数，单位 MB
+            'load': [load_1min, load_5min, load_15min],  # 负载数组
+            'uptime_seconds': uptime_seconds  # 整数，单位秒
+        }
+
+    def _cpu_usage(self, cpu_rows) -> Dict:
+        """
+        根据与上次采样的 jiffies 差值计算区间 CPU 使用率。
+        第一行为总计，其余为每个核心；首次采样（或核心数变化）时退化为开机以来的平均值。
+
+        Returns:
+            - cpu_percent: 总使用率
+            - cpu_per_core: array('f')，每个核心的使用率
+            - cpu_iowait / cpu_steal: 总 iowait / steal 百分比
+        """
+        current = array('Q')
+        for row in cpu_rows:
+            current.extend(row)
+        previous = self._cpu_prev
+        if len(previous) != len(current):
+            previous = array('Q', bytes(len(current) * current.itemsize))
+        self._cpu_prev = current
+
+        usage = array('f')
+        iowait = steal = 0.0
+        for i in range(0, len(current), 8):
+            delta = [c - p for c, p in zip(current[i:i + 8], previous[i:i + 8])]
+            total = sum(delta)
+            if total <= 0:
+                usage.append(0.0)
+                continue
+            # idle 与 iowait 都不算忙
+            usage.append(round((total - delta[3] - delta[4]) * 100.0 / total, 1))
+            if i == 0:
+                iowait = delta[4] * 100.0 / total
+                steal = delta[7] * 100.0 / total
+
+        return {
+            'cpu_percent': round(usage[0], 1) if usage else 0.0,
+            'cpu_per_core': usage[1:],
+            'cpu_iowait': round(iowait, 1),
+            'cpu_steal': round(steal, 1),
+        }
+
     def get_system_metrics(self) -> Dict:
         """
 
@@ -143,65 +292,9 @@ class Monitor:
             return self._last_result
 
         try:
-            command = """cpu_info=$(grep 'cpu ' /proc/stat | awk '{usage=($2+$4)*100/($2+$3+$4+$5)} END {print usage}') && \
-mem_info=$(free | grep Mem) && \
-mem_percent=$(echo "$mem_info" | awk '{printf "%.1f", $3/$2 * 100.0}') && \
-mem_used_mb=$(echo "$mem_info" | awk '{printf "%d", $3/1024}') && \
-load_1min=$(awk '{printf "%.2f", $1}' /proc/loadavg) && \
-load_5min=$(awk '{printf "%.2f", $2}' /proc/loadavg) && \
-load_15min=$(awk '{printf "%.2f", $3}' /proc/loadavg) && \
-uptime_sec=$(awk '{print int($1)}' /proc/uptime) && \
-echo "CPU:$cpu_info" && \
-echo "MEM_PERCENT:$mem_percent" && \
-echo "MEM_USED_MB:$mem_used_mb" && \
-echo "LOAD_1MIN:$load_1min" && \
-echo "LOAD_5MIN:$load_5min" && \
-echo "LOAD_15MIN:$load_15min" && \
-echo "UPTIME:$uptime_sec"
-"""
-
-            output = self._execute_command_fast(command, timeout=1.5)
-
-            # 解析输出
-            cpu_percent = 0.0
-            mem_percent = 0.0
-            mem_used = 0
-            load_1min = 0.0
-            load_5min = 0.0
-            load_15min = 0.0
-            uptime_seconds = 0
-
-            for line in output.split('\n'):
-                line = line.strip()
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    try:
-                        if key == 'CPU':
-                            cpu_percent = float(value)
-                        elif key == 'MEM_PERCENT':
-                            mem_percent = float(value)
-                        elif key == 'MEM_USED_MB':
-                            mem_used = int(float(value))
-                        elif key == 'LOAD_1MIN':
-                            load_1min = float(value)
-                        elif key == 'LOAD_5MIN':
-                            load_5min = float(value)
-                        elif key == 'LOAD_15MIN':
-                            load_15min = float(value)
-                        elif key == 'UPTIME':
-                            uptime_seconds = int(float(value))
-                    except ValueError:
-                        continue
-
-            # 返回符合 _set_usage 函数期望的格式
-            result = {
-                'type': 'info',  # 标识数据类型
-                'cpu_percent': round(cpu_percent, 1),
-                'mem_percent': round(mem_percent, 1),
-                'mem_used': mem_used,  # 整数，单位 MB
-                'load': [load_1min, load_5min, load_15min],  # 负载数组
-                'uptime_seconds': uptime_seconds  # 整数，单位秒
-            }
+            output = self._execute_command_fast(
+                self._metrics_script(), timeout=1.5)
+            result = self._parse_metrics(output)
 
             # 缓存结果
             self._last_result = result
@@ -256,25 +349,7 @@ echo "UPTIME:$uptime_sec"
         返回解析后的字典，失败返回空 dict。带有简单 DEBUG 输出。
         """
         try:
-            script = r'''#!/bin/bash
-sys=$(uname -s)
-kernel=$(uname -r)
-arch=$(uname -m)
-hostn=$(hostname)
-cpu_model=$(awk -F: '/model name/ {gsub(/^[ \t]+/,"",$2); print $2; exit}' /proc/cpuinfo || echo)
-cores=$(nproc 2>/dev/null || echo 0)
-cpu_freq=$(awk -F: '/cpu MHz/ {printf("%.0f",$2); exit}' /proc/cpuinfo 2>/dev/null || echo)
-if [ -n "$cpu_freq" ]; then cpu_freq="${cpu_freq}MHz"; fi
-cpu_cache=$(awk -F: '/cache size/ {gsub(/^[ \t]+/,"",$2); print $2; exit}' /proc/cpuinfo || echo)
-mem_kb=$(awk '/MemTotal/ {print $2; exit}' /proc/meminfo 2>/dev/null || echo)
-mem_mb=0
-if [ -n "$mem_kb" ]; then mem_mb=$((mem_kb/1024)); fi
-ip=$(hostname -I 2>/dev/null | awk '{print $1}' || echo)
-
-# 输出 key:value 每行，便于本地解析
-printf "system:%s\nkernel:%s\narch:%s\nhostname:%s\ncpu_model:%s\ncpu_cores:%s\ncpu_freq:%s\ncpu_cache:%s\nmem_total:%sMB\nip:%s\n" \
-    "$sys" "$kernel" "$arch" "$hostn" "$cpu_model" "$cores" "$cpu_freq" "$cpu_cache" "$mem_mb" "$ip"
-'''
+            script = self._sysinfo_script()
             # print(
             #     "DEBUG: get_sysinfo_details: using stdin-bash script (length {})".format(len(script)))
 
@@ -326,40 +401,65 @@ printf "system:%s\nkernel:%s\narch:%s\nhostname:%s\ncpu_model:%s\ncpu_cores:%s\n
 
             if not output:
                 return {}
+            return self._parse_sysinfo(output)
+        except Exception as e:
+            print("DEBUG: get_sysinfo_details top-level exception:", repr(e))
+            return {}
 
-            # 解析 key:value 行到字典
-            info: Dict[str, str] = {}
-            for line in output.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                if ':' in line:
-                    k, v = line.split(':', 1)
-                    info[k.strip()] = v.strip()
+    @staticmethod
+    def _sysinfo_script() -> str:
+        return r'''#!/bin/bash
+sys=$(uname -s)
+kernel=$(uname -r)
+arch=$(uname -m)
+hostn=$(hostname)
+cpu_model=$(awk -F: '/model name/ {gsub(/^[ \t]+/,"",$2); print $2; exit}' /proc/cpuinfo || echo)
+cores=$(nproc 2>/dev/null || echo 0)
+cpu_freq=$(awk -F: '/cpu MHz/ {printf("%.0f",$2); exit}' /proc/cpuinfo 2>/dev/null || echo)
+if [ -n "$cpu_freq" ]; then cpu_freq="${cpu_freq}MHz"; fi
+cpu_cache=$(awk -F: '/cache size/ {gsub(/^[ \t]+/,"",$2); print $2; exit}' /proc/cpuinfo || echo)
+mem_kb=$(awk '/MemTotal/ {print $2; exit}' /proc/meminfo 2>/dev/null || echo)
+mem_mb=0
+if [ -n "$mem_kb" ]; then mem_mb=$((mem_kb/1024)); fi
+ip=$(hostname -I 2>/dev/null | awk '{print $1}' || echo)
 
-            if not info:
-                return {}
+# 输出 key:value 每行，便于本地解析
+printf "system:%s\nkernel:%s\narch:%s\nhostname:%s\ncpu_model:%s\ncpu_cores:%s\ncpu_freq:%s\ncpu_cache:%s\nmem_total:%sMB\nip:%s\n" \
+    "$sys" "$kernel" "$arch" "$hostn" "$cpu_model" "$cores" "$cpu_freq" "$cpu_cache" "$mem_mb" "$ip"
+'''
 
-            # 规范化/类型转换
-            result: Dict = {}
-            result['system'] = info.get('system', '')
-            result['kernel'] = info.get('kernel', '')
-            result['arch'] = info.get('arch', '')
-            result['hostname'] = info.get('hostname', '')
-            result['cpu_model'] = info.get('cpu_model', '')
-            try:
-                result['cpu_cores'] = int(info.get('cpu_cores', '0') or 0)
-            except Exception:
-                result['cpu_cores'] = 0
-            result['cpu_freq'] = info.get('cpu_freq', '')
-            result['cpu_cache'] = info.get('cpu_cache', '')
-            result['mem_total'] = info.get('mem_total', '')
-            result['ip'] = info.get('ip', '')
-            return result
-        except Exception as e:
-            print("DEBUG: get_sysinfo_details top-level exception:", repr(e))
+    @staticmethod
+    def _parse_sysinfo(output: str) -> Dict:
+        # 解析 key:value 行到字典
+        info: Dict[str, str] = {}
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if ':' in line:
+                k, v = line.split(':', 1)
+                info[k.strip()] = v.strip()
+
+        if not info:
             return {}
 
+        # 规范化/类型转换
+        result: Dict = {}
+        result['system'] = info.get('system', '')
+        result['kernel'] = info.get('kernel', '')
+        result['arch'] = info.get('arch', '')
+        result['hostname'] = info.get('hostname', '')
+        result['cpu_model'] = info.get('cpu_model', '')
+        try:
+            result['cpu_cores'] = int(info.get('cpu_cores', '0') or 0)
+        except Exception:
+            result['cpu_cores'] = 0
+        result['cpu_freq'] = info.get('cpu_freq', '')
+        result['cpu_cache'] = info.get('cpu_cache', '')
+        result['mem_total'] = info.get('mem_total', '')
+        result['ip'] = info.get('ip', '')
+        return result
+
     def get_top_processes(self, top_n: int = 5) -> Dict:
         """
         获取 CPU 占用最高的前 N 个进程信息（不包括 kworker 和 rcu_ 内核线程）。
@@ -381,20 +481,7 @@ printf "system:%s\nkernel:%s\narch:%s\nhostname:%s\ncpu_model:%s\ncpu_cores:%s\n
             }
         """
         try:
-            # 使用 key:value 行输出格式，避免 JSON 转义问题（参考 get_sysinfo_details 方案）
-            script = r'''#!/bin/bash
-TOP_N={top_n}
-ps -eo pid,comm,%cpu,rss --sort=-%cpu | awk -v top_n="$TOP_N" '
-NR>1 && $2 !~ /^kworker/ && $2 !~ /^rcu_/ {{
-
-    count++
-    if (count <= top_n) {{
-        mem_mb = $4 / 1024
-        printf "pid:%s|name:%s|cpu:%s|mem_mb:%.2f\n", $1, $2, $3, mem_mb
-    }}
-}}
-'
-'''.format(top_n=top_n)
+            script = self._top_script(top_n)
 
             # print("DEBUG: get_top_processes: executing script (top_n={})".format(top_n))
 
@@ -442,48 +529,69 @@ NR>1 && $2 !~ /^kworker/ && $2 !~ /^rcu_/ {{
             if not output:
                 return {"type": "info", "top_processes": []}
 
-            # 解析 key:value 行到进程列表（参考 get_sysinfo_details 方案）
-            processes_list = []
-            for line in output.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                # 解析 pid:XXX|name:YYY|cpu:ZZZ|mem_mb:WWW 格式
-                process_dict = {}
-                for pair in line.split('|'):
-                    if ':' in pair:
-                        k, v = pair.split(':', 1)
-                        process_dict[k.strip()] = v.strip()
-
-                # 类型转换
-                if 'pid' in process_dict and 'name' in process_dict:
-                    try:
-                        process_dict['pid'] = int(process_dict['pid'])
-                    except Exception:
-                        pass
-                    try:
-                        process_dict['cpu'] = float(process_dict.get('cpu', 0))
-                    except Exception:
-                        process_dict['cpu'] = 0.0
-                    try:
-                        process_dict['mem_mb'] = float(
-                            process_dict.get('mem_mb', 0))
-                    except Exception:
-                        process_dict['mem_mb'] = 0.0
-
-                    processes_list.append(process_dict)
-
-            # print("DEBUG: parsed {} processes".format(len(processes_list)))
-
-            return {
-                "type": "info",
-                "top_processes": processes_list
-            }
+            return self._parse_top_processes(output)
 
         except Exception as e:
             print("DEBUG: get_top_processes top-level exception:", repr(e))
             return {"type": "info", "top_processes": []}
 
+    @staticmethod
+    def _top_script(top_n: int = 5) -> str:
+        # 使用 key:value 行输出格式，避免 JSON 转义问题（参考 get_sysinfo_details 方案）
+        return r'''#!/bin/bash
+TOP_N={top_n}
+ps -eo pid,comm,%cpu,rss --sort=-%cpu | awk -v top_n="$TOP_N" '
+NR>1 && $2 !~ /^kworker/ && $2 !~ /^rcu_/ {{
+
+    count++
+    if (count <= top_n) {{
+        mem_mb = $4 / 1024
+        printf "pid:%s|name:%s|cpu:%s|mem_mb:%.2f\n", $1, $2, $3, mem_mb
+    }}
+}}
+'
+'''.format(top_n=top_n)
+
+    @staticmethod
+    def _parse_top_processes(output: str) -> Dict:
+        # 解析 key:value 行到进程列表（参考 get_sysinfo_details 方案）
+        processes_list = []
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            # 解析 pid:XXX|name:YYY|cpu:ZZZ|mem_mb:WWW 格式
+            process_dict = {}
+            for pair in line.split('|'):
+                if ':' in pair:
+                    k, v = pair.split(':', 1)
+                    process_dict[k.strip()] = v.strip()
+
+            # 类型转换
+            if 'pid' in process_dict and 'name' in process_dict:
+                try:
+                    process_dict['pid'] = int(process_dict['pid'])
+                except Exception:
+                    pass
+                try:
+                    process_dict['cpu'] = float(process_dict.get('cpu', 0))
+                except Exception:
+                    process_dict['cpu'] = 0.0
+                try:
+                    process_dict['mem_mb'] = float(
+                        process_dict.get('mem_mb', 0))
+                except Exception:
+                    process_dict['mem_mb'] = 0.0
+
+                processes_list.append(process_dict)
+
+        # print("DEBUG: parsed {} processes".format(len(processes_list)))
+
+        return {
+            "type": "info",
+            "top_processes": processes_list
+        }
+
     def get_top_processes_async(self, top_n: int = 5, callback: Optional[Callable[[Dict], None]] = None):
         """
         异步获取 top processes，结果通过 callback(return_dict) 返回（非阻塞）。
@@ -513,9 +621,7 @@ NR>1 && $2 !~ /^kworker/ && $2 !~ /^rcu_/ {{
             except Exception:
                 timeout_val = 5.0
 
-            script = r'''#!/bin/bash
-awk 'NR>2{gsub(/:/,"",$1); if($1!="lo") print $1 "|" $2 "|" $10}' /proc/net/dev
-'''
+            script = self._net_script()
             output = ""
             if getattr(self, "ssh_client", None):
                 try:
@@ -552,51 +658,61 @@ awk 'NR>2{gsub(/:/,"",$1); if($1!="lo") print $1 "|" $2 "|" $10}' /proc/net/dev
             if not output:
                 return {"type": "info", "net_usage": []}
 
-            now = time.time()
-            net_list = []
-            for line in output.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split("|")
-                if len(parts) < 3:
-                    continue
-                iface = parts[0]
-                try:
-                    rx = int(parts[1])
-                except Exception:
-                    rx = 0
-                try:
-                    tx = int(parts[2])
-                except Exception:
-                    tx = 0
-
-                prev = self._net_prev.get(iface)
-                rx_kbps = 0.0
-                tx_kbps = 0.0
-                if prev:
-                    dt = now - prev.get("ts", now)
-                    if dt > 0.05:
-                        rx_kbps = max(
-                            0.0, (rx - prev.get("rx", 0)) / dt / 1024.0)
-                        tx_kbps = max(
-                            0.0, (tx - prev.get("tx", 0)) / dt / 1024.0)
-                # 更新缓存
-                self._net_prev[iface] = {"rx": rx, "tx": tx, "ts": now}
-
-                net_list.append({
-                    "iface": iface,
-                    "rx_kbps": round(rx_kbps, 2),
-                    "tx_kbps": round(tx_kbps, 2),
-                    "rx_bytes": rx,
-                    "tx_bytes": tx
-                })
-
-            return {"type": "info", "net_usage": net_list}
+            return self._parse_net_usage(output)
         except Exception as e:
             print("DEBUG: get_net_usage top-level exception:", repr(e))
             return {"type": "info", "net_usage": []}
 
+    @staticmethod
+    def _net_script() -> str:
+        return r'''#!/bin/bash
+awk 'NR>2{gsub(/:/,"",$1); if($1!="lo") print $1 "|" $2 "|" $10}' /proc/net/dev
+'''
+
+    def _parse_net_usage(self, output: str, now: float = None) -> Dict:
+        """解析 /proc/net/dev 累计字节并基于上次采样计算速率"""
+        now = now or time.time()
+        net_list = []
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split("|")
+            if len(parts) < 3:
+                continue
+            iface = parts[0]
+            try:
+                rx = int(parts[1])
+            except Exception:
+                rx = 0
+            try:
+                tx = int(parts[2])
+            except Exception:
+                tx = 0
+
+            prev = self._net_prev.get(iface)
+            rx_kbps = 0.0
+            tx_kbps = 0.0
+            if prev:
+                dt = now - prev.get("ts", now)
+                if dt > 0.05:
+                    rx_kbps = max(
+                        0.0, (rx - prev.get("rx", 0)) / dt / 1024.0)
+                    tx_kbps = max(
+                        0.0, (tx - prev.get("tx", 0)) / dt / 1024.0)
+            # 更新缓存
+            self._net_prev[iface] = {"rx": rx, "tx": tx, "ts": now}
+
+            net_list.append({
+                "iface": iface,
+                "rx_kbps": round(rx_kbps, 2),
+                "tx_kbps": round(tx_kbps, 2),
+                "rx_bytes": rx,
+                "tx_bytes": tx
+            })
+
+        return {"type": "info", "net_usage": net_list}
+
     def get_net_usage_async(self, timeout: int = 5, callback: Optional[Callable[[Dict], None]] = None):
         """
         异步获取网络使用情况（get_net_usage），结果通过 callback(dict) 回传（非阻塞）。
@@ -617,7 +733,8 @@ awk 'NR>2{gsub(/:/,"",$1); if($1!="lo") print $1 "|" $2 "|" $10}' /proc/net/dev
 
     def get_connections(self, limit: int = 20, timeout: float = 5.0) -> Dict:
         """
-        获取前若干网络连接及对应进程的流量（基于 /proc/<pid>/net/dev），返回：
+        获取有网络连接的进程（按 pid 聚合，一次 ss -tunpi），按流量取前 limit 个。
+        流量来自每个 TCP socket 的 tcp_info 字节数之和，local/remote 为该进程的第一条连接。返回：
         {
             "type": "info",
             "connections": [
@@ -644,41 +761,7 @@ awk 'NR>2{gsub(/:/,"",$1); if($1!="lo") print $1 "|" $2 "|" $10}' /proc/net/dev
             except Exception:
                 timeout_val = 5.0
 
-            script = r'''#!/bin/bash
-LIMIT={limit}
-ss -tunp -H | head -n $LIMIT | while read -r line; do
-    # 提取字段
-    proto=$(echo "$line" | awk '{print $1}')
-    state=$(echo "$line" | awk '{print $2}')
-    local=$(echo "$line" | awk '{print $5}')
-    remote=$(echo "$line" | awk '{print $6}')
-    users=$(echo "$line" | awk '{for(i=7;i<=NF;i++) printf $i " "; print ""}')
-    pid=$(echo "$users" | grep -o 'pid=[0-9]\+' | cut -d= -f2 | head -n1)
-    pname=$(echo "$users" | grep -o '"[^"]\+"' | tr -d '"' | head -n1)
-    [[ -z "$pid" ]] && continue
-    [[ -z "$pname" ]] && pname="unknown"
-
-    local_ip=$(echo "$local" | rev | cut -d: -f2- | rev)
-    local_port=$(echo "$local" | rev | cut -d: -f1 | rev)
-    remote_ip=$(echo "$remote" | rev | cut -d: -f2- | rev)
-    remote_port=$(echo "$remote" | rev | cut -d: -f1 | rev)
-
-    # 读取 /proc/<pid>/net/dev 汇总 rx/tx 字节
-    proc_rx=0
-    proc_tx=0
-    if [[ -r /proc/$pid/net/dev ]]; then
-        read rx_sum tx_sum < <(awk 'NR>2 {gsub(/:/,"",$1); rx+=$2; tx+=$10} END {print (rx+0),"",(tx+0)}' /proc/$pid/net/dev 2>/dev/null)
-        proc_rx=${rx_sum:-0}
-        proc_tx=${tx_sum:-0}
-    fi
-
-    conn_count=$(ss -tunp | grep "pid=$pid" | wc -l || echo 0)
-
-    # 输出 key:value 用 | 分隔，便于本地解析
-    printf "pid:%s|name:%s|local_ip:%s|local_port:%s|remote_ip:%s|remote_port:%s|connections:%s|rx_bytes:%s|tx_bytes:%s\n" \
-        "$pid" "$pname" "$local_ip" "$local_port" "$remote_ip" "$remote_port" "$conn_count" "$proc_rx" "$proc_tx"
-done
-'''.replace('{limit}', str(int(limit)))
+            script = self._connections_script()
 
             output = ""
             if getattr(self, "ssh_client", None):
@@ -721,81 +804,113 @@ done
             if not output:
                 return {"type": "info", "connections": []}
 
-            # --- 插入 now 变量和确保 _proc_prev 存在 ---
-            now = time.time()
-            if not hasattr(self, "_proc_prev"):
-                self._proc_prev = {}
-
-            # 解析 key:value 行到连接列表
-            conns = []
-            for line in output.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                parts = {}
-                for pair in line.split('|'):
-                    if ':' in pair:
-                        k, v = pair.split(':', 1)
-                        parts[k.strip()] = v.strip()
-                try:
-                    pid = int(parts.get('pid', 0))
-                except Exception:
-                    continue
-                name = parts.get('name', 'unknown')
-                local_ip = parts.get('local_ip', '')
-                local_port = parts.get('local_port', '')
-                remote_ip = parts.get('remote_ip', '')
-                remote_port = parts.get('remote_port', '')
-                try:
-                    rx_bytes = int(parts.get('rx_bytes', 0))
-                except Exception:
-                    rx_bytes = 0
-                try:
-                    tx_bytes = int(parts.get('tx_bytes', 0))
-                except Exception:
-                    tx_bytes = 0
-                try:
-                    conn_count = int(parts.get('connections', 0))
-                except Exception:
-                    conn_count = 0
-
-                # 计算速率（KB/s），使用 self._proc_prev 缓存
-                prev = getattr(self, "_proc_prev", {}).get(pid)
-                dl_kbps = 0.0
-                ul_kbps = 0.0
-                if prev:
-                    dt = now - prev.get("ts", now)
-                    if dt > 0.05:
-                        dl_kbps = max(
-                            0.0, (rx_bytes - prev.get("rx", 0)) / dt / 1024.0)
-                        ul_kbps = max(
-                            0.0, (tx_bytes - prev.get("tx", 0)) / dt / 1024.0)
-                # 更新 proc cache (与 net cache 共用命名空间 _proc_prev)
-                if not hasattr(self, "_proc_prev"):
-                    self._proc_prev = {}
-                self._proc_prev[pid] = {
-                    "rx": rx_bytes, "tx": tx_bytes, "ts": now}
-
-                conns.append({
-                    "pid": pid,
-                    "name": name,
-                    "local_ip": local_ip,
-                    "local_port": local_port,
-                    "remote_ip": remote_ip,
-                    "remote_port": remote_port,
-                    "connections": conn_count,
-                    "upload_kbps": round(ul_kbps, 2),
-                    "download_kbps": round(dl_kbps, 2),
-                    "rx_bytes": rx_bytes,
-                    "tx_bytes": tx_bytes
-                })
-
-            return {"type": "info", "connections": conns}
+            return self._parse_connections(output, limit=limit)
 
         except Exception as e:
             print("DEBUG: get_connections top-level exception:", repr(e))
             return {"type": "info", "connections": []}
 
+    @staticmethod
+    def _connections_script() -> str:
+        # 一次 ss 输出，awk 按 pid 聚合：连接数 + tcp_info 中的 bytes_sent/bytes_received。
+        # -i 的 tcp_info 在下一行（以空白开头），归属于上一条 socket。
+        # 共享同一 socket 的多个进程（如 nginx worker）只记到第一个 pid。
+        return r'''ss -tunpiH 2>/dev/null | awk '
+/^[ \t]/ {
+    if (cur == "") next
+    sent = 0; acked = 0; recv = 0
+    for (i = 1; i <= NF; i++) {
+        split($i, kv, ":")
+        if (kv[1] == "bytes_sent") sent = kv[2]
+        else if (kv[1] == "bytes_acked") acked = kv[2]
+        else if (kv[1] == "bytes_received") recv = kv[2]
+    }
+    tx[cur] += (sent > 0 ? sent : acked)
+    rx[cur] += recv
+    next
+}
+{
+    cur = ""
+    if (!match($0, /pid=[0-9]+/)) next
+    cur = substr($0, RSTART + 4, RLENGTH - 4)
+    if (!(cur in count)) {
+        pname = "unknown"
+        if (match($0, /\(\("[^"]*"/)) pname = substr($0, RSTART + 3, RLENGTH - 4)
+        name[cur] = pname; laddr[cur] = $5; raddr[cur] = $6
+    }
+    count[cur]++
+}
+END {
+    for (pid in count)
+        printf "pid:%s|name:%s|local:%s|remote:%s|connections:%d|rx_bytes:%.0f|tx_bytes:%.0f\n", pid, name[pid], laddr[pid], raddr[pid], count[pid], rx[pid], tx[pid]
+}'
+'''
+
+    @staticmethod
+    def _split_addr(addr: str):
+        """'1.2.3.4:22' / '[::1]:22' / '*:*' -> (ip, port)"""
+        ip, _, port = addr.rpartition(':')
+        return ip.strip('[]'), port
+
+    def _parse_connections(self, output: str, now: float = None, limit: int = 20) -> Dict:
+        """解析按 pid 聚合的连接信息，计算每个进程的速率并按流量取前 limit 个"""
+        now = now or time.time()
+        prev_all = getattr(self, "_proc_prev", {})
+        # 只保留本次出现的 pid，避免缓存无限增长
+        self._proc_prev = {}
+
+        conns = []
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            parts = {}
+            for pair in line.split('|'):
+                if ':' in pair:
+                    k, v = pair.split(':', 1)
+                    parts[k.strip()] = v.strip()
+            try:
+                pid = int(parts.get('pid', 0))
+                conn_count = int(parts.get('connections', 0))
+                rx_bytes = int(parts.get('rx_bytes', 0))
+                tx_bytes = int(parts.get('tx_bytes', 0))
+            except ValueError:
+                continue
+            local_ip, local_port = self._split_addr(parts.get('local', ''))
+            remote_ip, remote_port = self._split_addr(parts.get('remote', ''))
+
+            # 计算速率（KB/s）；socket 关闭会使累计值变小，此时按 0 处理
+            prev = prev_all.get(pid)
+            dl_kbps = 0.0
+            ul_kbps = 0.0
+            if prev:
+                dt = now - prev.get("ts", now)
+                if dt > 0.05:
+                    dl_kbps = max(
+                        0.0, (rx_bytes - prev.get("rx", 0)) / dt / 1024.0)
+                    ul_kbps = max(
+                        0.0, (tx_bytes - prev.get("tx", 0)) / dt / 1024.0)
+            self._proc_prev[pid] = {
+                "rx": rx_bytes, "tx": tx_bytes, "ts": now}
+
+            conns.append({
+                "pid": pid,
+                "name": parts.get('name', 'unknown'),
+                "local_ip": local_ip,
+                "local_port": local_port,
+                "remote_ip": remote_ip,
+                "remote_port": remote_port,
+                "connections": conn_count,
+                "upload_kbps": round(ul_kbps, 2),
+                "download_kbps": round(dl_kbps, 2),
+                "rx_bytes": rx_bytes,
+                "tx_bytes": tx_bytes
+            })
+
+        conns.sort(key=lambda c: (c["upload_kbps"] + c["download_kbps"],
+                                  c["connections"]), reverse=True)
+        return {"type": "info", "connections": conns[:max(0, int(limit))]}
+
     def get_connections_async(self, limit: int = 20, timeout: float = 5.0, callback: Optional[Callable[[Dict], None]] = None):
         """
         异步获取 connections，结果通过 callback(dict) 回传（非阻塞）。
@@ -826,23 +941,7 @@ done
             except Exception:
                 timeout_val = 5.0
 
-            script = (r'''#!/bin/bash
-LIMIT={limit}
-df -k --output=source,size,used,avail,pcent,target | tail -n +2 | head -n $LIMIT | while read -r filesystem size used avail usep mount; do
-    [[ "$filesystem" == "tmpfs" || "$filesystem" == "udev" ]] && continue
-    device_type="physical"
-    if [[ "$filesystem" == *"merged"* ]]; then
-        device_type="docker_overlay"
-    fi
-    dev=$(basename "$filesystem")
-    read_sectors=$(awk -v d="$dev" '$3==d {print $6}' /proc/diskstats 2>/dev/null)
-    write_sectors=$(awk -v d="$dev" '$3==d {print $10}' /proc/diskstats 2>/dev/null)
-    read_sectors=${read_sectors:-0}
-    write_sectors=${write_sectors:-0}
-    printf "device:%s|mount:%s|type:%s|size_kb:%s|used_kb:%s|avail_kb:%s|used_percent:%s|read_sectors:%s|write_sectors:%s\n" \
-        "$filesystem" "$mount" "$device_type" "$size" "$used" "$avail" "$usep" "$read_sectors" "$write_sectors"
-done
-''').replace('{limit}', str(int(limit)))
+            script = self._disks_script(limit)
 
             output = ""
             if getattr(self, "ssh_client", None):
@@ -880,97 +979,121 @@ done
             if not output:
                 return {"type": "info", "disk_usage": []}
 
-            now = time.time()
-            disks = []
-            if not hasattr(self, "_disk_prev"):
-                self._disk_prev = {}
-
-            for line in output.splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                parts = {}
-                for pair in line.split('|'):
-                    if ':' in pair:
-                        k, v = pair.split(':', 1)
-                        parts[k.strip()] = v.strip()
-
-                device = parts.get('device', '')
-                mount = parts.get('mount', '')
-                dtype = parts.get('type', 'physical')
-
-                # 数值字段转换，容错为 0
-                def to_int(x):
-                    try:
-                        return int(x)
-                    except Exception:
-                        try:
-                            return int(float(x))
-                        except Exception:
-                            return 0
+            return self._parse_disks(output)
 
-                def to_float(x):
-                    try:
-                        return float(x)
-                    except Exception:
-                        try:
-                            return float(x.replace('%', '').strip())
-                        except Exception:
-                            return 0.0
+        except Exception as e:
+            print("DEBUG: get_disks top-level exception:", repr(e))
+            return {"type": "info", "disk_usage": []}
 
-                size_kb = to_int(parts.get('size_kb', 0))
-                used_kb = to_int(parts.get('used_kb', 0))
-                avail_kb = to_int(parts.get('avail_kb', 0))
-                used_percent_raw = parts.get('used_percent', '')
-                # 去掉 % 并转换为浮点数（0-100）
-                used_percent = to_float(used_percent_raw.strip().rstrip('%'))
+    @staticmethod
+    def _disks_script(limit: int = 15) -> str:
+        return (r'''#!/bin/bash
+LIMIT={limit}
+df -k --output=source,size,used,avail,pcent,target | tail -n +2 | head -n $LIMIT | while read -r filesystem size used avail usep mount; do
+    [[ "$filesystem" == "tmpfs" || "$filesystem" == "udev" ]] && continue
+    device_type="physical"
+    if [[ "$filesystem" == *"merged"* ]]; then
+        device_type="docker_overlay"
+    fi
+    dev=$(basename "$filesystem")
+    read_sectors=$(awk -v d="$dev" '$3==d {print $6}' /proc/diskstats 2>/dev/null)
+    write_sectors=$(awk -v d="$dev" '$3==d {print $10}' /proc/diskstats 2>/dev/null)
+    read_sectors=${read_sectors:-0}
+    write_sectors=${write_sectors:-0}
+    printf "device:%s|mount:%s|type:%s|size_kb:%s|used_kb:%s|avail_kb:%s|used_percent:%s|read_sectors:%s|write_sectors:%s\n" \
+        "$filesystem" "$mount" "$device_type" "$size" "$used" "$avail" "$usep" "$read_sectors" "$write_sectors"
+done
+''').replace('{limit}', str(int(limit)))
 
+    def _parse_disks(self, output: str, now: float = None) -> Dict:
+        """解析 df 与 /proc/diskstats 输出并计算读写速率"""
+        now = now or time.time()
+        disks = []
+        if not hasattr(self, "_disk_prev"):
+            self._disk_prev = {}
+
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            parts = {}
+            for pair in line.split('|'):
+                if ':' in pair:
+                    k, v = pair.split(':', 1)
+                    parts[k.strip()] = v.strip()
+
+            device = parts.get('device', '')
+            mount = parts.get('mount', '')
+            dtype = parts.get('type', 'physical')
+
+            # 数值字段转换，容错为 0
+            def to_int(x):
                 try:
-                    read_sectors = int(parts.get('read_sectors', 0))
+                    return int(x)
                 except Exception:
-                    read_sectors = 0
+                    try:
+                        return int(float(x))
+                    except Exception:
+                        return 0
+
+            def to_float(x):
                 try:
-                    write_sectors = int(parts.get('write_sectors', 0))
+                    return float(x)
                 except Exception:
-                    write_sectors = 0
-
-                read_bytes = read_sectors * 512
-                write_bytes = write_sectors * 512
-
-                prev = self._disk_prev.get(device)
-                read_kbps = 0.0
-                write_kbps = 0.0
-                if prev:
-                    dt = now - prev.get("ts", now)
-                    if dt > 0.05:
-                        read_kbps = max(
-                            0.0, (read_bytes - prev.get("read", 0)) / dt / 1024.0)
-                        write_kbps = max(
-                            0.0, (write_bytes - prev.get("write", 0)) / dt / 1024.0)
-
-                # 更新缓存
-                self._disk_prev[device] = {
-                    "read": read_bytes, "write": write_bytes, "ts": now}
-
-                disks.append({
-                    "device": device,
-                    "mount": mount,
-                    "type": dtype,
-                    "size_kb": size_kb,
-                    "used_kb": used_kb,
-                    "avail_kb": avail_kb,
-                    "used_percent": round(used_percent, 2),
-                    "read_kbps": round(read_kbps, 2),
-                    "write_kbps": round(write_kbps, 2),
-                    "read_bytes": read_bytes,
-                    "write_bytes": write_bytes
-                })
-
-            return {"type": "info", "disk_usage": disks}
+                    try:
+                        return float(x.replace('%', '').strip())
+                    except Exception:
+                        return 0.0
 
-        except Exception as e:
-            print("DEBUG: get_disks top-level exception:", repr(e))
-            return {"type": "info", "disk_usage": []}
+            size_kb = to_int(parts.get('size_kb', 0))
+            used_kb = to_int(parts.get('used_kb', 0))
+            avail_kb = to_int(parts.get('avail_kb', 0))
+            used_percent_raw = parts.get('used_percent', '')
+            # 去掉 % 并转换为浮点数（0-100）
+            used_percent = to_float(used_percent_raw.strip().rstrip('%'))
+
+            try:
+                read_sectors = int(parts.get('read_sectors', 0))
+            except Exception:
+                read_sectors = 0
+            try:
+                write_sectors = int(parts.get('write_sectors', 0))
+            except Exception:
+                write_sectors = 0
+
+            read_bytes = read_sectors * 512
+            write_bytes = write_sectors * 512
+
+            prev = self._disk_prev.get(device)
+            read_kbps = 0.0
+            write_kbps = 0.0
+            if prev:
+                dt = now - prev.get("ts", now)
+                if dt > 0.05:
+                    read_kbps = max(
+                        0.0, (read_bytes - prev.get("read", 0)) / dt / 1024.0)
+                    write_kbps = max(
+                        0.0, (write_bytes - prev.get("write", 0)) / dt / 1024.0)
+
+            # 更新缓存
+            self._disk_prev[device] = {
+                "read": read_bytes, "write": write_bytes, "ts": now}
+
+            disks.append({
+                "device": device,
+                "mount": mount,
+                "type": dtype,
+                "size_kb": size_kb,
+                "used_kb": used_kb,
+                "avail_kb": avail_kb,
+                "used_percent": round(used_percent, 2),
+                "read_kbps": round(read_kbps, 2),
+                "write_kbps": round(write_kbps, 2),
+                "read_bytes": read_bytes,
+                "write_bytes": write_bytes
+            })
+
+        return {"type": "info", "disk_usage": disks}
 
     def get_disks_async(self, limit: int = 15, timeout: float = 5.0, callback: Optional[Callable[[Dict], None]] = None):
         """
@@ -1000,27 +1123,7 @@ done
             except Exception:
                 timeout_val = 5.0
 
-            # 使用简单分隔符，本地解析
-            script = (r'''#!/bin/bash
-    LIMIT={limit}
-    ps -eo user,pid,%cpu,rss,comm,cmd --no-headers --sort=-%cpu | head -n $LIMIT | awk 'NR>0 {{
-        # 使用 ASCII 31 (Unit Separator) 作为字段分隔符，避免内容冲突
-        cmd_clean = $0
-        sub(/^[^[:space:]]+[[:space:]]+[0-9]+[[:space:]]+[0-9.]+[[:space:]]+[0-9]+[[:space:]]+[^[:space:]]+[[:space:]]+/, "", cmd_clean)
-        user = $1
-        pid = $2
-        cpu = $3
-        rss_kb = $4
-        comm = $5
-        cmd = cmd_clean
-        
-        # 计算内存 MB
-        mem_mb = rss_kb / 1024
-        
-        # 使用 ASCII 31 (US) 分隔字段，ASCII 30 (RS) 分隔行
-        printf "%s\x1f%s\x1f%s\x1f%.1f\x1f%s\x1f%s\x1e", user, pid, cpu, mem_mb, comm, cmd
-    }}'
-    ''').replace('{limit}', str(int(limit)))
+            script = self._all_processes_script(limit)
 
             output = ""
             if getattr(self, "ssh_client", None):
@@ -1043,32 +1146,60 @@ done
             if not output:
                 return {"type": "info", "all_processes": []}
 
-            # 解析输出：ASCII 30 (RS) 分隔行，ASCII 31 (US) 分隔字段
-            processes = []
-            for line in output.split('\x1e'):
-                if not line.strip():
-                    continue
-                parts = line.split('\x1f')
-                if len(parts) >= 6:
-                    try:
-                        proc = {
-                            "user": parts[0],
-                            "pid": int(parts[1]),
-                            "cpu": float(parts[2]),
-                            "mem_mb": float(parts[3]),
-                            "name": parts[4],
-                            "command": parts[5] if len(parts) > 5 else parts[4]
-                        }
-                        processes.append(proc)
-                    except (ValueError, IndexError) as e:
-                        continue
-
-            return {"type": "info", "all_processes": processes}
+            return self._parse_all_processes(output)
 
         except Exception as e:
             print(f"DEBUG: get_all_processes top-level exception: {e}")
             return {"type": "info", "all_processes": []}
 
+    @staticmethod
+    def _all_processes_script(limit: int = 50) -> str:
+        # 使用简单分隔符，本地解析
+        return (r'''#!/bin/bash
+    LIMIT={limit}
+    ps -eo user,pid,%cpu,rss,comm,cmd --no-headers --sort=-%cpu | head -n $LIMIT | awk 'NR>0 {{
+        # 使用 ASCII 31 (Unit Separator) 作为字段分隔符，避免内容冲突
+        cmd_clean = $0
+        sub(/^[^[:space:]]+[[:space:]]+[0-9]+[[:space:]]+[0-9.]+[[:space:]]+[0-9]+[[:space:]]+[^[:space:]]+[[:space:]]+/, "", cmd_clean)
+        user = $1
+        pid = $2
+        cpu = $3
+        rss_kb = $4
+        comm = $5
+        cmd = cmd_clean
+        
+        # 计算内存 MB
+        mem_mb = rss_kb / 1024
+        
+        # 使用 ASCII 31 (US) 分隔字段，ASCII 30 (RS) 分隔行
+        printf "%s\x1f%s\x1f%s\x1f%.1f\x1f%s\x1f%s\x1e", user, pid, cpu, mem_mb, comm, cmd
+    }}'
+    ''').replace('{limit}', str(int(limit)))
+
+    @staticmethod
+    def _parse_all_processes(output: str) -> Dict:
+        # 解析输出：ASCII 30 (RS) 分隔行，ASCII 31 (US) 分隔字段
+        processes = []
+        for line in output.split('\x1e'):
+            if not line.strip():
+                continue
+            parts = line.split('\x1f')
+            if len(parts) >= 6:
+                try:
+                    proc = {
+                        "user": parts[0],
+                        "pid": int(parts[1]),
+                        "cpu": float(parts[2]),
+                        "mem_mb": float(parts[3]),
+                        "name": parts[4],
+                        "command": parts[5] if len(parts) > 5 else parts[4]
+                    }
+                    processes.append(proc)
+                except (ValueError, IndexError) as e:
+                    continue
+
+        return {"type": "info", "all_processes": processes}
+
     def get_all_processes_async(self, limit: int = 50, timeout: float = 5.0, callback: Optional[Callable[[Dict], None]] = None):
         """
         异步获取 all_processes，使用单后台线程执行一次并通过 callback 返回结果。
@@ -1086,53 +1217,287 @@ done
         thread = threading.Thread(target=_worker, daemon=True)
         thread.start()
 
+    @classmethod
+    def _canonical_kind(cls, kind: str) -> Optional[str]:
+        return cls.KIND_ALIASES.get(kind)
+
     def _fetch_for_kind(self, kind: str):
         """内部：根据 kind 调用对应的同步获取函数并返回 dict"""
         try:
-            if kind in ("top", "top_processes"):
+            kind = self._canonical_kind(kind)
+            if kind == "top":
                 return self.get_top_processes()
-            if kind in ("net", "net_usage"):
+            if kind == "net":
                 return self.get_net_usage()
-            if kind in ("conn", "connections"):
+            if kind == "connections":
                 return self.get_connections()
-            if kind in ("disks", "disk", "storage"):
+            if kind == "disk":
                 return self.get_disks()
-            if kind in ("sysinfo",):
+            if kind == "sysinfo":
                 return {"type": "sysinfo", **self.get_sysinfo_details()}
-            if kind in ("all_processes", "allprocs", "processes", "all"):
+            if kind == "all_processes":
                 return self.get_all_processes()
-            if kind in ("metrics", "system_metrics", "combined"):
+            if kind == "metrics":
                 return self.get_system_metrics()
             # 默认返回空 info
             return {"type": "info"}
         except Exception as e:
             return {"type": "info", "error": str(e)}
 
+    # ---------------------------
+    # 流式 agent
+    # ---------------------------
+    def _collector_script(self, kind: str) -> str:
+        """agent 中 collect_<kind> 的函数体，与单次轮询执行的脚本相同"""
+        return {
+            "metrics": self._metrics_script,
+            "top": self._top_script,
+            "net": self._net_script,
+            "connections": self._connections_script,
+            "disk": self._disks_script,
+            "all_processes": self._all_processes_script,
+            "sysinfo": self._sysinfo_script,
+        }[kind]()
+
+    def _parse_for_kind(self, kind: str, output: str, now: float = None) -> Dict:
+        if kind == "metrics":
+            return self._parse_metrics(output)
+        if kind == "top":
+            return self._parse_top_processes(output)
+        if kind == "net":
+            return self._parse_net_usage(output, now)
+        if kind == "connections":
+            return self._parse_connections(output, now)
+        if kind == "disk":
+            return self._parse_disks(output, now)
+        if kind == "all_processes":
+            return self._parse_all_processes(output)
+        if kind == "sysinfo":
+            return {"type": "sysinfo", **self._parse_sysinfo(output)}
+        return {"type": "info"}
+
+    def _build_agent_command(self, intervals: Dict[str, float]) -> str:
+        """用 resource/processes.sh 模板生成 agent 启动命令，intervals 单位为秒"""
+        with open(resource_path("resource/processes.sh"), encoding="utf-8") as f:
+            template = f.read().replace("\r\n", "\n")
+        collectors = "\n".join(
+            f"collect_{kind}() {{\n{self._collector_script(kind).strip()}\n}}" for kind in intervals)
+        script = template.replace("# @COLLECTORS@", collectors)
+        args = " ".join(f"{kind}={self._interval_cs(interval)}"
+                        for kind, interval in intervals.items())
+        return f"bash -c {shlex.quote(script)} neossh-agent {args}"
+
+    def _stream_intervals(self) -> Dict[str, float]:
+        """当前注册的各 kind 的最小轮询间隔（已按可见性调整，0 表示暂停）"""
+        intervals = {}
+        with self._poll_lock:
+            for entry in self._pollers:
+                kind = self._canonical_kind(entry.get("kind"))
+                if kind is None:
+                    continue
+                interval = float(entry.get("interval", 1.0))
+                intervals[kind] = min(interval, intervals.get(kind, interval))
+        return {kind: self._effective_interval(kind, interval)
+                for kind, interval in intervals.items()}
+
+    @staticmethod
+    def _interval_cs(interval: float) -> int:
+        """秒 -> agent 使用的厘秒，0 保持为暂停"""
+        return max(1, int(interval * 100)) if interval > 0 else 0
+
+    def _sync_agent(self):
+        """register_poll 之后调用：新增 kind 需要重启 agent，间隔变化通过 stdin 通知"""
+        channel = self._agent_channel
+        if channel is None:
+            return
+        wanted = self._stream_intervals()
+        if set(wanted) - set(self._agent_intervals):
+            self._stream_restart.set()
+            return
+        for kind, interval in wanted.items():
+            if interval != self._agent_intervals.get(kind):
+                try:
+                    channel.sendall(
+                        f"interval {kind} {self._interval_cs(interval)}\n".encode())
+                    self._agent_intervals[kind] = interval
+                except Exception:
+                    self._stream_restart.set()
+
+    def _dispatch_frame(self, line: bytes) -> bool:
+        """解析一行 ///{json}End/// 记录并调用该 kind 的所有回调"""
+        line = line.strip()
+        if not (line.startswith(b"///") and line.endswith(b"End///")):
+            return False
+        try:
+            frame = json.loads(line[3:-6])
+            kind = frame["kind"]
+            output = base64.b64decode(frame.get("data", "")).decode(
+                "utf-8", errors="ignore").strip()
+            res = self._parse_for_kind(kind, output, frame.get("ts") or None)
+        except Exception as e:
+            print("DEBUG: monitor agent frame error:", repr(e))
+            return False
+        # 历史按本地时间记录，agent 的 ts 是远端 uptime
+        self.history.record(res)
+        with self._poll_lock:
+            callbacks = [p["callback"] for p in self._pollers
+                         if self._canonical_kind(p.get("kind")) == kind]
+        for callback in callbacks:
+            try:
+                callback(res)
+            except Exception:
+                pass
+        return True
+
+    def _run_agent(self, intervals: Dict[str, float]) -> bool:
+        """启动 agent 并持续读取，直到停止、需要重启或 channel 关闭。返回是否收到过数据"""
+        transport = self.ssh_client.get_transport() if self.ssh_client else None
+        if not transport or not transport.is_active():
+            return False
+        try:
+            channel = transport.open_session()
+            channel.settimeout(self._poll_tick)
+            channel.exec_command(self._build_agent_command(intervals))
+        except Exception as e:
+            print("DEBUG: monitor agent start failed:", repr(e))
+            return False
+
+        # agent 的时间戳是远端 uptime，与轮询模式的本地时间不可混用
+        self._net_prev = {}
+        self._proc_prev = {}
+        self._disk_prev = {}
+        self._agent_intervals = dict(intervals)
+        self._stream_restart.clear()
+        self._agent_channel = channel
+        received = False
+        buffer = b""
+        try:
+            while not self._poll_thread_stop.is_set() and not self._stream_restart.is_set():
+                try:
+                    chunk = channel.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if self._dispatch_frame(line):
+                        received = True
+        except Exception as e:
+            print("DEBUG: monitor agent read error:", repr(e))
+        finally:
+            self._agent_channel = None
+            try:
+                channel.close()
+            except Exception:
+                pass
+        return received
+
+    def _stream_loop(self):
+        """后台线程：维持一个 agent，连续失败时退回逐个 exec_command 的轮询模式"""
+        # 等待同一批 register_poll 完成，避免 agent 刚启动就因新增 kind 重启
+        self._poll_thread_stop.wait(self._poll_tick)
+        failures = 0
+        while not self._poll_thread_stop.is_set():
+            intervals = self._stream_intervals()
+            if not intervals:
+                self._poll_thread_stop.wait(self._poll_tick)
+                continue
+            if self._run_agent(intervals):
+                failures = 0
+            elif not self._stream_restart.is_set():
+                failures += 1
+                if failures >= 3:
+                    print("DEBUG: monitor agent unavailable, falling back to polling")
+                    self.streaming = False
+                    self._poll_loop()
+                    return
+                self._poll_thread_stop.wait(failures)
+
+    def set_visible(self, visible: bool):
+        """
+        由界面调用：会话标签页不可见或窗口最小化时传 False。
+        不可见时各 kind 的间隔乘以 monitor_hidden_slowdown，
+        monitor_hidden_pause_kinds 中的 kind 暂停；恢复可见时立即刷新一次。
+        """
+        visible = bool(visible)
+        if visible == self.visible:
+            return
+        self.visible = visible
+        if visible:
+            now = time.time()
+            with self._poll_lock:
+                for entry in self._pollers:
+                    entry["next"] = now
+        self._poll_wakeup.set()
+        self._sync_agent()
+
+    def _effective_interval(self, kind: str, interval: float) -> float:
+        """按可见性调整后的间隔，0 表示暂停"""
+        if self.visible:
+            return interval
+        if self._canonical_kind(kind) in self.hidden_pause_kinds:
+            return 0.0
+        return interval * self.hidden_slowdown
+
+    def _seed_jitter(self):
+        """用远端地址作种子，同一主机的抖动相位稳定，不同主机互相错开"""
+        try:
+            peer = self.ssh_client.get_transport().getpeername()
+            self._jitter.seed(f"{peer[0]}:{peer[1]}")
+        except Exception:
+            self._jitter.seed()
+
+    def _next_run(self, now: float, interval: float, cost: float) -> float:
+        """
+        下次执行时间：远端命令耗时超过间隔时退避（间隔至少为耗时的 2 倍），
+        再加上 ±10% 的抖动。
+        """
+        delay = max(interval, cost * 2)
+        return now + delay * (1 + self._jitter.uniform(-0.1, 0.1))
+
     def _poll_loop(self):
         """后台线程：轮询注册的回调并按各自 interval 调用"""
+        self._seed_jitter()
+        # 首轮错开相位
+        with self._poll_lock:
+            for entry in self._pollers:
+                entry["next"] = entry.get("next", 0) + self._jitter.uniform(
+                    0, min(1.0, float(entry.get("interval", 1.0))))
         while not self._poll_thread_stop.is_set():
             now = time.time()
             # 复制一份以减少锁住时间
             with self._poll_lock:
                 pollers_copy = list(self._pollers)
+            next_due = now + 5.0
             for entry in pollers_copy:
                 try:
+                    interval = self._effective_interval(
+                        entry.get("kind"), max(0.01, float(entry.get("interval", 1.0))))
+                    if interval <= 0:
+                        continue
                     if now >= entry.get("next", 0):
                         # 获取数据并调用回调（在同一线程中执行，避免线程爆炸）
+                        started = time.time()
                         res = self._fetch_for_kind(entry.get("kind", "info"))
+                        cost = time.time() - started
+                        self.history.record(res)
                         try:
                             entry["callback"](res)
                         except Exception:
                             # 回调抛异常不影响其他任务
                             pass
                         # 更新下次执行时间
-                        entry["next"] = now + \
-                            max(0.01, float(entry.get("interval", 1.0)))
+                        entry["next"] = self._next_run(now, interval, cost)
+                    next_due = min(next_due, entry["next"])
                 except Exception:
                     # 单项出错忽略，继续轮询其他项
                     continue
-            # 休眠较短时间，满足低延迟和低 CPU
-            self._poll_thread_stop.wait(self._poll_tick)
+            # 睡到最近一个任务到期（至少一个 tick），期间可被唤醒
+            timeout = max(self._poll_tick, next_due - time.time())
+            self._poll_wakeup.wait(timeout)
+            self._poll_wakeup.clear()
 
     def _ensure_poller_running(self):
         """确保轮询线程在运行（无则启动）"""
@@ -1140,13 +1505,21 @@ done
             return
         # 清理停止标志并启动线程
         self._poll_thread_stop.clear()
+        target = self._stream_loop if self.streaming and self.ssh_client else self._poll_loop
         self._poll_thread = threading.Thread(
-            target=self._poll_loop, daemon=True)
+            target=target, daemon=True)
         self._poll_thread.start()
 
     def stop_poller(self, join: bool = False):
         """停止轮询线程"""
         self._poll_thread_stop.set()
+        self._poll_wakeup.set()
+        channel = self._agent_channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
         if join and self._poll_thread:
             try:
                 self._poll_thread.join(timeout=1.0)
@@ -1161,6 +1534,7 @@ done
         - kind: "top"|"net"|"conn"|"sysinfo"|"metrics"|"combined" 或同义词
         - interval: 秒，最小 0.01
         - once: 如果为 True，则只执行一次（在后台线程），不会加入持续轮询列表。
+        流式模式（monitor_streaming）下所有 kind 由同一个远端 agent 推送，回调格式不变。
         """
         if not callable(callback):
             return
@@ -1196,7 +1570,9 @@ done
             self._pollers = [p for p in self._pollers if p.get(
                 "callback") != callback]
             self._pollers.append(entry)
+        self._poll_wakeup.set()
         self._ensure_poller_running()
+        self._sync_agent()
 
     def register_one_shot(self, callback: Callable[[Dict], None], kind: str = "info"):
         """
@@ -0,0 +1,162 @@
+# progress_bus.py
+import math
+import threading
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from tools.setting_config import SCM
+
+# 速率平滑的时间常数（秒），越大越稳，越小越跟手
+RATE_TAU = 2.0
+# 没有新采样超过这么久的任务不再刷新（worker 异常退出时不让定时器一直跑）
+STALE_AFTER = 30.0
+# 新任务的第一个采样超过这个量视为断点续传的起点，不计入总速率
+FIRST_SAMPLE_MAX = 1024 * 1024
+# 没有任何进度这么久之后停掉定时器
+IDLE_AFTER = 1.0
+
+
+def _smooth(rate, instant, dt):
+    """Exponential moving average over time; the first sample is taken as is."""
+    if not rate:
+        return instant
+    return rate + (1 - math.exp(-dt / RATE_TAU)) * (instant - rate)
+
+
+class _TaskProgress:
+    __slots__ = ("mode", "percentage", "done", "total", "dirty",
+                 "rate", "frame_done", "last_sample", "last_sent")
+
+    def __init__(self, mode, now):
+        self.mode = mode
+        self.percentage = 0
+        self.done = 0
+        self.total = 0
+        self.dirty = False
+        self.rate = 0.0
+        self.frame_done = None  # bytes at the previous frame
+        self.last_sample = now
+        self.last_sent = 0
+
+
+class ProgressBus(QObject):
+    """
+    Coalesces transfer progress into one batched update per UI frame.
+
+    Workers call `report()` from their own threads for every block; it only
+    stores the latest counters, no event is posted. A GUI-thread timer samples
+    the counters `transfer_progress_fps` times a second, smooths throughput,
+    and emits `frame(updates, rate, eta)` where
+    updates = [(identifier, mode, percentage, bytes_so_far, total_bytes, rate, eta)]
+    and rate / eta are global (eta is -1 while unknown). The global rate counts
+    every byte reported, including files that start and finish between frames.
+
+    State changes (waiting -1, done >= 100) are not coalesced: `report()`
+    returns False for them and the caller emits its usual signal, so they stay
+    ordered with the finished signals. `forget()` drops a finished task.
+    The timer stops while nothing moves.
+    """
+    frame = pyqtSignal(list, float, float)
+    _wake = pyqtSignal()
+
+    # 没有新数据时，也每隔这么久刷新一次速率 / ETA
+    REFRESH_INTERVAL = 1.0
+
+    def __init__(self, fps: int = None, parent=None):
+        super().__init__(parent)
+        fps = int(fps or SCM().read_config().get("transfer_progress_fps", 10))
+        self._lock = threading.Lock()
+        self._tasks = {}  # identifier -> _TaskProgress
+        self._awake = False
+        self._moved = 0   # bytes reported since the previous frame, all tasks
+        self._rate = 0.0
+        self._last_tick = 0
+        self._last_activity = 0
+        self._last_frame = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(15, 1000 // max(1, fps)))
+        self._timer.timeout.connect(self._tick)
+        self._wake.connect(self._start)
+
+    # ---------------------------
+    # Worker side (any thread)
+    # ---------------------------
+    def report(self, identifier, mode, percentage, bytes_so_far, total_bytes) -> bool:
+        """Record a sample; False if the caller has to deliver it itself."""
+        if percentage < 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            task = self._tasks.get(identifier)
+            if task is not None:
+                self._moved += max(0, bytes_so_far - task.done)
+            elif bytes_so_far <= FIRST_SAMPLE_MAX:
+                self._moved += bytes_so_far
+            self._last_activity = now
+            if percentage >= 100:
+                self._tasks.pop(identifier, None)
+            else:
+                if task is None:
+                    task = self._tasks[identifier] = _TaskProgress(mode, now)
+                task.percentage = percentage
+                task.done = bytes_so_far
+                task.total = total_bytes
+                task.dirty = True
+                task.last_sample = now
+            wake = not self._awake
+            self._awake = True
+        if wake:
+            # 跨线程：排队到 GUI 线程里启动定时器
+            self._wake.emit()
+        return percentage < 100
+
+    def forget(self, identifier):
+        with self._lock:
+            self._tasks.pop(identifier, None)
+
+    # ---------------------------
+    # GUI side
+    # ---------------------------
+    def _start(self):
+        if not self._timer.isActive():
+            self._last_tick = time.monotonic()
+            self._timer.start()
+
+    def _tick(self):
+        now = time.monotonic()
+        updates = []
+        remaining = 0
+        with self._lock:
+            dt = now - self._last_tick
+            if dt <= 0:
+                return
+            self._rate = _smooth(self._rate, self._moved / dt, dt)
+            self._moved = 0
+            self._last_tick = now
+            for identifier, task in list(self._tasks.items()):
+                if now - task.last_sample > STALE_AFTER:
+                    del self._tasks[identifier]
+                    continue
+                if task.frame_done is not None:
+                    task.rate = _smooth(
+                        task.rate, max(0, task.done - task.frame_done) / dt, dt)
+                task.frame_done = task.done
+                if task.total > task.done:
+                    remaining += task.total - task.done
+                if not task.dirty and now - task.last_sent < self.REFRESH_INTERVAL:
+                    continue
+                task.dirty = False
+                task.last_sent = now
+                eta = (task.total - task.done) / task.rate \
+                    if task.rate > 0 and task.total else -1.0
+                updates.append((identifier, task.mode, task.percentage,
+                                task.done, task.total, task.rate, eta))
+            idle = not self._tasks and now - self._last_activity > IDLE_AFTER
+            if idle:
+                self._awake = False
+                self._rate = 0.0
+                self._timer.stop()
+            rate = self._rate
+        if updates or idle or now - self._last_frame >= self.REFRESH_INTERVAL:
+            self._last_frame = now
+            eta = remaining / rate if rate > 0 and remaining else -1.0
+            self.frame.emit(updates, rate, eta)
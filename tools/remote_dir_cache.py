@@ -0,0 +1,82 @@
+# remote_dir_cache.py
+import posixpath
+import stat
+import threading
+import time
+
+
+class RemoteDirCache:
+    """
+    Remembers which remote directories are known to exist.
+
+    Uploads used to stat (or even listdir) every component of the target path
+    before each file, which for a tree of many small files costs several round
+    trips per file. Known directories are answered from memory; entries expire
+    after `ttl` seconds and are dropped explicitly when a path is deleted or
+    renamed through the file manager.
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._dirs = {}  # path -> time it was confirmed
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        path = posixpath.normpath(path.replace('\\', '/'))
+        return "/" if path in ("", ".", "//") else path
+
+    def __contains__(self, path: str) -> bool:
+        path = self._normalize(path)
+        if path == "/":
+            return True
+        with self._lock:
+            confirmed = self._dirs.get(path)
+            if confirmed is None:
+                return False
+            if time.monotonic() - confirmed > self.ttl:
+                del self._dirs[path]
+                return False
+            return True
+
+    def add(self, path: str):
+        """Mark `path` and all of its parents as existing."""
+        path = self._normalize(path)
+        now = time.monotonic()
+        with self._lock:
+            while path != "/":
+                self._dirs[path] = now
+                path = posixpath.dirname(path)
+
+    def invalidate(self, path: str):
+        """Forget `path` and everything below it (after delete / rename / move)."""
+        path = self._normalize(path)
+        prefix = path.rstrip("/") + "/"
+        with self._lock:
+            for known in [p for p in self._dirs if p == path or p.startswith(prefix)]:
+                del self._dirs[known]
+
+    def clear(self):
+        with self._lock:
+            self._dirs.clear()
+
+    def ensure(self, sftp, remote_dir: str):
+        """
+        Make sure `remote_dir` exists, creating missing parents.
+        Costs nothing for cached directories and one stat for existing ones.
+        """
+        remote_dir = self._normalize(remote_dir)
+        if remote_dir in self:
+            return
+        try:
+            attr = sftp.stat(remote_dir)
+            if not stat.S_ISDIR(attr.st_mode):
+                raise NotADirectoryError(f"Not a directory: {remote_dir}")
+        except FileNotFoundError:
+            self.ensure(sftp, posixpath.dirname(remote_dir))
+            try:
+                sftp.mkdir(remote_dir)
+            except IOError:
+                # 可能被并发的传输抢先创建了
+                sftp.stat(remote_dir)
+        self.add(remote_dir)
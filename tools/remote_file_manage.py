@@ -1,13 +1,25 @@
 # remote_file_manage.py
 from PyQt5.QtCore import pyqtSignal, QThread, QMutex, QWaitCondition, QThreadPool, QTimer, QEventLoop
 from tools.transfer_worker import TransferWorker
+from tools.bandwidth import BandwidthShaper
+from tools.batch_download import BatchDownloadWorker
+from tools.batch_upload import BatchUploadWorker, scan_local_tree
+from tools.progress_bus import ProgressBus
+from tools.remote_dir_cache import RemoteDirCache
+from tools.sync_diff import plan_download, plan_upload
+from tools.transfer_codecs import CodecSelector
+from tools.transfer_journal import PAUSED, QUEUED, TransferJournal
+from tools.transfer_scheduler import BULK, INTERACTIVE, NORMAL, TransferScheduler
+from tools.ssh_pool import SSHTransportPool
 from tools.setting_config import SCM
 import paramiko
 import traceback
 import socks
 from typing import Dict, List, Optional
 import stat
+import posixpath
 import os
+import socket
 from typing import Tuple
 from datetime import datetime
 import shlex
@@ -35,7 +47,8 @@ class RemoteFileManager(QThread):
     upload_finished = pyqtSignal(str, bool, str)
     # Path, success, error message
     delete_finished = pyqtSignal(str, bool, str)
-    list_dir_finished = pyqtSignal(str, list)  # path, result
+    # path, entries, append：大目录分页发送，第一页 append=False，之后的页追加到视图
+    list_dir_finished = pyqtSignal(str, list, bool)
     # path, result (e.g. "directory"/"file"/False)
     path_check_result = pyqtSignal(str, object)
     # remote_path , local_path , status , error msg,open it
@@ -54,6 +67,10 @@ class RemoteFileManager(QThread):
     mkfile_finished = pyqtSignal(str, bool, str)
     # target_zip_path
     start_to_compression = pyqtSignal(str)
+    # queued transfers, seconds the oldest one has waited
+    transfer_queue_changed = pyqtSignal(int, float)
+    # journal rows (dicts) an earlier run left unfinished for this session
+    interrupted_transfers = pyqtSignal(list)
     # remote_path_path
     start_to_uncompression = pyqtSignal(str)
     compression_finished = pyqtSignal(str, str)
@@ -77,8 +94,15 @@ class RemoteFileManager(QThread):
         # self.heart_timer.timeout.connect(self.keep_heartbeat)
         self.conn = None
         self.sftp = None
-        self.upload_conn = None
-        self.download_conn = None
+        # Dedicated connections for TransferWorkers, created in run()
+        self.transfer_pool = None
+        # Remote directories known to exist, shared by all transfer workers
+        self.remote_dirs = RemoteDirCache()
+        # Compression codec selection for tar streams, probes cached per session
+        self.codecs = CodecSelector()
+        # Rate limits and interactive priority are shared with the terminal of the same login
+        self.bandwidth_key = BandwidthShaper.session_key(
+            self.user, self.host, self.port)
 
         # File_tree
         self.file_tree: Dict = {}
@@ -98,7 +122,25 @@ class RemoteFileManager(QThread):
         config = SCM().read_config()
         max_threads = config.get("max_concurrent_transfers", 4)
         self.thread_pool.setMaxThreadCount(max_threads)
+        # Workers go through the scheduler (priorities, fairness, pause) instead of straight into the pool
+        self.scheduler = TransferScheduler(self.thread_pool)
+        self.scheduler.stats_changed.connect(self.transfer_queue_changed)
+        # Per-block progress is sampled once per UI frame instead of one signal per block
+        self.progress_bus = ProgressBus()
+        self.batch_upload = config.get("transfer_batch_upload", True)
+        self.batch_download = config.get("transfer_batch_download", True)
+        self.batch_max_file_size = int(
+            config.get("transfer_batch_max_file_size", 4194304))
+        # Directory transfers only send files that differ on the other side
+        self.skip_unchanged = config.get("transfer_skip_unchanged", False)
         self.active_workers = {}  # To track active TransferWorker instances
+        # Queued / running transfers are journaled on disk so they survive a restart
+        self.journal = TransferJournal() if config.get(
+            "transfer_journal_enabled", True) else None
+        self.journal_jobs = {}  # identifier -> journal row id
+        self.journal_owner = f"{os.getpid()}:{id(self)}:{time.time()}"
+        if self.journal:
+            self.journal.register_owner(self.journal_owner)
 
     # ---------------------------
     # Main thread loop
@@ -204,6 +246,8 @@ class RemoteFileManager(QThread):
                 raise e
 
             self.jumpbox_conn = jumpbox_conn
+            # Lets the transfer pool close the tunnel together with the connection
+            conn.jumpbox_conn = jumpbox_conn
 
         else:
             print(f"🔗 直接连接到服务器: {self.user}@{self.host}:{self.port}")
@@ -237,14 +281,15 @@ class RemoteFileManager(QThread):
 
     def run(self):
         try:
-            # Create all three connections at the start
             self.conn = self._create_ssh_connection()
-            # self.upload_conn = self._create_ssh_connection()
-            # self.download_conn = self._create_ssh_connection()
+            # Transfer connections are opened lazily on the first transfer
+            self.transfer_pool = SSHTransportPool(
+                self._create_ssh_connection, fallback=self.conn)
 
             self.sftp = self.conn.open_sftp()
             self.sftp_ready.emit()
             self._fetch_user_group_maps()
+            self._offer_interrupted()
             while self._is_running:
                 self.mutex.lock()
                 if not self._tasks:
@@ -270,7 +315,9 @@ class RemoteFileManager(QThread):
                                 task['local_path'],
                                 task['remote_path'],
                                 task['compression'],
-                                task_id=task.get('task_id')
+                                task_id=task.get('task_id'),
+                                delta=task.get('delta', False),
+                                skip_unchanged=task.get('skip_unchanged')
                             )
                         elif ttype == 'delete':
                             self._handle_delete_task(
@@ -284,14 +331,19 @@ class RemoteFileManager(QThread):
                                 task['path'],
                                 task["compression"],
                                 open_it=task["open_it"],
-                                session_id=task.get("session_id")
+                                session_id=task.get("session_id"),
+                                skip_unchanged=task.get('skip_unchanged')
                             )
+                        elif ttype == 'resume_journal':
+                            self._resume_jobs(task['jobs'])
                         elif ttype == 'list_dir':
                             # print(f"Handle:{[task['path']]}")
-                            result = self.list_dir_detailed(task['path'])
-                            # print(f"List dir : {result}")
-                            self.list_dir_finished.emit(
-                                task['path'], result or [])
+                            result = self.list_dir_detailed(
+                                task['path'],
+                                page_callback=partial(self.list_dir_finished.emit, task['path']))
+                            if result is None:
+                                self.list_dir_finished.emit(
+                                    task['path'], [], False)
                         elif ttype == 'check_path':
                             path_to_check = task['path']
                             try:
@@ -358,18 +410,22 @@ class RemoteFileManager(QThread):
         self.wait()
 
     def _cleanup(self):
+        if self.journal:
+            # Transfers still in the journal can be resumed by the next connection
+            self.journal.release_owner(self.journal_owner)
         try:
             if self.sftp:
                 self.sftp.close()
         except Exception:
             pass
+        try:
+            if self.transfer_pool:
+                self.transfer_pool.close()
+        except Exception:
+            pass
         try:
             if self.conn:
                 self.conn.close()
-            # if self.upload_conn:
-            #     self.upload_conn.close()
-            # if self.download_conn:
-            #     self.download_conn.close()
         except Exception:
             pass
 
@@ -399,16 +455,31 @@ class RemoteFileManager(QThread):
         except Exception:
             pass
 
-    def _dispatch_transfer_task(self, action, local_path, remote_path, compression, open_it=False, task_id=None, session_id=None):
+    def _dispatch_transfer_task(self, action, local_path, remote_path, compression, open_it=False, task_id=None, session_id=None, delta=False, skip_unchanged=None):
         """Creates and starts TransferWorker(s) for uploads or downloads."""
+        if skip_unchanged is None:
+            skip_unchanged = self.skip_unchanged
         if action == 'upload':
             self._dispatch_upload_task(
-                local_path, remote_path, compression, open_it, task_id=task_id)
+                local_path, remote_path, compression, open_it, task_id=task_id, delta=delta,
+                skip_unchanged=skip_unchanged)
         elif action == 'download':
             self._dispatch_download_task(
-                remote_path, compression, open_it, session_id=session_id)
+                remote_path, compression, open_it, session_id=session_id, skip_unchanged=skip_unchanged)
 
-    def _dispatch_upload_task(self, local_path, remote_path, compression, open_it, task_id=None):
+    def _plan_sync(self, plan, source, target):
+        """Run a sync_diff plan; None (transfer everything) if it fails."""
+        try:
+            start = time.perf_counter()
+            changed, stats = plan(self.conn, source, target)
+            print(f"🔁 Sync {source} -> {target}: {stats['changed']} of {stats['files']} files changed "
+                  f"({stats['hashed']} hashed) in {time.perf_counter() - start:.2f}s")
+            return changed
+        except Exception as e:
+            print(f"Sync comparison failed, transferring everything: {e}")
+            return None
+
+    def _dispatch_upload_task(self, local_path, remote_path, compression, open_it, task_id=None, delta=False, skip_unchanged=False):
         """Handles dispatching of upload tasks, expanding directories if necessary."""
         # If compression is on and we have a list of paths, treat it as a single batch job.
         if compression and isinstance(local_path, list):
@@ -424,10 +495,19 @@ class RemoteFileManager(QThread):
 
         for path_item in paths_to_process:
             is_dir = os.path.isdir(path_item)
-
-            if is_dir and not compression:
+            only = None
+            if is_dir and not compression and skip_unchanged:
+                only = self._plan_sync(plan_upload, path_item, posixpath.join(
+                    remote_path, os.path.basename(path_item.rstrip(os.sep))))
+
+            if is_dir and not compression and self.batch_upload:
+                self._dispatch_batch_upload(
+                    path_item, remote_path, open_it, task_id=task_id, only=only)
+            elif is_dir and not compression:
                 # Expand directory into a list of files for individual upload
                 all_files = self._list_local_files_recursive(path_item)
+                if only is not None:
+                    all_files = [f for f in all_files if f in only]
                 for file_path in all_files:
                     # For each file, we pass the original directory as 'context'
                     # self._create_and_start_worker(
@@ -439,9 +519,9 @@ class RemoteFileManager(QThread):
                 # self._create_and_start_worker(
                 #     'upload', self.upload_conn, path_item, remote_path, compression, open_it)
                 self._create_and_start_worker(
-                    'upload', self.conn, path_item, remote_path, compression, open_it)
+                    'upload', self.conn, path_item, remote_path, compression, open_it, delta=delta)
 
-    def _dispatch_download_task(self, remote_path, compression, open_it, session_id=None):
+    def _dispatch_download_task(self, remote_path, compression, open_it, session_id=None, skip_unchanged=False):
         """Handles dispatching of download tasks, expanding directories if necessary."""
         paths_to_process = remote_path if isinstance(
             remote_path, list) else [remote_path]
@@ -457,17 +537,35 @@ class RemoteFileManager(QThread):
                 print(f"非压缩下载 {path_item}")
                 is_dir = self.check_path_type(path_item) == "directory"
 
-                if is_dir:
+                if is_dir and skip_unchanged and not open_it:
+                    # Same local layout as TransferWorker._download_item: _ssh_download/<dir name>/...
+                    local_dir = os.path.join(
+                        "_ssh_download", posixpath.basename(path_item.rstrip('/')))
+                    all_files = self._plan_sync(plan_download, path_item, local_dir)
+                    if all_files is None:
+                        all_files, _ = self._list_remote_files_recursive(path_item)
+                    elif not all_files:
+                        # Already up to date, report it like a finished download
+                        self.download_finished.emit(path_item, local_dir, True, "", open_it)
+                        continue
+                    for file_path in all_files:
+                        self._create_and_start_worker(
+                            'download', self.conn, None, file_path, compression, open_it, download_context=path_item, session_id=session_id)
+                elif is_dir and self.batch_download and not open_it:
+                    self._dispatch_batch_download(path_item)
+                elif is_dir:
                     # Expand directory into a list of files for individual download
+                    sizes = {}
                     all_files, dirs_to_create = self._list_remote_files_recursive(
-                        path_item)
+                        path_item, sizes)
                     for file_path in all_files:
                         # For each file, we pass the original directory as 'context'
                         print(f"添加 {file_path} 到任务")
                         # self._create_and_start_worker(
                         #     'download', self.download_conn, None, file_path, compression, open_it, download_context=path_item, session_id=session_id)
                         self._create_and_start_worker(
-                            'download', self.conn, None, file_path, compression, open_it, download_context=path_item, session_id=session_id)
+                            'download', self.conn, None, file_path, compression, open_it, download_context=path_item, session_id=session_id,
+                            size=sizes.get(file_path, 0))
                 else:
                     # It's a single file, a list of files, or a compressed directory
                     # self._create_and_start_worker(
@@ -475,8 +573,11 @@ class RemoteFileManager(QThread):
                     self._create_and_start_worker(
                         'download', self.conn, None, path_item, compression, open_it, session_id=session_id)
 
-    def _list_remote_files_recursive(self, remote_path):
-        """Recursively lists all files in a remote directory. Returns a tuple of (file_paths, dir_paths)."""
+    def _list_remote_files_recursive(self, remote_path, sizes=None):
+        """
+        Recursively lists all files in a remote directory. Returns a tuple of (file_paths, dir_paths).
+        If `sizes` is a dict it is filled with {file_path: size}.
+        """
         file_paths = []
         dir_paths = [remote_path]
 
@@ -492,11 +593,95 @@ class RemoteFileManager(QThread):
                         items_to_scan.append(full_path)
                     else:
                         file_paths.append(full_path)
+                        if sizes is not None:
+                            sizes[full_path] = attr.st_size
             except Exception as e:
                 print(f"Error listing remote directory {current_path}: {e}")
 
         return file_paths, dir_paths
 
+    def _dispatch_batch_upload(self, local_dir, remote_path, open_it, task_id=None, only=None):
+        """
+        Upload a directory as one batch: small files go through a single
+        BatchUploadWorker (one aggregate progress item), files larger than
+        `transfer_batch_max_file_size` keep their own resumable TransferWorker.
+        With `only` (a set of local paths) the other files are skipped.
+        """
+        dirs, small_files, large_files = [], [], []
+        for entry in scan_local_tree(local_dir):
+            if entry[0] == "dir":
+                dirs.append(entry[1])
+            elif only is not None and entry[1] not in only:
+                continue
+            elif entry[2] > self.batch_max_file_size:
+                large_files.append(entry[1])
+            else:
+                small_files.append((entry[1], entry[2]))
+
+        identifier = task_id or local_dir
+        worker = BatchUploadWorker(
+            self.conn, local_dir, remote_path, dirs, small_files,
+            identifier=identifier, pool=self.transfer_pool, dir_cache=self.remote_dirs,
+            bandwidth_key=self.bandwidth_key)
+        worker.signals.finished.connect(self.upload_finished)
+        # Runs in the worker thread: this thread has no event loop to queue a lambda to
+        worker.signals.finished.connect(
+            lambda path, success, msg: self.refresh_paths([remote_path]) if success else None,
+            Qt.DirectConnection)
+        self._connect_progress(worker, "upload")
+        self.active_workers[identifier] = worker
+        self._journal_add(identifier, 'upload', 'dir', local_dir, remote_path,
+                          size=worker.total_bytes)
+        self.scheduler.submit(identifier, worker, BULK,
+                              size=worker.total_bytes, group=local_dir)
+        print(f"📦 Batch upload {local_dir}: {len(dirs)} dirs, {len(small_files)} files, "
+              f"{len(large_files)} large files")
+
+        for file_path in large_files:
+            self._create_and_start_worker(
+                'upload', self.conn, file_path, remote_path, False, open_it, upload_context=local_dir)
+
+    def _dispatch_batch_download(self, remote_dir):
+        """
+        Download a directory as one BatchDownloadWorker: the listing streams in
+        from one remote `find` while pooled SFTP sessions fetch the files, and
+        the directory shows as a single item with aggregate progress.
+        """
+        worker = BatchDownloadWorker(
+            self.conn, remote_dir, identifier=remote_dir, pool=self.transfer_pool,
+            bandwidth_key=self.bandwidth_key)
+        # Runs in the worker thread: this thread has no event loop to queue a lambda to
+        worker.signals.finished.connect(
+            lambda identifier, success, msg: self.download_finished.emit(
+                identifier, worker.local_dir if success else "", success,
+                "" if success else msg, False), Qt.DirectConnection)
+        self._connect_progress(worker, "download")
+        worker.signals.compression_finished.connect(self.compression_finished)
+        self.active_workers[remote_dir] = worker
+        self._journal_add(remote_dir, 'download', 'dir', None, remote_dir)
+        self.scheduler.submit(remote_dir, worker, BULK, group=remote_dir)
+
+    def _connect_progress(self, worker, mode):
+        """
+        Route a worker's progress through the progress bus. The slots run in the
+        worker thread (DirectConnection): intermediate samples only update the
+        bus counters, waiting / completed states keep the queued signal.
+        """
+        signal = self.upload_progress if mode == "upload" else self.download_progress
+        bus = self.progress_bus
+
+        def report(identifier, percentage, bytes_so_far, total_bytes):
+            if not bus.report(identifier, mode, percentage, bytes_so_far, total_bytes):
+                signal.emit(identifier, percentage, bytes_so_far, total_bytes)
+            if self.journal and percentage >= 0:
+                self.journal.progress(self.journal_jobs.get(identifier), bytes_so_far, total_bytes)
+
+        def finished(identifier, success, msg):
+            bus.forget(identifier)
+            self._journal_finish(identifier, success, msg)
+        worker.signals.progress.connect(report, Qt.DirectConnection)
+        worker.signals.finished.connect(finished, Qt.DirectConnection)
+
     def _list_local_files_recursive(self, local_path):
         """Recursively lists all files in a local directory."""
         file_paths = []
@@ -505,8 +690,12 @@ class RemoteFileManager(QThread):
                 file_paths.append(os.path.join(root, file))
         return file_paths
 
-    def _create_and_start_worker(self, action, connection, local_path, remote_path, compression, open_it=False, download_context=None, upload_context=None, task_id=None, session_id=None):
-        """Helper to create, connect signals, and start a single TransferWorker."""
+    def _create_and_start_worker(self, action, connection, local_path, remote_path, compression, open_it=False, download_context=None, upload_context=None, task_id=None, session_id=None, delta=False, size=None):
+        """
+        Helper to create, connect signals, and queue a single TransferWorker.
+        Opens for editing and editor re-uploads are scheduled first; files of an
+        expanded directory share one bulk group, small ones first (`size`).
+        """
         worker = TransferWorker(
             connection,
             action,
@@ -516,7 +705,11 @@ class RemoteFileManager(QThread):
             download_context,
             upload_context,
             task_id,
-            session_id
+            session_id,
+            pool=self.transfer_pool,
+            dir_cache=self.remote_dirs,
+            codecs=self.codecs,
+            bandwidth_key=self.bandwidth_key
         )
 
         # Store open_it parameter in worker for download callback
@@ -524,13 +717,15 @@ class RemoteFileManager(QThread):
             worker._open_it = open_it
 
         if action == 'upload':
+            # Re-upload of an edited file: patch the remote copy instead of resending it
+            worker.delta = delta
             worker.signals.finished.connect(self.upload_finished)
             # Refresh the parent directory of the remote path upon successful upload.
             worker.signals.finished.connect(
                 lambda path, success, msg: self.refresh_paths(
                     [os.path.dirname(remote_path.rstrip('/'))]) if success and remote_path else None
             )
-            worker.signals.progress.connect(self.upload_progress)
+            self._connect_progress(worker, "upload")
             worker.signals.start_to_compression.connect(
                 self.start_to_compression)
             worker.signals.start_to_uncompression.connect(
@@ -542,6 +737,8 @@ class RemoteFileManager(QThread):
             # Create callback function for download completion
             def emit_download_finished(identifier, success, msg):
                 """Emit download finished signal with proper parameters"""
+                self.progress_bus.forget(identifier)
+                self._journal_finish(identifier, success, msg)
                 self.download_finished.emit(
                     identifier,
                     msg if success else "",
@@ -550,8 +747,7 @@ class RemoteFileManager(QThread):
                     worker._open_it
                 )
             worker._download_callback = emit_download_finished
-            worker.signals.progress.connect(
-                self.download_progress, Qt.QueuedConnection)
+            self._connect_progress(worker, "download")
             worker.signals.compression_finished.connect(
                 self.compression_finished)
             worker.signals.start_to_compression.connect(
@@ -559,8 +755,6 @@ class RemoteFileManager(QThread):
             worker.signals.start_to_uncompression.connect(
                 self.start_to_uncompression)
 
-        self.thread_pool.start(worker)
-
         # Track the worker
         if task_id:
             identifier = task_id
@@ -569,6 +763,107 @@ class RemoteFileManager(QThread):
                 local_path if action == 'upload' else remote_path)
         self.active_workers[identifier] = worker
 
+        context = upload_context if action == 'upload' else download_context
+        if (action == 'download' and open_it) or (action == 'upload' and delta):
+            priority = INTERACTIVE
+        elif context:
+            priority = BULK
+        else:
+            priority = NORMAL
+        if size is None:
+            size = 0
+            if action == 'upload' and isinstance(local_path, str) and os.path.isfile(local_path):
+                size = os.path.getsize(local_path)
+        if not (action == 'download' and open_it) and not delta:
+            # Editor opens and re-uploads are not worth resuming after a restart
+            self._journal_add(
+                identifier, action, 'stream' if compression else 'file',
+                local_path, remote_path, compression, context, size)
+        if priority != BULK:
+            # Show the item (waiting) while it is queued, so it can be paused or cancelled
+            worker.signals.progress.emit(identifier, -1, 0, size)
+        self.scheduler.submit(identifier, worker, priority,
+                              size=size, group=context or identifier)
+
+    # ---------------------------
+    # Transfer journal
+    # ---------------------------
+    def _journal_add(self, identifier, action, kind, local_path, remote_path, compression=False, context=None, size=0):
+        if not self.journal:
+            return
+        previous = self.journal_jobs.get(identifier)
+        if previous is not None:
+            # Same path queued again: the newer job replaces the old record
+            self.journal.discard([previous])
+        self.journal_jobs[identifier] = self.journal.add(
+            self.journal_owner, self.bandwidth_key, action, kind, local_path, remote_path,
+            compression, context, identifier, size)
+
+    def _journal_finish(self, identifier, success, msg=""):
+        if not self.journal:
+            return
+        job_id = self.journal_jobs.pop(identifier, None)
+        if job_id is not None:
+            self.journal.finish(job_id, success, "" if success else msg)
+
+    def _journal_discard(self, identifier):
+        job_id = self.journal_jobs.pop(identifier, None)
+        if self.journal and job_id is not None:
+            self.journal.discard([job_id])
+
+    def _offer_interrupted(self):
+        """Hand the transfers an earlier run left unfinished to the UI."""
+        if not self.journal:
+            return
+        jobs = self.journal.claim_interrupted(self.bandwidth_key, self.journal_owner)
+        if jobs:
+            print(f"♻️ {len(jobs)} interrupted transfers found for {self.bandwidth_key}")
+            self.interrupted_transfers.emit(jobs)
+
+    def _resume_jobs(self, jobs):
+        """
+        Queue journaled jobs again. Single files continue from their partial-file
+        checkpoint and directories are re-sent as a skip-unchanged sync, so what
+        already landed is not transferred twice. Compressed streams restart.
+        """
+        self.journal.discard([job["id"] for job in jobs])
+        # 目录任务里单独排队的大文件随目录一起恢复
+        dirs = {(job["action"], job["local_path"] if job["action"] == "upload" else job["remote_path"])
+                for job in jobs if job["kind"] == "dir"}
+        for job in jobs:
+            action, kind = job["action"], job["kind"]
+            if kind == "file" and (action, job["context"]) in dirs:
+                continue
+            if action == "upload":
+                if kind == "file":
+                    self._create_and_start_worker(
+                        'upload', self.conn, job["local_path"], job["remote_path"], False,
+                        upload_context=job["context"])
+                else:
+                    self._dispatch_upload_task(
+                        job["local_path"], job["remote_path"], job["compression"], False,
+                        skip_unchanged=kind == "dir")
+            else:
+                if kind == "file":
+                    self._create_and_start_worker(
+                        'download', self.conn, None, job["remote_path"], False,
+                        download_context=job["context"])
+                else:
+                    self._dispatch_download_task(
+                        job["remote_path"], job["compression"], False,
+                        skip_unchanged=kind == "dir")
+
+    def resume_interrupted(self, jobs):
+        """Resume jobs received through `interrupted_transfers`."""
+        self.mutex.lock()
+        self._tasks.append({'type': 'resume_journal', 'jobs': jobs})
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def discard_interrupted(self, jobs):
+        if self.journal:
+            self.journal.discard([job["id"] for job in jobs])
+
     # ---------------------------
     # Public task API
     # ---------------------------
@@ -577,9 +872,46 @@ class RemoteFileManager(QThread):
         """Cancels an active transfer task."""
         worker = self.active_workers.pop(identifier, None)
         print(worker)
+        # A cancelled transfer is not offered for resuming later
+        self._journal_discard(identifier)
         if worker:
             print('stop loading')
             worker.stop()
+            # A queued worker is run right away so it reports the cancellation as before
+            self.scheduler.cancel(identifier)
+
+    def pause_transfer(self, identifier: str) -> bool:
+        """Hold a queued transfer back until resume_transfer(); running ones are not affected."""
+        paused = self.scheduler.pause(identifier)
+        if paused and self.journal:
+            self.journal.set_state(self.journal_jobs.get(identifier), PAUSED)
+        return paused
+
+    def resume_transfer(self, identifier: str) -> bool:
+        resumed = self.scheduler.resume(identifier)
+        if resumed and self.journal:
+            self.journal.set_state(self.journal_jobs.get(identifier), QUEUED, PAUSED)
+        return resumed
+
+    def pause_queued_transfers(self):
+        self.scheduler.pause_all()
+        self._journal_sync_paused()
+
+    def resume_queued_transfers(self):
+        self.scheduler.resume_all()
+        self._journal_sync_paused()
+
+    def _journal_sync_paused(self):
+        if not self.journal:
+            return
+        for identifier, job_id in list(self.journal_jobs.items()):
+            if self.scheduler.is_paused(identifier):
+                self.journal.set_state(job_id, PAUSED)
+            else:
+                self.journal.set_state(job_id, QUEUED, PAUSED)
+
+    def is_transfer_paused(self, identifier: str) -> bool:
+        return self.scheduler.is_paused(identifier)
 
     def mkdir(self, path: str, callback=None):
         self.mutex.lock()
@@ -791,10 +1123,11 @@ class RemoteFileManager(QThread):
         self.condition.wakeAll()
         self.mutex.unlock()
 
-    def download_path_async(self, path: str, open_it: bool = False, compression=False, session_id: str = None):
+    def download_path_async(self, path: str, open_it: bool = False, compression=False, session_id: str = None, skip_unchanged=None):
         self.mutex.lock()
         self._tasks.append(
-            {'type': 'download_files', 'path': path, "open_it": open_it, "compression": compression, "session_id": session_id})
+            {'type': 'download_files', 'path': path, "open_it": open_it, "compression": compression, "session_id": session_id,
+             'skip_unchanged': skip_unchanged})
         self.condition.wakeAll()
         self.mutex.unlock()
 
@@ -831,7 +1164,7 @@ class RemoteFileManager(QThread):
         self.condition.wakeAll()
         self.mutex.unlock()
 
-    def upload_file(self, local_path, remote_path: str, compression: bool, callback=None, task_id=None):
+    def upload_file(self, local_path, remote_path: str, compression: bool, callback=None, task_id=None, delta=False, skip_unchanged=None):
         """
         Uploads a local file to the remote server asynchronously.
 
@@ -841,6 +1174,9 @@ class RemoteFileManager(QThread):
         Args:
             local_path (str or list): Path to the local file to upload.
             remote_path (str): Target path on the remote server.
+            delta (bool): Re-upload of an edited file, only send the changed blocks.
+            skip_unchanged (bool, optional): For directories, only upload files that
+                differ from the remote copy. None uses `transfer_skip_unchanged`.
             callback (callable, optional): Function to call when upload is complete.
                 Receives two arguments:
                 - success (bool): True if upload succeeded, False otherwise.
@@ -859,6 +1195,8 @@ class RemoteFileManager(QThread):
             'local_path': local_path,
             'remote_path': remote_path,
             'compression': compression,
+            'delta': delta,
+            'skip_unchanged': skip_unchanged,
             'callback': callback,
             'task_id': task_id
         })
@@ -1094,27 +1432,14 @@ class RemoteFileManager(QThread):
 
     def _ensure_remote_directory_exists(self, remote_dir: str) -> Tuple[bool, str]:
         """
-        确保远程目录存在，如果不存在则创建
+        确保远程目录存在，如果不存在则创建（已确认存在的目录走缓存，不再 listdir）
         """
         try:
-            # 尝试列出目录，如果不存在会抛出异常
-            self.sftp.listdir(remote_dir)
+            self.remote_dirs.ensure(self.sftp, remote_dir)
             return True, ""
-        except IOError:
-            try:
-                # 递归创建目录
-                parts = remote_dir.strip('/').split('/')
-                current_path = ''
-                for part in parts:
-                    current_path = current_path + '/' + part if current_path else '/' + part
-                    try:
-                        self.sftp.listdir(current_path)
-                    except IOError:
-                        self.sftp.mkdir(current_path)
-                return True, ""
-            except Exception as e:
-                print(f"创建远程目录失败: {remote_dir}, 错误: {e}")
-                return False, e
+        except Exception as e:
+            print(f"创建远程目录失败: {remote_dir}, 错误: {e}")
+            return False, e
     # ---------------------------
     # 内部文件树操作
     # ---------------------------
@@ -1202,6 +1527,7 @@ class RemoteFileManager(QThread):
 
             # 执行重命名
             self.sftp.rename(path, new_path)
+            self.remote_dirs.invalidate(path)
 
             print(f"✅ 重命名成功: {path} -> {new_path}")
             self.rename_finished.emit(path, new_path, True, "")
@@ -1268,6 +1594,8 @@ class RemoteFileManager(QThread):
 
             if exit_status == 0:
                 print(f"✅ 复制成功: {source_path} -> {target_path}")
+                if cut:
+                    self.remote_dirs.invalidate(source_path)
                 self.copy_finished.emit(source_path, target_path, True, "")
 
                 # 刷新源和目标父目录
@@ -1935,56 +2263,162 @@ class RemoteFileManager(QThread):
             if callback:
                 callback(False, error_msg)
 
-    def list_dir_detailed(self, path: str) -> Optional[List[dict]]:
+    # 第一页尽量小，让界面尽快显示；之后按大页追加
+    LIST_DIR_FIRST_PAGE = 200
+    LIST_DIR_PAGE = 5000
+    LIST_DIR_PAGE_INTERVAL = 0.25
+
+    def list_dir_detailed(self, path: str, page_callback=None) -> Optional[List[dict]]:
+        """
+        列出目录（目录在前）。
+        一次 find -printf 输出全部条目，不再逐个 fork stat；不支持 -printf 的系统（如 busybox）
+        或 find 超时时回退到 SFTP listdir_iter。
+        page_callback(entries, append) 会在读取过程中分页调用，第一页 append=False。
+        条目按到达顺序分页，不在远端排序（sort 要读完全部输入才有输出），由视图把各页合并进有序列表；
+        后续页随已显示的条目数增大，合并次数只随目录大小对数增长。
+        返回完整列表；出错且尚未产生任何分页时返回 None。
+        """
         if self.conn is None:
             print("list_dir_detailed: ssh connection not ready")
             return None
         start_time = time.perf_counter()
         detailed_result = []
-        safe_path = shlex.quote(path)
-        command = f'''
-        sh -c 'cd {safe_path} && for item in * .*; do
-            if [ "$item" = "." ] || [ "$item" = ".." ]; then continue; fi;
-            info=$(stat -c "%A	%s	%Y	%u	%g" "$item" 2>/dev/null);
-            if [ -z "$info" ]; then continue; fi;
-            printf "%s	%s" "$info" "$item";
-            if [ -L "$item" ] && [ -d "$item" ]; then printf "	DIRLINK"; fi;
-            printf "\\0";
-        done'
-        '''
+        page = []
+        state = {"emitted": False, "last_emit": time.perf_counter()}
+
+        def flush(force=False):
+            if state["emitted"]:
+                shown = len(detailed_result) - len(page)
+                limit = max(self.LIST_DIR_PAGE, shown)
+                interval = self.LIST_DIR_PAGE_INTERVAL * \
+                    max(1, shown / self.LIST_DIR_PAGE)
+            else:
+                limit = self.LIST_DIR_FIRST_PAGE
+                interval = self.LIST_DIR_PAGE_INTERVAL
+            if not force and len(page) < limit and not (
+                    page and time.perf_counter() - state["last_emit"] > interval):
+                return
+            if page_callback and (page or not state["emitted"]):
+                page_callback(list(page), state["emitted"])
+                state["emitted"] = True
+            state["last_emit"] = time.perf_counter()
+            page.clear()
+
+        def add(entry):
+            detailed_result.append(entry)
+            page.append(entry)
+            flush()
+
         try:
-            stdin, stdout, stderr = self.conn.exec_command(command, timeout=20)
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error_output = stderr.read().decode('utf-8', errors='ignore').strip()
-            if error_output:
-                print(
-                    f"Error executing remote command for path {path}: {error_output}")
+            try:
+                ok = self._list_dir_find(path, add)
+            except socket.timeout:
+                # 远端 20 秒没有任何输出：已有条目就保留，否则改用 SFTP
+                if detailed_result:
+                    raise
+                print(f"list_dir find timed out for {path}, falling back to SFTP")
+                ok = False
+            if not ok and not detailed_result:
+                ok = self._list_dir_sftp(path, add)
+            if not ok and not detailed_result:
                 return None
-            records = output.strip('\0').split('\0')
-            for record in records:
-                if not record:
-                    continue
-                parts = record.split('	')
-                if len(parts) < 6:
-                    continue
-                perms, size, mtime_unix, uid, gid, filename = parts[:6]
-                is_dir_link = len(parts) > 6 and parts[6] == 'DIRLINK'
-                is_dir = perms.startswith('d') or (
-                    perms.startswith('l') and is_dir_link)
-                owner, group = self._get_owner_group(int(uid), int(gid))
-                detailed_result.append({
-                    "name": filename,
-                    "is_dir": is_dir,
-                    "size": int(size),
-                    "mtime": datetime.fromtimestamp(int(mtime_unix)).strftime('%Y/%m/%d %H:%M'),
-                    "perms": perms,
-                    "owner": f"{owner}/{group}"
-                })
+            flush(force=True)
             end_time = time.perf_counter()
-            print(f"获取远程目录 '{path}' 数据耗时: {end_time - start_time:.4f} 秒")
+            print(f"获取远程目录 '{path}' 数据耗时: {end_time - start_time:.4f} 秒 ({len(detailed_result)} 项)")
             return detailed_result
         except Exception as e:
             print(f"list_dir_detailed (optimized) error: {e}")
+            if detailed_result:
+                flush(force=True)
+                return detailed_result
+            return None
+
+    def _list_dir_entry(self, name, perms, size, mtime, uid, gid, is_dir) -> dict:
+        owner, group = self._get_owner_group(int(uid), int(gid))
+        return {
+            "name": name,
+            "is_dir": is_dir,
+            "size": int(size),
+            "mtime": datetime.fromtimestamp(int(float(mtime))).strftime('%Y/%m/%d %H:%M'),
+            "perms": perms,
+            "owner": f"{owner}/{group}"
+        }
+
+    def _list_dir_superseded(self) -> bool:
+        """队列里已有新的 list_dir 任务（用户已切换目录），当前列表不必再读完"""
+        self.mutex.lock()
+        try:
+            return any(t.get('type') == 'list_dir' for t in self._tasks)
+        finally:
+            self.mutex.unlock()
+
+    def _list_dir_find(self, path: str, add) -> bool:
+        """
+        find -printf 流式读取，每条记录以 \\0 结尾；-xtype d 让指向目录的链接也排在目录中。
+        先输出目录再输出其它条目，各自按 readdir 顺序，排序交给视图。
+        """
+        safe_path = shlex.quote(path)
+        fmt = "'%M\\t%s\\t%T@\\t%U\\t%G\\t%Y\\t%f\\0'"
+        command = (
+            f"cd {safe_path} || exit 2; "
+            f"find . -mindepth 1 -maxdepth 1 -xtype d -printf {fmt}; "
+            f"find . -mindepth 1 -maxdepth 1 ! -xtype d -printf {fmt}"
+        )
+        stdin, stdout, stderr = self.conn.exec_command(
+            f"bash -c {shlex.quote(command)}", timeout=20)
+        channel = stdout.channel
+        buffer = b""
+        while True:
+            chunk = channel.recv(65536)
+            if not chunk:
+                break
+            buffer += chunk
+            *records, buffer = buffer.split(b"\0")
+            for record in records:
+                parts = record.decode('utf-8', errors='ignore').split('\t', 6)
+                if len(parts) < 7:
+                    continue
+                perms, size, mtime, uid, gid, target_type, filename = parts
+                add(self._list_dir_entry(
+                    filename, perms, size, mtime, uid, gid, target_type == 'd'))
+            if self._list_dir_superseded():
+                channel.close()
+                return True
+        if channel.recv_exit_status() != 0:
+            error_output = stderr.read().decode('utf-8', errors='ignore').strip()
+            print(f"Error executing remote command for path {path}: {error_output}")
+            return False
+        return True
+
+    def _list_dir_sftp(self, path: str, add) -> bool:
+        """回退方案：SFTP listdir_iter（服务器返回顺序，不排序）"""
+        if self.sftp is None:
+            return False
+        links = []
+        try:
+            for attr in self.sftp.listdir_iter(path):
+                # listdir_iter 迭代期间不能发其它 SFTP 请求，链接目标等迭代结束后再 stat
+                if stat.S_ISLNK(attr.st_mode or 0):
+                    links.append(attr)
+                    continue
+                add(self._list_dir_sftp_entry(
+                    attr, stat.S_ISDIR(attr.st_mode or 0)))
+            for attr in links:
+                try:
+                    is_dir = stat.S_ISDIR(self.sftp.stat(
+                        f"{path.rstrip('/')}/{attr.filename}").st_mode)
+                except (IOError, OSError):
+                    is_dir = False
+                add(self._list_dir_sftp_entry(attr, is_dir))
+        except (IOError, OSError) as e:
+            print(f"list_dir sftp fallback error for {path}: {e}")
+            return False
+        return True
+
+    def _list_dir_sftp_entry(self, attr, is_dir: bool) -> dict:
+        return self._list_dir_entry(
+            attr.filename, stat.filemode(attr.st_mode or 0), attr.st_size or 0,
+            attr.st_mtime or 0, attr.st_uid or 0, attr.st_gid or 0, is_dir)
 
     def _handle_delete_task(self, paths, callback=None):
         """
@@ -2017,6 +2451,8 @@ class RemoteFileManager(QThread):
 
             if exit_status == 0:
                 print(f"✅ Deletion successful: {paths}")
+                for p in paths:
+                    self.remote_dirs.invalidate(p)
 
                 # 计算所有父目录，刷新文件树
                 parent_dirs = {os.path.dirname(p)
@@ -2149,9 +2585,13 @@ class FileManagerHandler:
         #     partial(self._wrap_show_info, type_="uncompression"))
 
         fm.compression_finished.connect(self._on_compression_finished)
+        fm.transfer_queue_changed.connect(
+            self.session_widget.transfer_progress.set_queue_stats)
         fm.upload_progress.connect(partial(self._on_progress, mode="upload"))
         fm.download_progress.connect(
             partial(self._on_progress, mode="download"))
+        fm.progress_bus.frame.connect(self._on_progress_frame)
+        fm.interrupted_transfers.connect(self._on_interrupted_transfers)
 
         self.session_widget.file_explorer.upload_file.connect(
             self._on_upload_request)
@@ -2191,6 +2631,12 @@ class FileManagerHandler:
         self.parent._show_progresses(path, percentage, bytes_so_far, total_bytes,
                                      self.child_key, mode)
 
+    def _on_interrupted_transfers(self, jobs):
+        self.parent._offer_interrupted_transfers(jobs, self.child_key)
+
+    def _on_progress_frame(self, updates, rate, eta):
+        self.parent._show_progress_frame(updates, rate, eta, self.child_key)
+
     def _on_upload_request(self, local_path, remote_path, compression):
         self.parent._handle_upload_request(self.child_key, local_path, remote_path,
                                            compression, self.fm)
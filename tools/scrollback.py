@@ -0,0 +1,114 @@
+# scrollback.py
+import bisect
+import itertools
+import operator
+import re
+from collections import deque
+
+# 常见的 Shell 提示符：user@host:path$ / user@host:path#
+PROMPT_RE = re.compile(r"[\w\d\._-]+@[\w\d\.-]+:.*[#\$]")
+# str.splitlines() 认定的行尾字符
+_LINE_BREAKS = frozenset("\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+class ScrollbackBuffer:
+    """
+    Plain-text terminal history kept as lines, for the AI tools.
+
+    Lines live in a list used as a ring under a budget of `max_chars`
+    characters: a parallel list of running end offsets lets eviction find the
+    new head with one bisect, and dead lines are only compacted away once half
+    the list is dead. A single line longer than the budget keeps its tail.
+    Prompt lines are indexed as they complete, so the last k command outputs
+    come back in O(k) plus their size instead of re-splitting and
+    regex-scanning the whole history. Lines break where str.splitlines()
+    breaks them, also across chunks. `clean` is applied to the retrieved prompt
+    line and output (escape sequences split across chunks survive the
+    per-chunk stripping).
+    """
+
+    def __init__(self, max_chars=15000, clean=None):
+        self.max_chars = max_chars
+        self.clean = clean or (lambda text: text)
+        self.clear()
+
+    def clear(self):
+        self._lines = []
+        self._ends = []     # running character offset after each line
+        self._head = 0      # first live index in _lines
+        self._base = 0      # line number of _lines[0]
+        self._origin = 0    # character offset where _lines[0] starts
+        self._total = 0     # character offset after the last complete line
+        self._prompts = deque()  # line numbers of prompt lines
+        self._partial = ""  # current line, not terminated yet
+        self._cr = False    # previous chunk ended with \r
+
+    def append(self, text: str):
+        """Add plain (ANSI-stripped) output."""
+        if self._cr and text.startswith("\n"):
+            text = text[1:]
+        self._cr = text.endswith("\r")
+        if not text:
+            return
+        parts = text.splitlines()
+        # 提示符一定含 @，大量输出时整块跳过逐行匹配
+        scan = "@" in text or "@" in self._partial
+        parts[0] = self._partial + parts[0]
+        if text[-1] in _LINE_BREAKS:
+            self._partial = ""
+        else:
+            self._partial = parts.pop()[-self.max_chars:]
+        if parts:
+            count = len(self._lines)
+            if scan:
+                first = self._base + count
+                self._prompts.extend(
+                    first + i for i, line in enumerate(parts) if PROMPT_RE.search(line))
+            self._lines.extend(parts)
+            # 每行长度 + 1（换行）的累加；去掉 initial 那一项
+            self._ends.extend(itertools.accumulate(
+                map(operator.add, map(len, parts), itertools.repeat(1)),
+                initial=self._total))
+            del self._ends[count]
+            self._total = self._ends[-1]
+        self._evict()
+
+    def _evict(self):
+        start = self._total + len(self._partial) - self.max_chars
+        if start <= self._origin:
+            return
+        head = bisect.bisect_left(self._ends, start, max(self._head - 1, 0)) + 1
+        self._head = max(self._head, min(head, len(self._lines)))
+        first = self._base + self._head
+        while self._prompts and self._prompts[0] < first:
+            self._prompts.popleft()
+        if self._head > 64 and self._head * 2 > len(self._lines):
+            self._origin = self._ends[self._head - 1]
+            del self._lines[:self._head]
+            del self._ends[:self._head]
+            self._base += self._head
+            self._head = 0
+
+    def _line(self, number):
+        index = number - self._base
+        return self._partial if index == len(self._lines) else self._lines[index]
+
+    def latest_outputs(self, count=1):
+        """
+        The last `count` commands as [(command, output)], newest first. A
+        command's output is everything between its prompt line and the next
+        prompt; the unterminated current line counts as a prompt too.
+        """
+        marks = list(itertools.islice(reversed(self._prompts), count + 1))
+        if self._partial and PROMPT_RE.search(self._partial):
+            marks.insert(0, self._base + len(self._lines))
+            del marks[count + 1:]
+        results = []
+        for end, start in zip(marks, marks[1:]):
+            prompt_line = self.clean(self._line(start))
+            split_pos = max(prompt_line.rfind('#'), prompt_line.rfind('$'))
+            command = prompt_line[split_pos + 1:].strip() if split_pos != -1 else ""
+            output = "\n".join(
+                self._lines[start - self._base + 1:end - self._base])
+            results.append((command, self.clean(output)))
+        return results
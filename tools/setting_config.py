@@ -39,6 +39,33 @@ class SCM:
             "default_view": "icon",
             "max_concurrent_transfers": 10,
             "compress_upload": False,
+            "sftp_pipeline_enabled": True,
+            "sftp_pipeline_window": 128,
+            "sftp_pipeline_chunk_size": 65536,
+            "sftp_channel_window": 16777216,
+            "transfer_resume_enabled": True,
+            "transfer_resume_verify_tail": True,
+            "transfer_max_retries": 5,
+            "transfer_pool_size": 4,
+            "transfer_pool_idle_timeout": 60,
+            "transfer_pool_health_interval": 15,
+            "monitor_streaming": True,
+            "monitor_hidden_slowdown": 5,
+            "monitor_hidden_pause_kinds": ["top", "all_processes", "connections"],
+            "transfer_batch_upload": True,
+            "transfer_batch_sessions": 4,
+            "transfer_batch_max_file_size": 4194304,
+            "transfer_codec": "auto",
+            "transfer_delta_enabled": True,
+            "transfer_delta_min_size": 1048576,
+            "transfer_skip_unchanged": False,
+            "transfer_rate_limit_kb": 0,
+            "transfer_interactive_priority": True,
+            "transfer_interactive_rate_kb": 256,
+            "transfer_batch_download": True,
+            "transfer_progress_fps": 10,
+            "transfer_journal_enabled": True,
+            "terminal_shell_integration": True,
             "splitter_lr_ratio": [0.2, 0.8],
             "splitter_tb_ratio": [0.5206786850477201, 0.47932131495228],
             "maximized": True,
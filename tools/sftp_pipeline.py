@@ -0,0 +1,238 @@
+# sftp_pipeline.py
+import heapq
+import os
+from collections import deque
+import paramiko
+from paramiko.sftp import CMD_READ, CMD_WRITE, CMD_DATA, CMD_STATUS, SFTP_OK, int64
+from tools.setting_config import SCM
+
+
+def open_transfer_sftp(conn):
+    """
+    Open an SFTP session for bulk transfers. paramiko's default 2 MB channel
+    window caps downloads at 2 MB per round trip whatever the request window;
+    transfer sessions get `sftp_channel_window` instead.
+    """
+    window = int(SCM().read_config().get("sftp_channel_window", 0) or 0)
+    if window <= 0:
+        return conn.open_sftp()
+    return paramiko.SFTPClient.from_transport(conn.get_transport(), window_size=window)
+
+
+def copy_mtime_to_remote(sftp, local_path, remote_path):
+    """
+    Give an uploaded file the local file's mtime, so a later skip-unchanged
+    sync can match the two copies by size and mtime without hashing them.
+    """
+    try:
+        st = os.stat(local_path)
+        sftp.utime(remote_path, (st.st_atime, st.st_mtime))
+    except (IOError, OSError) as e:
+        print(f"Cannot set mtime of {remote_path}: {e}")
+
+
+def copy_mtime_to_local(sftp, remote_path, local_path, mtime=None):
+    """Give a downloaded file the remote file's mtime; `mtime` saves the stat when already known."""
+    try:
+        if mtime is None:
+            mtime = sftp.stat(remote_path).st_mtime
+        os.utime(local_path, (mtime, mtime))
+    except (IOError, OSError) as e:
+        print(f"Cannot set mtime of {local_path}: {e}")
+
+
+class _ResponseCollector:
+    """
+    Receives out-of-band SFTP responses for the requests issued by PipelinedSFTP.
+    paramiko dispatches every reply whose request number is not being waited on
+    synchronously to `fileobj._async_response`, so replies are kept by request
+    number and re-matched with their offset regardless of arrival order.
+    """
+
+    def __init__(self):
+        self.responses = {}
+
+    def _async_response(self, t, msg, num):
+        self.responses[num] = (t, msg)
+
+
+class PipelinedSFTP:
+    """
+    Multi-request SFTP transfer engine.
+
+    sftp.put / sftp.get move a file as one sequential stream, so throughput is
+    capped at roughly window/RTT. This engine keeps up to `window` read or write
+    requests in flight on one SFTP session and reassembles the chunks by offset.
+    Progress callbacks use the same (bytes_so_far, total_bytes) contract as paramiko.
+    """
+
+    def __init__(self, sftp, window: int = None, chunk_size: int = None, is_stopped=None, throttle=None):
+        """
+        :param sftp: paramiko.SFTPClient owned exclusively by the caller's thread
+        :param window: max outstanding requests, defaults to `sftp_pipeline_window`
+        :param chunk_size: bytes per request, defaults to `sftp_pipeline_chunk_size`
+        :param is_stopped: optional callable, the transfer aborts when it returns True
+        :param throttle: optional callable(n) blocking until n more bytes may be requested (rate limit)
+        """
+        config = SCM().read_config()
+        self.sftp = sftp
+        self.window = max(1, int(
+            window or config.get("sftp_pipeline_window", 64)))
+        self.chunk_size = max(1024, int(
+            chunk_size or config.get("sftp_pipeline_chunk_size", 32768)))
+        self.is_stopped = is_stopped or (lambda: False)
+        self.throttle = throttle
+        self._collector = _ResponseCollector()
+
+    # ---------------------------
+    # Request plumbing
+    # ---------------------------
+    def _wait_for(self, num):
+        """Block until the reply for request `num` has arrived and return (type, msg)."""
+        responses = self._collector.responses
+        while num not in responses:
+            self.sftp._read_response()
+        return responses.pop(num)
+
+    def _check_status(self, t, msg):
+        if t != CMD_STATUS:
+            raise IOError(f"Expected status reply, got packet type {t}")
+        code = msg.get_int()
+        if code != SFTP_OK:
+            # Rewind so paramiko can translate the status into the usual exception
+            msg.rewind()
+            msg.get_int()
+            self.sftp._convert_status(msg)
+
+    def _drain(self, pending):
+        """Wait for all outstanding requests so none are left on the session."""
+        while pending:
+            num = pending.popleft()[0]
+            try:
+                self._wait_for(num)
+            except Exception:
+                pass
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def upload(self, local_path, remote_path, callback=None, offset: int = 0, checkpoint=None):
+        """
+        Upload `local_path` to `remote_path`, keeping `window` writes in flight.
+        If `offset` > 0 the remote file is opened for update and data before
+        `offset` is assumed to be present already.
+        `checkpoint(offset)` is called whenever the acknowledged prefix grows.
+        Returns the number of bytes in the local file.
+        """
+        total = os.path.getsize(local_path)
+        mode = "r+b" if offset > 0 else "wb"
+        acked = offset
+        pending = deque()
+
+        with open(local_path, "rb") as local_f, self.sftp.open(remote_path, mode) as remote_f:
+            handle = remote_f.handle
+            local_f.seek(offset)
+            position = offset
+            try:
+                while position < total or pending:
+                    if self.is_stopped():
+                        raise InterruptedError("Transfer was cancelled by user.")
+
+                    while position < total and len(pending) < self.window:
+                        data = local_f.read(self.chunk_size)
+                        if not data:
+                            break
+                        if self.throttle:
+                            self.throttle(len(data))
+                        num = self.sftp._async_request(
+                            self._collector, CMD_WRITE, handle, int64(position), data)
+                        pending.append((num, position, len(data)))
+                        position += len(data)
+
+                    if not pending:
+                        break
+                    num, chunk_offset, length = pending.popleft()
+                    t, msg = self._wait_for(num)
+                    self._check_status(t, msg)
+                    acked += length
+                    if callback:
+                        callback(acked, total)
+                    if checkpoint:
+                        checkpoint(chunk_offset + length)
+            finally:
+                self._drain(pending)
+
+        return total
+
+    def download(self, remote_path, local_path, callback=None, offset: int = 0, checkpoint=None):
+        """
+        Download `remote_path` into `local_path`, keeping `window` reads in flight
+        and writing each reply at its own offset. If `offset` > 0 the existing
+        local file is kept and only the remainder is fetched.
+        `checkpoint(offset)` is called, after flushing the local file, whenever
+        the contiguous prefix written to disk grows.
+        Returns the remote file size.
+        """
+        total = self.sftp.stat(remote_path).st_size
+        mode = "r+b" if offset > 0 and os.path.exists(local_path) else "wb"
+        if mode == "wb":
+            offset = 0
+        received = offset
+        pending = deque()
+        # Ranges still to request; short reads push their remainder back on the left
+        ranges = deque()
+        position = offset
+        while position < total:
+            length = min(self.chunk_size, total - position)
+            ranges.append((position, length))
+            position += length
+        # Start offsets of every range not written yet, requested or not. A
+        # remainder re-requested behind later chunks keeps the checkpoint below it.
+        outstanding = [start for start, _ in ranges]
+        written = set()
+
+        with self.sftp.open(remote_path, "rb") as remote_f, open(local_path, mode) as local_f:
+            handle = remote_f.handle
+            local_f.truncate(total)
+            try:
+                while ranges or pending:
+                    if self.is_stopped():
+                        raise InterruptedError("Transfer was cancelled by user.")
+
+                    while ranges and len(pending) < self.window:
+                        chunk_offset, length = ranges.popleft()
+                        if self.throttle:
+                            self.throttle(length)
+                        num = self.sftp._async_request(
+                            self._collector, CMD_READ, handle, int64(chunk_offset), int(length))
+                        pending.append((num, chunk_offset, length))
+
+                    num, chunk_offset, length = pending.popleft()
+                    t, msg = self._wait_for(num)
+                    if t == CMD_STATUS:
+                        self._check_status(t, msg)
+                        raise EOFError(
+                            f"Unexpected end of file at offset {chunk_offset} (size changed?)")
+                    if t != CMD_DATA:
+                        raise IOError(f"Expected data reply, got packet type {t}")
+                    data = msg.get_string()
+                    local_f.seek(chunk_offset)
+                    local_f.write(data)
+                    written.add(chunk_offset)
+                    if len(data) < length:
+                        ranges.appendleft(
+                            (chunk_offset + len(data), length - len(data)))
+                        heapq.heappush(outstanding, chunk_offset + len(data))
+                    received += len(data)
+                    if callback:
+                        callback(received, total)
+                    if checkpoint:
+                        # Lowest offset still outstanding bounds the contiguous prefix
+                        while outstanding and outstanding[0] in written:
+                            written.discard(heapq.heappop(outstanding))
+                        local_f.flush()
+                        checkpoint(outstanding[0] if outstanding else total)
+            finally:
+                self._drain(pending)
+
+        return total
@@ -0,0 +1,266 @@
+# shell_integration.py
+import re
+import threading
+from urllib.parse import unquote, urlsplit
+
+# 远端提示符钩子，以 ". <file> <file>" 方式 source（$1 为文件自身，读完即删）。
+# 标记：OSC 133;A 提示符  OSC 133;C 命令开始输出  OSC 133;D;<exit> 命令结束
+#       OSC 633;E;<命令行>  OSC 7;file://<host><cwd>  OSC 633;P;NeoSSH=ready 安装完成
+HOOK_SCRIPT = r"""rm -f -- "$1"
+if [ -n "${BASH_VERSION-}" ]; then
+    __neossh_status() {
+        local s=$?
+        if [ -n "$__neossh_running" ]; then
+            printf '\033]133;D;%s\007' "$s"
+            __neossh_running=
+        fi
+        __neossh_last=$s
+        return $s
+    }
+    __neossh_prompt() {
+        printf '\033]7;file://%s%s\007\033]133;A\007' "${HOSTNAME-}" "${PWD//\%/%25}"
+        __neossh_armed=1
+        return $__neossh_last
+    }
+    __neossh_preexec() {
+        [ -n "$__neossh_armed" ] || return
+        [ -n "${COMP_LINE-}" ] && return
+        __neossh_armed=
+        case "$BASH_COMMAND" in __neossh_status*) return ;; esac
+        __neossh_running=1
+        local cmd
+        cmd=$(HISTTIMEFORMAT= builtin history 1)
+        if [ "$cmd" = "$__neossh_hist" ]; then
+            cmd=$BASH_COMMAND
+        else
+            __neossh_hist=$cmd
+            cmd=${cmd#*[0-9]  }
+        fi
+        printf '\033]633;E;%s\007\033]133;C\007' "${cmd//[[:cntrl:]]/ }"
+    }
+    __neossh_hist=$(HISTTIMEFORMAT= builtin history 1)
+    # 已有 DEBUG trap 时不覆盖，只报告目录和退出码
+    if [ -z "$(trap -p DEBUG)" ]; then
+        trap '__neossh_preexec' DEBUG
+        printf '\033]633;P;NeoSSH=commands\007'
+    fi
+    PROMPT_COMMAND="__neossh_status;${PROMPT_COMMAND:+${PROMPT_COMMAND%;};}__neossh_prompt"
+elif [ -n "${ZSH_VERSION-}" ]; then
+    __neossh_precmd() {
+        local s=$?
+        if [ -n "$__neossh_running" ]; then
+            printf '\033]133;D;%s\007' "$s"
+            __neossh_running=
+        fi
+        printf '\033]7;file://%s%s\007\033]133;A\007' "${HOST-}" "${PWD//\%/%25}"
+        return $s
+    }
+    __neossh_preexec() {
+        __neossh_running=1
+        printf '\033]633;E;%s\007\033]133;C\007' "${1//[[:cntrl:]]/ }"
+    }
+    precmd_functions=(__neossh_precmd $precmd_functions)
+    preexec_functions+=(__neossh_preexec)
+    printf '\033]633;P;NeoSSH=commands\007'
+fi
+printf '\033]633;P;NeoSSH=ready\007\r\033[K'
+"""
+
+# 在 exec 通道里执行：登录 shell 是 bash/zsh 时把脚本写入临时文件并输出路径
+SETUP_COMMAND = (
+    'case "${SHELL##*/}" in bash|zsh) umask 077; '
+    'f=$(mktemp "${TMPDIR:-/tmp}/.neossh.XXXXXX") && cat > "$f" && printf %s "$f" ;; '
+    '*) cat > /dev/null ;; esac')
+
+READY_MARK = b"\x1b]633;P;NeoSSH=ready\x07"
+COMMANDS_MARK = b"\x1b]633;P;NeoSSH=commands\x07"
+
+_ESCAPE_RE = re.compile(
+    r"\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)"   # OSC
+    r"|\x1b[PX^_][^\x1b]*\x1b\\"           # DCS / SOS / PM / APC
+    r"|\x1b\[[0-?]*[ -/]*[@-~]"            # CSI
+    r"|\x1b[ -/]*[0-~]")                   # 其它 ESC 序列
+
+
+def plain_text(data: bytes) -> str:
+    """Terminal output bytes as plain text without escape sequences."""
+    text = _ESCAPE_RE.sub("", data.decode("utf-8", errors="replace"))
+    return "\n".join(text.splitlines()).strip("\n").rstrip()
+
+
+class ShellIntegration:
+    """
+    Command boundaries, exit codes and the working directory from the shell
+    itself instead of guessing them from keystrokes and prompt regexes.
+
+    `install_line()` returns the line to type into the shell after the hook
+    script has been written to a remote temp file; the hooks make bash and zsh
+    print OSC 133 (prompt / command start / end with exit code), OSC 633;E
+    (command line) and OSC 7 (cwd) marks around every command.
+
+    `feed()` runs on the reader thread for every output batch and returns the
+    bytes to display plus a list of events:
+
+    - ("ready",): the hooks are installed; `tracks_commands` tells whether
+      they also mark commands (bash keeps a DEBUG trap the user already has)
+    - ("cwd", path): the shell's directory changed
+    - ("started", command)
+    - ("finished", command, exit_code, output): output is the plain text the
+      command printed, its last OUTPUT_LIMIT bytes
+
+    The marks themselves stay in the output (xterm.js ignores them). Only the
+    echo of the install line is hidden, from the temp file name up to the
+    ready mark; `release()` shows it after all if the mark never comes. A mark
+    split across batches is held back until the rest arrives.
+    """
+
+    OUTPUT_LIMIT = 64 * 1024
+    # 超过这个长度仍未结束的 OSC 不再扣留（图片、剪贴板等），原样放行
+    MAX_MARK = 512
+    # 安装回显最多隐藏这么多字节，超出即放弃隐藏
+    HIDE_LIMIT = 64 * 1024
+
+    def __init__(self):
+        self.tracks_commands = False
+        self.cwd = None
+        self._lock = threading.Lock()
+        self._carry = b""
+        self._command = None   # 正在运行的命令，None 表示在提示符处
+        self._pending_command = ""
+        self._output = bytearray()
+        self._token = None
+        self._hidden = None    # None：未在隐藏；bytearray：已隐藏的字节
+        self._tail = b""
+
+    def install_line(self, path: str) -> bytes:
+        """The line that sources the hook file at `path`; hides its echo."""
+        with self._lock:
+            self._token = path.encode()
+            self._tail = b""
+        # 行首空格：HISTCONTROL=ignorespace / HIST_IGNORE_SPACE 下不进历史
+        return f" . {path} {path}\n".encode()
+
+    def release(self) -> bytes:
+        """Stop hiding the install echo; returns what was hidden so far."""
+        with self._lock:
+            return self._release()
+
+    def discard_partial(self):
+        """Output was dropped: a held partial mark no longer continues with what follows."""
+        with self._lock:
+            self._carry = b""
+
+    def current_output(self) -> str:
+        """Plain output of the running command so far."""
+        with self._lock:
+            return plain_text(bytes(self._output))
+
+    def feed(self, data: bytes):
+        with self._lock:
+            events = []
+            carried = bool(self._carry)
+            if carried:
+                data = self._carry + data
+                self._carry = b""
+            if self._token is not None:
+                data = self._hide(data, events)
+            if (carried or self._command is not None or b"\x1b]" in data
+                    or data.endswith(b"\x1b")):
+                data = self._scan(data, events)
+            return data, events
+
+    def _hide(self, data, events):
+        visible = b""
+        window = self._tail + data
+        if self._hidden is None:
+            index = window.find(self._token)
+            if index == -1:
+                self._tail = window[-len(self._token):]
+                return data
+            # 之前已显示的提示符会被脚本输出的 \r\033[K 擦掉
+            start = max(index - len(self._tail), 0)
+            visible, data = data[:start], data[start:]
+            window = data
+            self._hidden = bytearray()
+        index = window.find(READY_MARK)
+        if index == -1:
+            self._hidden += data
+            self._tail = window[-len(READY_MARK):]
+            if len(self._hidden) > self.HIDE_LIMIT:
+                return visible + self._release()
+            return visible
+        end = index + len(READY_MARK) - (len(window) - len(data))
+        self._hidden += data[:end]
+        if COMMANDS_MARK in self._hidden:
+            self.tracks_commands = True
+        self._release()
+        events.append(("ready",))
+        return visible + data[end:]
+
+    def _release(self):
+        hidden = bytes(self._hidden or b"")
+        self._token = None
+        self._hidden = None
+        self._tail = b""
+        return hidden
+
+    def _scan(self, data, events):
+        capture_from = 0
+        pos = 0
+        size = len(data)
+        while True:
+            start = data.find(b"\x1b]", pos)
+            if start == -1:
+                break
+            bel = data.find(b"\x07", start + 2)
+            st = data.find(b"\x1b\\", start + 2)
+            if bel == -1 and st == -1:
+                if size - start <= self.MAX_MARK:
+                    self._carry = data[start:]
+                    size = start
+                break
+            end = bel + 1 if st == -1 or (bel != -1 and bel < st) else st + 2
+            payload = data[start + 2:end - (1 if data[end - 1] == 7 else 2)]
+            pos = end
+            if payload[:4] == b"133;":
+                kind = payload[4:5]
+                if kind == b"C":
+                    self._command = self._pending_command
+                    self._pending_command = ""
+                    self._output.clear()
+                    capture_from = end
+                    self.tracks_commands = True
+                    events.append(("started", self._command))
+                elif kind == b"D" and self._command is not None:
+                    self._collect(data[capture_from:start])
+                    code = payload[6:]
+                    events.append(("finished", self._command,
+                                   int(code) if code.isdigit() else -1,
+                                   plain_text(bytes(self._output))))
+                    self._command = None
+                    self._output.clear()
+            elif payload[:6] == b"633;E;":
+                self._pending_command = payload[6:].decode("utf-8", errors="replace")
+            elif payload[:2] == b"7;":
+                self._set_cwd(payload[2:], events)
+        if not self._carry and size and data[size - 1] == 0x1b:
+            # 批次末尾的 ESC 可能是下一批 "]" 开头的 OSC 的前半
+            self._carry = b"\x1b"
+            size -= 1
+        if self._command is not None:
+            self._collect(data[capture_from:size])
+        return data[:size]
+
+    def _collect(self, chunk):
+        self._output += chunk
+        if len(self._output) > 2 * self.OUTPUT_LIMIT:
+            del self._output[:-self.OUTPUT_LIMIT]
+
+    def _set_cwd(self, url, events):
+        try:
+            path = unquote(urlsplit(url.decode("utf-8", errors="replace")).path)
+        except ValueError:
+            return
+        if path and path != self.cwd:
+            self.cwd = path
+            events.append(("cwd", path))
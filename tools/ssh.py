@@ -1,8 +1,10 @@
 import os
 import re
 import json
+import threading
 import traceback
 import paramiko
+from collections import deque
 from typing import Dict, List
 from PyQt5.QtCore import QThread, QTimer, pyqtSignal
 from tools.atool import resource_path
@@ -13,6 +15,10 @@ import uuid
 import time
 from tools.session_manager import Session
 from tools.monitor import Monitor
+from tools.bandwidth import BandwidthShaper
+from tools.terminal_reader import TerminalReader
+from tools.setting_config import SCM
+from tools.shell_integration import ShellIntegration, HOOK_SCRIPT, SETUP_COMMAND
 
 
 class SSHWorker(QThread):
@@ -24,9 +30,12 @@ class SSHWorker(QThread):
     auth_error = pyqtSignal(str)
     # host_key
     key_verification = pyqtSignal(str)
-    stop_timer_sig = pyqtSignal()
     command_output_ready = pyqtSignal(str, int)
     force_complete = pyqtSignal(str)
+    # shell integration (OSC 133 / OSC 7)
+    cwd_changed = pyqtSignal(str)
+    command_started = pyqtSignal(str)
+    command_finished = pyqtSignal(str, int)
 
     def __init__(self, session_info, parent=None, for_file=False, jumpbox=False):
         super().__init__(parent)
@@ -48,13 +57,9 @@ class SSHWorker(QThread):
         self.conn = None
         self.channel = None
         self.resources_channel = None
-        self.timer = None
+        self.reader = None
         self.for_file = for_file
         self._buffer = b""  # Storing incomplete output data
-        self._output_buffer = b""  # 终端输出缓冲区，用于批量发送
-        self._last_emit_time = 0  # 上次发送时间
-        self._emit_interval = 0.05  # 发送间隔（50ms）
-        self._max_buffer_size = 8192  # 最大缓冲区大小（8KB）
         self.first_boot = False
         # File tree structure
         self.file_tree: Dict = {}
@@ -69,6 +74,13 @@ class SSHWorker(QThread):
         self.completion_timer = None
         self.last_output_time = None
 
+        # 连接后向 bash/zsh 注入提示符钩子，命令边界、退出码和目录由 shell 直接报告
+        self.shell = ShellIntegration() if SCM().read_config().get(
+            "terminal_shell_integration", True) else None
+        self.command_history = deque(maxlen=50)  # (command, exit_code, output)
+        self._shell_capture = None  # None / "pending" / "running"
+        self._output_lock = threading.Lock()
+
     def get_hostkey_fp_hex(self) -> str:
         try:
             transport = self.conn.get_transport()
@@ -98,7 +110,10 @@ class SSHWorker(QThread):
             return None
 
     def handle_force_complete(self, request_id: str):
-        if self.is_capturing:
+        if self._shell_capture is not None:
+            self.command_output_ready.emit(self.shell.current_output(), 0)
+            self._reset_capture_state()
+        elif self.is_capturing:
             self._process_capture_buffer(force=True)
 
     def run(self):
@@ -322,10 +337,12 @@ class SSHWorker(QThread):
                 self.run_command(f"cd {cd_folder}")
             self.connected.emit(True, "Connect Success")
 
-            self.timer = QTimer()
-            self.stop_timer_sig.connect(self.timer.stop)
-            self.timer.timeout.connect(self._check_output)
-            self.timer.start(50)  # 减少到 50ms，但使用批量发送减少 UI 更新频率
+            # 终端输出由读线程阻塞读取，有数据立即处理，空闲时不轮询
+            self.reader = TerminalReader(
+                self.channel, self._on_terminal_output, self._on_terminal_closed,
+                self._on_terminal_dropped)
+            self.reader.start()
+            self._install_shell_integration()
 
             # self.resource_timer = QTimer()
             # self.stop_timer_sig.connect(self.resource_timer.stop)
@@ -425,7 +442,9 @@ class SSHWorker(QThread):
             self.sys_resource,
             self.file_tree_updated,
             self.key_verification,
-            self.stop_timer_sig,
+            self.cwd_changed,
+            self.command_started,
+            self.command_finished,
         ]
         for sig in signals:
             try:
@@ -434,11 +453,9 @@ class SSHWorker(QThread):
                 pass
 
     def _cleanup(self):
-        try:
-            if hasattr(self, "stop_timer_sig"):
-                self.stop_timer_sig.emit()
-        except Exception:
-            pass
+        if self.reader:
+            # 关闭 channel 会唤醒读线程
+            self.reader.stop()
         try:
             if hasattr(self, "completion_timer") and self.completion_timer:
                 self.completion_timer.stop()
@@ -480,85 +497,101 @@ class SSHWorker(QThread):
         except Exception:
             pass
 
-    def _check_output(self):
+    def _on_terminal_output(self, data: bytes):
+        """Called on the reader thread for every flushed batch of shell output."""
+        shell = self.shell
+        if shell is None:
+            self.result_ready.emit(data)
+        else:
+            with self._output_lock:
+                data, events = shell.feed(data)
+                if data:
+                    self.result_ready.emit(data)
+            for event in events:
+                self._on_shell_event(*event)
+        if self.is_capturing and self._shell_capture is None:
+            self.capture_buffer += data
+            self._process_capture_buffer()
+
+    def _on_terminal_dropped(self):
+        """Ctrl+C dropped pending output, on the reader thread."""
+        if self.shell:
+            self.shell.discard_partial()
+
+    def _on_terminal_closed(self):
+        """The shell channel reached EOF or the connection dropped."""
+        if self._shell_capture is not None:
+            self.handle_force_complete("")
+        elif self.is_capturing:
+            self._process_capture_buffer()
+        if not self.is_connection_active():
+            self.error_occurred.emit("SSH连接已断开")
+        # 只有主channel关闭时才退出线程
+        self.quit()
+
+    def _install_shell_integration(self):
+        """
+        Write the prompt hooks to a remote temp file over an exec channel and
+        source it in the interactive shell. Only for bash and zsh login shells;
+        otherwise the terminal keeps the heuristics.
+        """
+        if self.shell is None:
+            return
         try:
-            # 检查连接状态
-            if self.conn and self.conn.get_transport():
-                if not self.conn.get_transport().is_active():
-                    self.error_occurred.emit("SSH连接已断开")
-                    self.quit()
-                    return
-
-            # 检查主channel
-            if self.channel:
-                # 批量读取数据到缓冲区
-                if self.channel.recv_ready():
-                    # 一次性读取更多数据，减少调用次数
-                    while self.channel.recv_ready():
-                        chunk = self.channel.recv(8192)  # 增加读取大小
-                        self._output_buffer += chunk
-                        if self.is_capturing:
-                            self.capture_buffer += chunk
-
-                    # 如果缓冲区达到一定大小，立即发送
-                    if len(self._output_buffer) >= self._max_buffer_size:
-                        self._flush_output_buffer()
-                    # 否则检查是否到了发送时间
-                    else:
-                        current_time = time.time()
-                        if current_time - self._last_emit_time >= self._emit_interval:
-                            self._flush_output_buffer()
-
-                if self.channel.closed or self.channel.exit_status_ready():
-                    # 通道关闭时，发送所有剩余数据
-                    while self.channel.recv_ready():
-                        chunk = self.channel.recv(8192)
-                        self._output_buffer += chunk
-                        if self.is_capturing:
-                            self.capture_buffer += chunk
-                    # 发送剩余缓冲区数据
-                    if self._output_buffer:
-                        self._flush_output_buffer()
-                    # 处理捕获缓冲区
-                    if self.is_capturing:
-                        self._process_capture_buffer()
-                    # 只有主channel关闭时才退出线程
-                    self.quit()
-
-            current_time = time.time()
-            if not hasattr(self, '_last_sysinfo_time'):
-                self._last_sysinfo_time = 0
-
-            if current_time - self._last_sysinfo_time > 2:  # 2秒间隔
-                self._last_sysinfo_time = current_time
-                self.get_sysinfo_async()
-            # # 检查资源channel
-            # if self.resources_channel:
-            #     if self.resources_channel.recv_ready():
-            #         chunk = self.resources_channel.recv(4096)
-            #         # 资源channel的数据专门用于系统资源处理
-            #         self._buffer += chunk
-            #         self._process_sys_resource_buffer()
-
-            #     if self.resources_channel.closed or self.resources_channel.exit_status_ready():
-            #         while self.resources_channel.recv_ready():
-            #             chunk = self.resources_channel.recv(4096)
-            #             self._buffer += chunk
-            #             self._process_sys_resource_buffer()
-            #         # 资源channel关闭不影响主连接，只记录日志
-            #         print("资源监控channel已关闭")
-
+            stdin, stdout, _ = self.conn.exec_command(SETUP_COMMAND, timeout=10)
+            stdin.write(HOOK_SCRIPT)
+            stdin.channel.shutdown_write()
+            path = stdout.read().decode("utf-8", errors="ignore").strip()
         except Exception as e:
-            self.error_occurred.emit(str(e))
+            print(f"Shell integration unavailable: {e}")
+            path = ""
+        if not path:
+            self.shell = None
+            return
+        self.run_command(self.shell.install_line(path), add_newline=False)
+        # 等不到安装完成标记（如 .bashrc 里启动了 tmux）时放出被隐藏的回显
+        QTimer.singleShot(5000, self._release_shell_echo)
 
-    def _flush_output_buffer(self):
-        """发送缓冲区中的数据"""
-        if self._output_buffer:
-            self.result_ready.emit(self._output_buffer)
-            self._output_buffer = b""
-            self._last_emit_time = time.time()
-            if self.is_capturing:
-                self._process_capture_buffer()
+    def _release_shell_echo(self):
+        shell = self.shell
+        if shell is None:
+            return
+        with self._output_lock:
+            hidden = shell.release()
+            if hidden:
+                self.result_ready.emit(hidden)
+
+    def _on_shell_event(self, kind, *args):
+        """Events from ShellIntegration.feed(), on the reader thread."""
+        if kind == "cwd":
+            self.cwd_changed.emit(args[0])
+        elif kind == "started":
+            if self._shell_capture == "pending":
+                self._shell_capture = "running"
+            self.command_started.emit(args[0])
+        elif kind == "finished":
+            command, exit_code, output = args
+            self.command_history.append(args)
+            self.command_finished.emit(command, exit_code)
+            if self._shell_capture == "running":
+                self.command_output_ready.emit(output, exit_code)
+                self._reset_capture_state()
+        elif kind == "ready":
+            print(f"Shell integration installed ({self.user}@{self.host})")
+
+    def tracks_cwd(self) -> bool:
+        """True once the shell reports its directory itself (OSC 7)."""
+        shell = self.shell
+        return shell is not None and shell.cwd is not None
+
+    def tracks_commands(self) -> bool:
+        """True when command boundaries and exit codes come from OSC 133."""
+        shell = self.shell
+        return shell is not None and shell.tracks_commands
+
+    def latest_commands(self, count=1):
+        """The last `count` finished commands as [(command, exit_code, output)], newest first."""
+        return list(self.command_history)[::-1][:count]
 
     def _process_sys_resource_buffer(self):
         try:
@@ -600,6 +633,10 @@ class SSHWorker(QThread):
                     payload = command.encode("utf-8")
                     if add_newline:
                         payload += b"\n"
+            if channel is self.channel:
+                # 终端有输入时让同一会话的批量传输让路
+                BandwidthShaper().note_interactive(
+                    BandwidthShaper.session_key(self.user, self.host, self.port))
             channel.send(payload)
         except Exception as e:
             self.error_occurred.emit(str(e))
@@ -674,6 +711,12 @@ class SSHWorker(QThread):
             self.error_occurred.emit(
                 "Another command capture is already in progress.")
             return
+        if self.tracks_commands():
+            # 输出和退出码在下一条开始的命令结束时由 OSC 133 给出，无需标记和轮询
+            self.is_capturing = True
+            self._shell_capture = "pending"
+            self.run_command(command)
+            return
         unique_id = str(uuid.uuid4())
         self.start_marker = f"START_CMD_MARKER_{unique_id}"
         self.end_marker = f"END_CMD_MARKER_{unique_id}"
@@ -743,6 +786,7 @@ class SSHWorker(QThread):
 
     def _reset_capture_state(self):
         self.is_capturing = False
+        self._shell_capture = None
         self.capture_buffer = b""
         self.start_marker = ""
         self.end_marker = ""
@@ -792,9 +836,25 @@ class SSHWorker(QThread):
             return None, str(e), -1
 
     def send_interrupt(self):
-        """Sends an interrupt signal (Ctrl+C) to the channel."""
+        """
+        Sends an interrupt signal (Ctrl+C) to the channel, ahead of the output
+        still waiting to be shown: that backlog is dropped.
+        """
         try:
             if self.channel and not self.channel.closed:
+                backlog = len(self.channel.in_buffer)
                 self.channel.send(b'\x03')
+                if self.reader and not self.is_capturing:
+                    self.reader.interrupt(backlog)
         except Exception as e:
             self.error_occurred.emit(f"Failed to send interrupt: {e}")
+
+    def acknowledge_output(self, count: int):
+        """The terminal has rendered `count` bytes of result_ready output."""
+        if self.reader:
+            self.reader.acknowledge(count)
+
+    def release_output(self):
+        """The terminal is detached; stop waiting for its acknowledgements."""
+        if self.reader:
+            self.reader.release()
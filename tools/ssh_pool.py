@@ -0,0 +1,179 @@
+# ssh_pool.py
+import threading
+import time
+import paramiko
+from tools.setting_config import SCM
+
+
+class _PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.last_check = time.monotonic()
+
+
+class SSHTransportPool:
+    """
+    Pool of dedicated SSH connections used by transfer workers.
+
+    Every TransferWorker used to open its SFTP channel on the one connection the
+    file manager browses with, so all parallel transfers shared a single TCP
+    stream and cipher thread. The pool hands out up to `size` separate
+    connections, created lazily on demand. Idle connections get a health check
+    before reuse and are closed after `idle_timeout` seconds.
+    When the pool is full, leases are shared on the least loaded connection.
+    """
+
+    def __init__(self, factory, size: int = None, idle_timeout: float = None, health_interval: float = None, fallback=None):
+        """
+        :param factory: callable returning a connected paramiko.SSHClient
+        :param size: max connections, defaults to `transfer_pool_size` (0 disables the pool)
+        :param idle_timeout: seconds before an unused connection is closed
+        :param health_interval: seconds between keepalive probes of idle connections
+        :param fallback: shared connection returned when no pooled one can be created
+        """
+        config = SCM().read_config()
+        self.factory = factory
+        self.size = max(0, int(
+            size if size is not None else config.get("transfer_pool_size", 4)))
+        self.idle_timeout = float(
+            idle_timeout or config.get("transfer_pool_idle_timeout", 60))
+        self.health_interval = float(
+            health_interval or config.get("transfer_pool_health_interval", 15))
+        self.fallback = fallback
+        self._entries = []
+        self._creating = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._reaper = None
+
+    # ---------------------------
+    # Leasing
+    # ---------------------------
+    def acquire(self):
+        """Lease a connection. Must be paired with release()."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise paramiko.ssh_exception.SSHException(
+                        "Transfer connection pool is closed.")
+                self._evict_locked()
+                idle = [e for e in self._entries if e.leases == 0]
+                if idle:
+                    return self._lease_locked(max(idle, key=lambda e: e.last_used))
+                if len(self._entries) + self._creating < self.size:
+                    self._creating += 1
+                    break
+                if self._entries:
+                    return self._lease_locked(min(self._entries, key=lambda e: e.leases))
+                if not self._creating:
+                    return self.fallback
+                # Everything is still connecting, wait for one to come up
+                self._cond.wait(1.0)
+
+        try:
+            conn = self.factory()
+        except Exception as e:
+            print(f"⚠️ Cannot open pooled transfer connection: {e}")
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify_all()
+                if self._entries:
+                    return self._lease_locked(min(self._entries, key=lambda e: e.leases))
+            if self.fallback is not None:
+                return self.fallback
+            raise
+
+        with self._cond:
+            self._creating -= 1
+            entry = _PooledConnection(conn)
+            self._entries.append(entry)
+            self._cond.notify_all()
+            self._start_reaper()
+            print(f"🔗 Transfer pool: {len(self._entries)}/{self.size} connections")
+            return self._lease_locked(entry)
+
+    def release(self, conn, broken: bool = False):
+        """Return a leased connection. `broken` connections are closed immediately."""
+        if conn is None or conn is self.fallback:
+            return
+        with self._cond:
+            entry = next((e for e in self._entries if e.conn is conn), None)
+            if entry is None:
+                return
+            entry.leases = max(0, entry.leases - 1)
+            entry.last_used = time.monotonic()
+            if broken or not self._is_active(conn):
+                self._entries.remove(entry)
+                self._close_connection(conn)
+            self._cond.notify_all()
+
+    def close(self):
+        """Close every pooled connection, used when the session goes away."""
+        with self._cond:
+            self._closed = True
+            entries, self._entries = self._entries, []
+            self._cond.notify_all()
+        self._stop_event.set()
+        for entry in entries:
+            self._close_connection(entry.conn)
+
+    # ---------------------------
+    # Health & eviction
+    # ---------------------------
+    def _lease_locked(self, entry):
+        entry.leases += 1
+        entry.last_used = time.monotonic()
+        return entry.conn
+
+    @staticmethod
+    def _is_active(conn):
+        transport = conn.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _is_healthy(self, entry, now):
+        if not self._is_active(entry.conn):
+            return False
+        if entry.leases == 0 and now - entry.last_check >= self.health_interval:
+            entry.last_check = now
+            try:
+                entry.conn.get_transport().send_ignore()
+            except Exception:
+                return False
+        return True
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        for entry in list(self._entries):
+            if entry.leases:
+                continue
+            if now - entry.last_used > self.idle_timeout or not self._is_healthy(entry, now):
+                self._entries.remove(entry)
+                self._close_connection(entry.conn)
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.idle_timeout, self.health_interval) / 2)
+        while not self._stop_event.wait(interval):
+            with self._cond:
+                self._evict_locked()
+
+    @staticmethod
+    def _close_connection(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        jumpbox_conn = getattr(conn, "jumpbox_conn", None)
+        if jumpbox_conn:
+            try:
+                jumpbox_conn.close()
+            except Exception:
+                pass
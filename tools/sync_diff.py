@@ -0,0 +1,162 @@
+# sync_diff.py
+import hashlib
+import os
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tools.batch_upload import scan_local_tree
+
+HASH_CHUNK = 1024 * 1024
+# 远程 mtime 来自 find 的 %T@，本地来自 os.stat，两边精度不同，按秒比较
+MTIME_WINDOW = 1.0
+
+
+def remote_file_index(conn, remote_root):
+    """
+    {relative_path: (size, mtime)} of every regular file below `remote_root`,
+    from one `find -printf` (NUL separated, so any file name survives).
+    Raises IOError when find fails (no -printf, unreadable paths): an empty
+    index would make every file look unchanged for a download.
+    """
+    cmd = f"find {shlex.quote(remote_root)} -type f -printf '%s %T@ %P\\0' 2>/dev/null"
+    _, stdout, _ = conn.exec_command(cmd)
+    output = stdout.read()
+    status = stdout.channel.recv_exit_status()
+    if status != 0:
+        raise IOError(f"find exited with status {status} for {remote_root}")
+    index = {}
+    for record in output.split(b"\0"):
+        if not record:
+            continue
+        try:
+            size, mtime, rel = record.split(b" ", 2)
+            index[rel.decode("utf-8", errors="surrogateescape")] = (int(size), float(mtime))
+        except ValueError:
+            continue
+    return index
+
+
+def local_file_index(local_root):
+    """{relative_path (posix): (size, mtime, full_path)} of the files below `local_root`."""
+    index = {}
+    for entry in scan_local_tree(local_root):
+        if entry[0] != "file":
+            continue
+        path = entry[1]
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        rel = os.path.relpath(path, local_root).replace(os.sep, "/")
+        index[rel] = (entry[2], mtime, path)
+    return index
+
+
+def remote_hashes(conn, remote_root, rels):
+    """
+    Hash `rels` (relative to `remote_root`) with one sha256sum (md5sum as
+    fallback) run. The names go in on stdin, so the command line stays short
+    however many there are. Returns (algorithm, {relative_path: hexdigest});
+    files that could not be hashed are missing from the dict.
+    """
+    if not rels:
+        return "sha256", {}
+    cmd = (f"cd {shlex.quote(remote_root)} && "
+           "if command -v sha256sum >/dev/null 2>&1; then h=sha256sum; else h=md5sum; fi; "
+           "xargs -0 $h -- 2>/dev/null")
+    stdin, stdout, _ = conn.exec_command(cmd)
+    channel = stdout.channel
+    # 每行输出是摘要加文件名，比输入还长：边发边读，否则两边的 channel 窗口都满了会死锁
+    output = []
+    reader = threading.Thread(target=lambda: output.append(stdout.read()), daemon=True)
+    reader.start()
+    payload = b"\0".join(r.encode("utf-8", errors="surrogateescape") for r in rels)
+    channel.sendall(payload)
+    channel.shutdown_write()
+    reader.join()
+    hashes = {}
+    algorithm = "sha256"
+    for line in (output[0] if output else b"").split(b"\n"):
+        # 以反斜杠开头的行是转义过的文件名（含换行等），按已修改处理
+        if not line or line.startswith(b"\\"):
+            continue
+        digest, _, name = line.partition(b"  ")
+        if not name:
+            continue
+        algorithm = "md5" if len(digest) == 32 else "sha256"
+        hashes[name.decode("utf-8", errors="surrogateescape")] = digest.decode()
+    return algorithm, hashes
+
+
+def _hash_file(path, algorithm):
+    h = hashlib.new(algorithm)
+    try:
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(HASH_CHUNK)
+                if not data:
+                    break
+                h.update(data)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def local_hashes(paths, algorithm, workers=None):
+    """{path: hexdigest} computed in a thread pool (hashlib releases the GIL)."""
+    if not paths:
+        return {}
+    workers = workers or min(8, (os.cpu_count() or 1) + 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(lambda p: _hash_file(p, algorithm), paths)))
+
+
+def _compare(local_index, remote_index):
+    """Split into (changed, candidates): missing/size differs vs. same size, mtime differs."""
+    changed, candidates = [], []
+    for rel, (size, mtime, _) in local_index.items():
+        other = remote_index.get(rel)
+        if other is None or other[0] != size:
+            changed.append(rel)
+        elif abs(other[1] - mtime) >= MTIME_WINDOW:
+            candidates.append(rel)
+    return changed, candidates
+
+
+def _changed_by_hash(conn, remote_root, local_root, candidates):
+    algorithm, remote = remote_hashes(conn, remote_root, candidates)
+    paths = {rel: os.path.join(local_root, *rel.split("/")) for rel in candidates}
+    local = local_hashes(list(paths.values()), algorithm)
+    return [rel for rel in candidates
+            if remote.get(rel) is None or remote[rel] != local.get(paths[rel])]
+
+
+def plan_upload(conn, local_dir, remote_dir):
+    """
+    Local files of `local_dir` that differ from their copy in `remote_dir`
+    (missing, other size, or same size but other content).
+    Returns (set_of_local_paths, stats).
+    """
+    local_index = local_file_index(local_dir)
+    remote_index = remote_file_index(conn, remote_dir)
+    changed, candidates = _compare(local_index, remote_index)
+    changed += _changed_by_hash(conn, remote_dir, local_dir, candidates)
+    stats = {"files": len(local_index), "hashed": len(candidates), "changed": len(changed)}
+    return {local_index[rel][2] for rel in changed}, stats
+
+
+def plan_download(conn, remote_dir, local_dir):
+    """
+    Remote files of `remote_dir` whose copy in `local_dir` is missing or
+    differs. Returns (list_of_remote_paths, stats).
+    """
+    remote_index = remote_file_index(conn, remote_dir)
+    local_index = local_file_index(local_dir) if os.path.isdir(local_dir) else {}
+    # 反过来比较：以远程文件为准
+    swapped = {rel: (size, mtime, None) for rel, (size, mtime) in remote_index.items()}
+    local_view = {rel: (size, mtime) for rel, (size, mtime, _) in local_index.items()}
+    changed, candidates = _compare(swapped, local_view)
+    changed += _changed_by_hash(conn, remote_dir, local_dir, candidates)
+    base = remote_dir.rstrip("/")
+    stats = {"files": len(remote_index), "hashed": len(candidates), "changed": len(changed)}
+    return [f"{base}/{rel}" for rel in changed], stats
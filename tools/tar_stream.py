@@ -0,0 +1,260 @@
+# tar_stream.py
+import os
+import posixpath
+import shlex
+import tarfile
+import time
+from tools.transfer_codecs import CODECS
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _CompressingChannelWriter:
+    """File-like sink that compresses everything written to it into an SSH channel."""
+
+    def __init__(self, channel, codec, throttle=None):
+        self.channel = channel
+        self._compressor = codec.compressor()
+        self.throttle = throttle
+        self.wire_bytes = 0
+
+    def _send(self, out):
+        if out:
+            if self.throttle:
+                self.throttle(len(out))
+            self.channel.sendall(out)
+            self.wire_bytes += len(out)
+
+    def write(self, data):
+        self._send(self._compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        self._send(self._compressor.flush())
+
+
+class _DecompressingReader:
+    """File-like source decompressing a channel stream for tarfile's 'r|' mode."""
+
+    def __init__(self, fileobj, codec, throttle=None):
+        self.fileobj = fileobj
+        self.throttle = throttle
+        self._decompressor = codec.decompressor()
+        self._buffer = b""
+        self._eof = False
+        self.wire_bytes = 0
+
+    def read(self, size=-1):
+        # tarfile 的流模式接受短读，只要不是 EOF 就不能返回空
+        while not self._buffer and not self._eof:
+            data = self.fileobj.read(CHUNK_SIZE)
+            if not data:
+                self._eof = True
+                break
+            self.wire_bytes += len(data)
+            # 下载只能收到后再等：不读时 SSH 窗口填满，服务端随之停下
+            if self.throttle:
+                self.throttle(len(data))
+            self._buffer = self._decompressor.decompress(data)
+        if size is None or size < 0:
+            size = len(self._buffer)
+        out, self._buffer = self._buffer[:size], self._buffer[size:]
+        return out
+
+
+class _ProgressReader:
+    """Wraps a local file so tarfile's reads are reported to `on_read(n)`."""
+
+    def __init__(self, fileobj, on_read):
+        self.fileobj = fileobj
+        self.on_read = on_read
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.on_read(len(data))
+        return data
+
+
+def _local_entries(path):
+    """(local_path, arcname) for `path` and everything below it, parents first."""
+    path = os.path.abspath(path).rstrip(os.sep) or os.sep
+    base = os.path.dirname(path)
+    if os.path.islink(path) or not os.path.isdir(path):
+        yield path, os.path.basename(path)
+        return
+    for root, dirs, files in os.walk(path):
+        yield root, os.path.relpath(root, base)
+        for name in files:
+            full = os.path.join(root, name)
+            yield full, os.path.relpath(full, base)
+        # os.walk 不进入目录软链接，按 tar 的习惯把链接本身打包
+        for name in dirs:
+            full = os.path.join(root, name)
+            if os.path.islink(full):
+                yield full, os.path.relpath(full, base)
+
+
+def _check_stopped(is_stopped):
+    if is_stopped and is_stopped():
+        raise InterruptedError("Transfer was cancelled by user.")
+
+
+def upload_tar_stream(conn, local_paths, remote_dir, callback=None, is_stopped=None, on_channel=None, codec=None, throttle=None):
+    """
+    Pack `local_paths` with tar and extract them into `remote_dir` on the fly.
+
+    The archive never touches either disk: tar output is compressed with
+    `codec` (gzip by default) into the stdin of a remote `tar -x`.
+    `callback(bytes_so_far, total_bytes)` counts uncompressed file bytes.
+    `on_channel(channel)` hands out the exec channel so the caller can close
+    it to cancel. `throttle(n)` rate-limits the compressed bytes sent.
+    Returns {"payload", "wire", "seconds"}.
+    """
+    codec = codec or CODECS["gzip"]
+    entries = []
+    total = 0
+    for path in local_paths:
+        for local_path, arcname in _local_entries(path):
+            entries.append((local_path, arcname))
+            try:
+                if os.path.isfile(local_path) and not os.path.islink(local_path):
+                    total += os.path.getsize(local_path)
+            except OSError:
+                pass
+
+    target = shlex.quote(remote_dir)
+    stdin, stdout, stderr = conn.exec_command(
+        f"mkdir -p {target} && {codec.extract_command(target)}")
+    channel = stdout.channel
+    if on_channel:
+        on_channel(channel)
+
+    done = [0]
+
+    def on_read(n):
+        _check_stopped(is_stopped)
+        done[0] += n
+        if callback and n:
+            callback(done[0], total)
+
+    start = time.perf_counter()
+    try:
+        writer = _CompressingChannelWriter(channel, codec, throttle)
+        with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for local_path, arcname in entries:
+                _check_stopped(is_stopped)
+                try:
+                    info = tar.gettarinfo(local_path, arcname.replace(os.sep, "/"))
+                except OSError as e:
+                    print(f"Skip unreadable entry {local_path}: {e}")
+                    continue
+                if info is None:  # socket / fifo
+                    continue
+                if info.isreg():
+                    with open(local_path, "rb") as f:
+                        tar.addfile(info, _ProgressReader(f, on_read))
+                else:
+                    tar.addfile(info)
+        writer.close()
+        channel.shutdown_write()
+        status = channel.recv_exit_status()
+        if status != 0:
+            raise IOError(
+                f"Remote tar failed ({status}): {stderr.read().decode(errors='ignore').strip()}")
+    finally:
+        channel.close()
+    if callback:
+        callback(total, total)
+    return {"payload": total, "wire": writer.wire_bytes,
+            "seconds": time.perf_counter() - start}
+
+
+def _safe_member(member, dest):
+    """Reject absolute paths, `..` and links escaping `dest`."""
+    if hasattr(tarfile, "data_filter"):
+        return tarfile.data_filter(member, dest)
+    name = member.name
+    if name.startswith("/") or ".." in name.split("/"):
+        raise tarfile.ExtractError(f"Unsafe path in archive: {name}")
+    return member
+
+
+def download_tar_stream(conn, remote_paths, local_dir, callback=None, is_stopped=None, on_channel=None, codec=None, throttle=None):
+    """
+    Stream `remote_paths` (siblings in one directory) as a remote `tar -c`
+    compressed with `codec` and extract into `local_dir` while receiving.
+    Progress counts extracted bytes against a single `du` of the sources.
+    Returns {"payload", "wire", "seconds"}.
+    """
+    codec = codec or CODECS["gzip"]
+    common = posixpath.dirname(remote_paths[0].rstrip("/")) or "/"
+    names = " ".join(shlex.quote(posixpath.basename(p.rstrip("/")))
+                     for p in remote_paths)
+    cd = f"cd {shlex.quote(common)}"
+
+    total = 0
+    try:
+        _, out, _ = conn.exec_command(
+            f"{cd} && du -sbc -- {names} 2>/dev/null | tail -n 1")
+        total = int(out.read().decode(errors="ignore").split()[0])
+    except (ValueError, IndexError):
+        pass
+
+    stdin, stdout, stderr = conn.exec_command(
+        f"{cd} && {codec.create_command(names)}")
+    channel = stdout.channel
+    if on_channel:
+        on_channel(channel)
+
+    done = 0
+    extract_kwargs = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+    os.makedirs(local_dir, exist_ok=True)
+    dest = os.path.abspath(local_dir)
+    reader = _DecompressingReader(stdout, codec, throttle)
+    start = time.perf_counter()
+    try:
+        try:
+            tar = tarfile.open(fileobj=reader, mode="r|")
+        except (tarfile.ReadError, OSError, ValueError):
+            # 远程 tar 直接失败时没有（有效）输出，报告它的 stderr 而不是解压错误
+            status = channel.recv_exit_status()
+            err = stderr.read().decode(errors="ignore").strip()
+            if status != 0 or "NEOSSH_TAR_FAILED" in err:
+                raise IOError(f"Remote tar failed ({status}): {err}")
+            raise
+        with tar:
+            for member in tar:
+                _check_stopped(is_stopped)
+                member = _safe_member(member, dest)
+                if not member.isreg():
+                    tar.extract(member, dest, **extract_kwargs)
+                    continue
+                target = os.path.join(dest, member.name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                src = tar.extractfile(member)
+                with open(target, "wb") as dst:
+                    while True:
+                        data = src.read(CHUNK_SIZE)
+                        if not data:
+                            break
+                        dst.write(data)
+                        done += len(data)
+                        _check_stopped(is_stopped)
+                        if callback:
+                            callback(done, max(total, done))
+                if member.mode is not None:
+                    os.chmod(target, member.mode & 0o777)
+                os.utime(target, (member.mtime, member.mtime))
+        # tar 结尾的填充块不一定被 tarfile 读完，读空后再取退出码
+        while reader.read(CHUNK_SIZE):
+            pass
+        status = channel.recv_exit_status()
+        err = stderr.read().decode(errors="ignore").strip()
+        if status != 0 or "NEOSSH_TAR_FAILED" in err:
+            raise IOError(f"Remote tar failed ({status}): {err}")
+    finally:
+        channel.close()
+    if callback:
+        callback(max(total, done), max(total, done))
+    return {"payload": done, "wire": reader.wire_bytes,
+            "seconds": time.perf_counter() - start}
@@ -0,0 +1,223 @@
+# terminal_reader.py
+import select
+import threading
+import time
+
+READ_CHUNK = 32 * 1024
+# 进入 / 退出备用屏幕（全屏程序：top、less、vim）
+ALT_SCREEN_ENTER = (b"\x1b[?1049h", b"\x1b[?1047h", b"\x1b[?47h")
+ALT_SCREEN_LEAVE = (b"\x1b[?1049l", b"\x1b[?1047l", b"\x1b[?47l")
+SGR_RESET = b"\x1b[0m"
+
+
+def alt_screen_after(data, active: bool) -> bool:
+    """Whether the alternate screen is active after `data`, given its state before."""
+    enter = max(data.rfind(seq) for seq in ALT_SCREEN_ENTER)
+    leave = max(data.rfind(seq) for seq in ALT_SCREEN_LEAVE)
+    if enter == leave == -1:
+        return active
+    return enter > leave
+
+
+class TerminalReader(threading.Thread):
+    """
+    Reads the interactive shell channel on its own thread.
+
+    The thread sleeps in select() on the channel (paramiko signals it through
+    a pipe when data arrives or the channel closes), so output is handled the
+    moment it arrives and an idle session costs no wakeups. Output collects in
+    a bytearray and is flushed adaptively:
+
+    - interactive: a small burst (echo, prompt) is flushed at once, up to
+      INTERACTIVE_BURST times per FLUSH_INTERVAL, which no typist reaches;
+    - bulk: large reads, or small ones arriving faster than that, are batched
+      into one flush per FLUSH_INTERVAL, or earlier once MAX_BATCH bytes wait.
+
+    Flow control: the consumer reports bytes it has actually rendered with
+    `acknowledge()`. Once more than HIGH_WATERMARK flushed bytes are
+    unacknowledged the thread stops reading until that drops below
+    LOW_WATERMARK; the SSH window then fills and the remote program blocks
+    instead of the output piling up in the Qt event queue and xterm.js. Flow
+    control starts with the first acknowledgement, so a consumer that never
+    acknowledges is never throttled. `interrupt()` drops the output that was
+    already waiting when Ctrl+C was sent, up to its last complete line so no
+    escape or UTF-8 sequence is cut, and nothing while a full-screen program
+    has the alternate screen.
+
+    `on_output(bytes)` is called from this thread for every flush,
+    `on_dropped()` after output was dropped and `on_closed()` once the
+    channel reaches EOF or is closed.
+    """
+
+    # 小于这个量的输出立即发送（回显、提示符）
+    INTERACTIVE_MAX = 4096
+    # 每个间隔内最多这么多次立即发送，超过即视为连续输出
+    INTERACTIVE_BURST = 4
+    # 连续输出时两次发送的最小间隔（约一帧）
+    FLUSH_INTERVAL = 0.016
+    # 批量模式下缓冲区达到这个量就不再等待
+    MAX_BATCH = 256 * 1024
+    # 已发出但尚未被终端确认渲染的字节数超过高水位时暂停读取，降到低水位后继续
+    HIGH_WATERMARK = 1024 * 1024
+    LOW_WATERMARK = 256 * 1024
+
+    def __init__(self, channel, on_output, on_closed=None, on_dropped=None):
+        super().__init__(daemon=True, name="TerminalReader")
+        self.channel = channel
+        self.on_output = on_output
+        self.on_closed = on_closed
+        self.on_dropped = on_dropped
+        self._alt_screen = False
+        self._buffer = bytearray()
+        self._last_flush = 0.0
+        self._window_start = 0.0
+        self._window_flushes = 0
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._flow = False
+        self._unacked = 0
+        self._drop = None
+        self._resume = threading.Event()
+        self._resume.set()
+
+    def stop(self):
+        """Let the thread leave; it also ends by itself when the channel closes."""
+        self._stopped = True
+        self._resume.set()
+
+    # ---------------------------
+    # Flow control (any thread)
+    # ---------------------------
+    def acknowledge(self, count):
+        """The consumer has rendered `count` more bytes."""
+        with self._lock:
+            self._flow = True
+            self._unacked = max(0, self._unacked - count)
+            if self._unacked <= self.LOW_WATERMARK:
+                self._resume.set()
+
+    def release(self):
+        """The consumer went away: read freely until it acknowledges again."""
+        with self._lock:
+            self._flow = False
+            self._unacked = 0
+            self._resume.set()
+
+    def interrupt(self, backlog):
+        """
+        Ctrl+C was sent: discard the output still waiting here plus the first
+        `backlog` bytes in the channel, i.e. what had arrived before it.
+        """
+        with self._lock:
+            self._drop = backlog
+            self._resume.set()
+
+    def run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            if not self._stopped:
+                print(f"Terminal reader error: {e}")
+        finally:
+            self._flush()
+            if self.on_closed and not self._stopped:
+                self.on_closed()
+
+    def _loop(self):
+        channel = self.channel
+        while not self._stopped:
+            self._drop_backlog()
+            if self._wait_for_consumer():
+                continue
+            if self._buffer:
+                # 批量模式：等到下一个发送时间点，期间到达的数据并入同一批
+                timeout = self._last_flush + self.FLUSH_INTERVAL - time.monotonic()
+                if timeout <= 0 or len(self._buffer) >= self.MAX_BATCH:
+                    self._flush()
+                    continue
+                readable = select.select([channel], [], [], timeout)[0]
+                if not readable:
+                    self._flush()
+                    continue
+            else:
+                # 空闲时不限时等待，不占 CPU
+                select.select([channel], [], [])
+            if not self._read_available():
+                return
+            if len(self._buffer) < self.INTERACTIVE_MAX and self._interactive_slot():
+                self._flush()
+
+    def _wait_for_consumer(self):
+        """Block while too much output is unacknowledged; True if it waited."""
+        with self._lock:
+            if not self._flow or self._unacked < self.HIGH_WATERMARK:
+                return False
+            self._resume.clear()
+        self._resume.wait()
+        return True
+
+    def _drop_backlog(self):
+        with self._lock:
+            count, self._drop = self._drop, None
+        if count is None or self._alt_screen:
+            # 全屏程序的重绘不能截断，照常显示
+            return
+        backlog = self._buffer
+        while count > 0 and self.channel.recv_ready():
+            data = self.channel.recv(min(count, READ_CHUNK))
+            if not data:
+                break
+            count -= len(data)
+            backlog += data
+        # 只丢到最后一个完整行为止：转义序列、OSC 标记和 UTF-8 字符都不跨行，
+        # 也不丢切换备用屏幕的序列及其后的内容
+        limit = len(backlog)
+        for seq in ALT_SCREEN_ENTER + ALT_SCREEN_LEAVE:
+            index = backlog.find(seq)
+            if index != -1:
+                limit = min(limit, index)
+        cut = backlog.rfind(b"\n", 0, limit) + 1
+        if not cut:
+            return
+        # 被丢弃的部分可能设置过颜色，复位后再显示剩下的输出
+        self._buffer = bytearray(SGR_RESET) + backlog[cut:]
+        print(f"Terminal interrupt: dropped {cut} bytes of pending output")
+        if self.on_dropped:
+            self.on_dropped()
+
+    def _interactive_slot(self):
+        now = time.monotonic()
+        if now - self._window_start >= self.FLUSH_INTERVAL:
+            self._window_start = now
+            self._window_flushes = 0
+        if self._window_flushes >= self.INTERACTIVE_BURST:
+            return False
+        self._window_flushes += 1
+        return True
+
+    def _read_available(self):
+        """Move everything the channel holds into the buffer; False on EOF."""
+        channel = self.channel
+        while True:
+            if channel.recv_stderr_ready():
+                # pty 下 stderr 本已并入 stdout，这里只防止管道一直可读
+                self._buffer += channel.recv_stderr(READ_CHUNK)
+                if not (channel.recv_ready() or channel.closed or channel.eof_received):
+                    return True
+            data = channel.recv(READ_CHUNK)
+            if not data:
+                return False
+            self._buffer += data
+            if not channel.recv_ready() or len(self._buffer) >= self.MAX_BATCH:
+                return True
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._alt_screen = alt_screen_after(data, self._alt_screen)
+        self._last_flush = time.monotonic()
+        with self._lock:
+            self._unacked += len(data)
+        self.on_output(data)
@@ -0,0 +1,128 @@
+# terminal_socket.py
+import secrets
+from PyQt5.QtCore import QByteArray
+from PyQt5.QtNetwork import QHostAddress
+
+try:
+    from PyQt5.QtWebSockets import QWebSocketServer
+except ImportError:  # 缺少 QtWebSockets 时终端退回 QWebChannel + base64
+    QWebSocketServer = None
+
+
+class TerminalSocket:
+    """
+    One terminal's binary output channel to xterm.js.
+
+    Output sent before the page has connected is kept and delivered on
+    connect. Text messages from the page are byte counts it has rendered and
+    go to `on_ack`. `failed` is set when the page reports it cannot use the
+    socket; the caller then falls back to the QWebChannel path and takes the
+    pending output with `take_pending()`.
+    """
+
+    def __init__(self, server, token, url):
+        self._server = server
+        self.token = token
+        self.url = url
+        self.failed = False
+        self.on_ack = None
+        self._client = None
+        self._pending = []
+
+    def send(self, data: bytes) -> bool:
+        """Queue `data` as one binary frame; False if the socket is not usable."""
+        if self.failed:
+            return False
+        if self._client is None:
+            self._pending.append(data)
+        else:
+            self._client.sendBinaryMessage(QByteArray(data))
+        return True
+
+    def take_pending(self) -> bytes:
+        data = b"".join(self._pending)
+        self._pending = []
+        return data
+
+    def close(self):
+        self.failed = True
+        self._pending = []
+        self._server._endpoints.pop(self.token, None)
+        client, self._client = self._client, None
+        if client is not None:
+            client.close()
+            client.deleteLater()
+
+    def _attach(self, client):
+        if self._client is not None:
+            # 页面重新加载：旧连接作废
+            self._client.close()
+            self._client.deleteLater()
+        self._client = client
+        client.disconnected.connect(lambda: self._detach(client))
+        client.textMessageReceived.connect(self._on_message)
+        if self._pending:
+            client.sendBinaryMessage(QByteArray(self.take_pending()))
+
+    def _on_message(self, message):
+        try:
+            count = int(message)
+        except ValueError:
+            return
+        if self.on_ack:
+            self.on_ack(count)
+
+    def _detach(self, client):
+        if self._client is client:
+            self._client = None
+        client.deleteLater()
+
+
+class TerminalSocketServer:
+    """
+    Local WebSocket server that carries terminal output to xterm.js as binary
+    frames, so output needs no base64 round trip through QWebChannel.
+
+    One server per process listens on 127.0.0.1 (free port). Every terminal
+    opens its own endpoint; the URL path holds a random token and connections
+    with an unknown token are refused. `open()` returns None when QtWebSockets
+    is missing or the server cannot listen.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._endpoints = {}
+        self._server = None
+        if QWebSocketServer is None:
+            print("QtWebSockets unavailable, terminal output uses QWebChannel")
+            return
+        server = QWebSocketServer("NeoSSH", QWebSocketServer.NonSecureMode)
+        if not server.listen(QHostAddress.LocalHost, 0):
+            print(f"Terminal socket cannot listen: {server.errorString()}")
+            return
+        server.newConnection.connect(self._on_new_connection)
+        self._server = server
+
+    def open(self):
+        if self._server is None:
+            return None
+        token = secrets.token_urlsafe(24)
+        url = f"ws://127.0.0.1:{self._server.serverPort()}/{token}"
+        endpoint = self._endpoints[token] = TerminalSocket(self, token, url)
+        return endpoint
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            client = self._server.nextPendingConnection()
+            endpoint = self._endpoints.get(client.requestUrl().path().lstrip("/"))
+            if endpoint is None:
+                client.close()
+                client.deleteLater()
+                continue
+            endpoint._attach(client)
@@ -0,0 +1,147 @@
+# transfer_checkpoint.py
+import hashlib
+import json
+import os
+import time
+from tools.setting_config import config_dir
+
+checkpoint_dir = config_dir / "checkpoints"
+
+
+class TransferCheckpoint:
+    """
+    Sidecar manifest for a partially transferred file.
+
+    The manifest records the byte ranges that have been acknowledged, the size and
+    mtime of the source (a changed source invalidates the partial file) and a
+    SHA-256 of the tail chunk that ends at the verified offset, so a retry can
+    check that the partial file still holds what was written before resuming.
+    """
+
+    TAIL_BYTES = 64 * 1024
+    SAVE_INTERVAL = 1.0  # seconds between manifest writes while transferring
+
+    def __init__(self, action: str, source: str, target: str, size: int, mtime: float, verify_tail: bool = True):
+        self.action = action
+        self.source = source
+        self.target = target
+        self.size = int(size)
+        self.mtime = int(mtime or 0)
+        self.verify_tail = verify_tail
+        key = f"{action}|{source}|{target}"
+        self.path = checkpoint_dir / \
+            f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+        self.ranges = []
+        self._last_save = 0
+
+    # ---------------------------
+    # Resume
+    # ---------------------------
+    def resume_offset(self, read_partial) -> int:
+        """
+        Return the offset a retry may continue from, or 0 to start over.
+
+        :param read_partial: callable(start, length) -> bytes reading the partial file
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        if (manifest.get("source") != self.source or manifest.get("size") != self.size
+                or manifest.get("mtime") != self.mtime):
+            print(f"Source changed since last attempt, restarting: {self.source}")
+            self.clear()
+            return 0
+
+        self.ranges = [tuple(r) for r in manifest.get("ranges", [])]
+        offset = self.verified_offset()
+        if offset <= 0:
+            return 0
+
+        if self.verify_tail and manifest.get("tail_sha256"):
+            start = max(0, offset - self.TAIL_BYTES)
+            try:
+                tail = read_partial(start, offset - start)
+            except Exception as e:
+                print(f"Cannot read partial file tail, restarting: {e}")
+                return 0
+            if hashlib.sha256(tail).hexdigest() != manifest["tail_sha256"]:
+                print(f"Partial file tail mismatch, restarting: {self.target}")
+                self.ranges = []
+                return 0
+
+        print(f"♻️ Resuming {self.source} at {offset}/{self.size}")
+        return offset
+
+    def verified_offset(self) -> int:
+        """End of the contiguous range that starts at byte zero."""
+        end = 0
+        for start, stop in sorted(self.ranges):
+            if start > end:
+                break
+            end = max(end, stop)
+        return end
+
+    # ---------------------------
+    # Recording
+    # ---------------------------
+    def record(self, offset: int, read_data, force: bool = False):
+        """
+        Mark [0, offset) as done and persist the manifest at most every SAVE_INTERVAL.
+
+        :param read_data: callable(start, length) -> bytes returning the data just
+                          before `offset`, used for the tail hash
+        """
+        self.ranges = [(0, int(offset))]
+        now = time.time()
+        if not force and now - self._last_save < self.SAVE_INTERVAL:
+            return
+        self._last_save = now
+
+        manifest = {
+            "action": self.action,
+            "source": self.source,
+            "target": self.target,
+            "size": self.size,
+            "mtime": self.mtime,
+            "ranges": [list(r) for r in self.ranges],
+            "updated_at": now,
+        }
+        if self.verify_tail and offset > 0:
+            start = max(0, offset - self.TAIL_BYTES)
+            try:
+                manifest["tail_sha256"] = hashlib.sha256(
+                    read_data(start, offset - start)).hexdigest()
+            except Exception as e:
+                print(f"Failed to hash checkpoint tail: {e}")
+
+        try:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            temp_path = str(self.path) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to write transfer checkpoint: {e}")
+
+    def clear(self):
+        """Remove the manifest once the transfer has completed or restarted."""
+        self.ranges = []
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def read_local_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def read_remote_range(sftp, path: str, start: int, length: int) -> bytes:
+    with sftp.open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
@@ -0,0 +1,330 @@
+# transfer_codecs.py
+import os
+import shlex
+import threading
+import time
+import zlib
+import numpy as np
+from tools.setting_config import SCM
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = None
+
+MB = 1024 * 1024
+
+
+class _Identity:
+    def compress(self, data):
+        return data
+
+    decompress = compress
+
+    def flush(self):
+        return b""
+
+
+class _Lz4Compressor:
+    def __init__(self):
+        self._compressor = lz4frame.LZ4FrameCompressor()
+        self._header = self._compressor.begin()
+
+    def compress(self, data):
+        out = self._compressor.compress(data)
+        if self._header:
+            out, self._header = self._header + out, b""
+        return out
+
+    def flush(self):
+        return self._header + self._compressor.flush()
+
+
+class Codec:
+    """
+    One stream codec: how to (de)compress locally and which remote command
+    does the other end. Speeds are rough MB/s per core used by the selector.
+    """
+
+    def __init__(self, name, tool, remote_compress, remote_decompress, compress_speed, decompress_speed, threaded=False):
+        self.name = name
+        self.tool = tool  # remote binary that must exist, None for no dependency
+        self.remote_compress = remote_compress
+        self.remote_decompress = remote_decompress
+        self.compress_speed = compress_speed
+        self.decompress_speed = decompress_speed
+        self.threaded = threaded
+
+    def local_available(self):
+        if self.name == "zstd":
+            return zstandard is not None
+        if self.name == "lz4":
+            return lz4frame is not None
+        return True
+
+    def compressor(self):
+        if self.name == "gzip":
+            return zlib.compressobj(6, zlib.DEFLATED, 31)
+        if self.name == "zstd":
+            return zstandard.ZstdCompressor(level=3, threads=-1).compressobj()
+        if self.name == "lz4":
+            return _Lz4Compressor()
+        return _Identity()
+
+    def decompressor(self):
+        if self.name == "gzip":
+            return zlib.decompressobj(47)
+        if self.name == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        if self.name == "lz4":
+            return lz4frame.LZ4FrameDecompressor()
+        return _Identity()
+
+    def extract_command(self, target):
+        """Remote shell command extracting a stream in this codec into `target`."""
+        if self.remote_decompress:
+            return f"{self.remote_decompress} | tar -xf - -C {target}"
+        return f"tar -xf - -C {target}"
+
+    def create_command(self, names):
+        """
+        Remote shell command writing a tar of `names` in this codec to stdout.
+        A failing tar is reported on stderr since the pipeline status is the compressor's.
+        """
+        tar = f"tar -cf - -- {names}"
+        if not self.remote_compress:
+            return tar
+        return f"{{ {tar} || echo \"NEOSSH_TAR_FAILED $?\" >&2; }} | {self.remote_compress}"
+
+
+CODECS = {
+    "none": Codec("none", None, "", "", float("inf"), float("inf")),
+    "gzip": Codec("gzip", "gzip", "gzip -c -6", "gzip -dc", 45, 300),
+    "zstd": Codec("zstd", "zstd", "zstd -q -c -3 -T0", "zstd -q -dc", 350, 1000, threaded=True),
+    "lz4": Codec("lz4", "lz4", "lz4 -q -c -1", "lz4 -q -dc", 700, 3000),
+}
+
+
+def byte_entropy(data: bytes) -> float:
+    """Order-0 Shannon entropy in bits per byte."""
+    if not data:
+        return 0.0
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    p = counts[counts > 0] / len(data)
+    return float(-(p * np.log2(p)).sum())
+
+
+def sample_local(paths, max_files: int = 16, per_file: int = 32 * 1024):
+    """
+    Read the head of up to `max_files` files (largest first) below `paths`.
+    Returns [(size, sample_bytes)] so the estimate can be weighted by size.
+    """
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, _, names in os.walk(path):
+            files.extend(os.path.join(root, n) for n in names)
+            if len(files) >= max_files * 16:
+                break
+    sized = []
+    for f in files:
+        try:
+            sized.append((os.path.getsize(f), f))
+        except OSError:
+            pass
+    sized.sort(reverse=True)
+    samples = []
+    for size, f in sized[:max_files]:
+        try:
+            with open(f, "rb") as fh:
+                # 跳过文件头，避免只采到 magic / 元数据
+                fh.seek(min(size // 2, 4096))
+                samples.append((size, fh.read(per_file)))
+        except OSError:
+            pass
+    return samples
+
+
+def sample_remote(conn, remote_paths, max_files: int = 16, per_file: int = 32 * 1024):
+    """
+    Same as sample_local, over one exec on the server. Every sample is sent
+    as a "<size> <length>" line followed by <length> bytes.
+    """
+    names = " ".join(shlex.quote(p) for p in remote_paths)
+    cmd = (f"find {names} -type f -size +0 -printf '%s %p\\n' 2>/dev/null | sort -rn | head -n {max_files} | "
+           f"while read -r size f; do skip=$((size / 2 < 4096 ? size / 2 : 4096)); "
+           f"n=$((size - skip < {per_file} ? size - skip : {per_file})); echo \"$size $n\"; "
+           f"tail -c +$((skip + 1)) -- \"$f\" | head -c $n; done")
+    try:
+        _, out, _ = conn.exec_command(cmd, timeout=10)
+        data = out.read()
+    except Exception as e:
+        print(f"Remote sample failed: {e}")
+        return []
+    samples = []
+    pos = 0
+    while pos < len(data):
+        end = data.find(b"\n", pos)
+        try:
+            size, length = (int(x) for x in data[pos:end].split())
+        except ValueError:
+            break  # 文件在采样时被改动，后面的数据对不上了
+        samples.append((size, data[end + 1:end + 1 + length]))
+        pos = end + 1 + length
+    return samples
+
+
+def estimate_ratios(samples, codecs):
+    """
+    Estimated compressed/original size per codec (1.0 = incompressible).
+    High-entropy samples (media, archives) count as incompressible outright,
+    the rest are compressed with each codec.
+    """
+    total = sum(size for size, _ in samples)
+    if not total:
+        return {c.name: 1.0 for c in codecs}
+    weighted = {c.name: 0.0 for c in codecs}
+    for size, data in samples:
+        incompressible = not data or byte_entropy(data) > 7.5
+        for codec in codecs:
+            ratio = 1.0
+            if not incompressible and codec.name != "none":
+                compressor = codec.compressor()
+                out = compressor.compress(data) + compressor.flush()
+                ratio = min(1.0, len(out) / len(data))
+            weighted[codec.name] += ratio * size
+    return {name: value / total for name, value in weighted.items()}
+
+
+class CodecSelector:
+    """
+    Picks the stream codec for each tar transfer of one session.
+
+    Remote tools and core count are probed once; link throughput is measured
+    with a short `cat >/dev/null` probe and refreshed every `probe_ttl`
+    seconds. For every codec usable on both ends the pipeline rate is
+    min(compress, link / ratio, decompress) and the fastest one wins.
+    `transfer_codec` in the config forces a codec instead of "auto".
+    """
+
+    PROBE_SIZES = (64 * 1024, 1024 * 1024)
+
+    def __init__(self, probe_ttl: float = 600):
+        self.probe_ttl = probe_ttl
+        self.remote_tools = None
+        self.remote_cores = 1
+        self.local_cores = os.cpu_count() or 1
+        self.link_rate = None  # bytes/s
+        self._link_time = 0
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Probes
+    # ---------------------------
+    def _probe_remote(self, conn):
+        cmd = ("(nproc || getconf _NPROCESSORS_ONLN) 2>/dev/null; "
+               "for c in gzip zstd lz4; do command -v $c >/dev/null 2>&1 && echo $c; done")
+        try:
+            _, out, _ = conn.exec_command(cmd, timeout=10)
+            lines = out.read().decode(errors="ignore").split()
+        except Exception as e:
+            print(f"Codec probe failed: {e}")
+            lines = []
+        self.remote_cores = int(lines[0]) if lines and lines[0].isdigit() else 1
+        self.remote_tools = {l for l in lines if l in CODECS}
+
+    def _probe_link(self, conn):
+        """Bytes/s from two uploads of different size, so the round trip cancels out."""
+        timings = []
+        payload = os.urandom(max(self.PROBE_SIZES))
+        try:
+            for size in self.PROBE_SIZES:
+                stdin, stdout, _ = conn.exec_command("cat >/dev/null; echo ok", timeout=30)
+                channel = stdout.channel
+                start = time.perf_counter()
+                channel.sendall(payload[:size])
+                channel.shutdown_write()
+                stdout.read()
+                timings.append(time.perf_counter() - start)
+                channel.close()
+        except Exception as e:
+            print(f"Link probe failed: {e}")
+            return None
+        elapsed = timings[1] - timings[0]
+        size = self.PROBE_SIZES[1] - self.PROBE_SIZES[0]
+        return size / elapsed if elapsed > 0 else size / max(timings[1], 1e-3)
+
+    def _ensure_probed(self, conn):
+        with self._lock:
+            if self.remote_tools is None:
+                self._probe_remote(conn)
+            if self.link_rate is None or time.monotonic() - self._link_time > self.probe_ttl:
+                rate = self._probe_link(conn)
+                if rate:
+                    self.link_rate = rate
+                    self._link_time = time.monotonic()
+
+    def record(self, wire_bytes: int, seconds: float):
+        """
+        Feed back an achieved wire rate. Only raises the estimate: a transfer
+        limited by compression or disk says nothing about the link being slower.
+        """
+        if seconds <= 0 or wire_bytes < MB:
+            return
+        rate = wire_bytes / seconds
+        with self._lock:
+            if self.link_rate is None or rate > self.link_rate:
+                self.link_rate = rate
+
+    # ---------------------------
+    # Selection
+    # ---------------------------
+    def available(self):
+        tools = self.remote_tools or set()
+        return [c for c in CODECS.values()
+                if c.local_available() and (c.tool is None or c.tool in tools)]
+
+    def _rate(self, codec, ratio, sender_cores):
+        if codec.name == "none":
+            return self.link_rate
+        compress = codec.compress_speed * MB * \
+            (min(sender_cores, 8) if codec.threaded else 1)
+        decompress = codec.decompress_speed * MB
+        return min(compress, self.link_rate / max(ratio, 0.01), decompress)
+
+    def choose(self, conn, direction: str, sampler):
+        """
+        Return (codec, reason). `direction` is "upload" (we compress) or
+        "download" (the server compresses); `sampler()` returns payload
+        samples and is only called for automatic selection.
+        """
+        forced = SCM().read_config().get("transfer_codec", "auto")
+        self._ensure_probed(conn)
+        candidates = {c.name: c for c in self.available()}
+        if forced != "auto":
+            if forced in candidates:
+                return candidates[forced], "forced in settings"
+            print(f"Codec {forced} not available on both ends, choosing automatically")
+
+        ratios = estimate_ratios(sampler(), list(candidates.values()))
+        if self.link_rate is None:
+            best = min(ratios, key=ratios.get)
+            return candidates[best], f"ratio~{ratios[best]:.2f}, link unknown"
+        sender = self.local_cores if direction == "upload" else self.remote_cores
+        rates = {name: self._rate(c, ratios[name], sender)
+                 for name, c in candidates.items()}
+        best = max(rates, key=rates.get)
+        # 差不多快时不压缩，省两端的 CPU
+        if rates["none"] >= rates[best] * 0.95:
+            best = "none"
+        reason = (f"link {self.link_rate / MB:.0f} MB/s, cores {self.local_cores}/{self.remote_cores}, "
+                  + ", ".join(f"{n} ratio {ratios[n]:.2f} ~{rates[n] / MB:.0f} MB/s"
+                              for n in sorted(rates)))
+        return candidates[best], reason
@@ -0,0 +1,223 @@
+# transfer_journal.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import psutil
+from tools.setting_config import config_dir
+
+journal_path = config_dir / "transfers.db"
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    session TEXT NOT NULL,
+    action TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    local_path TEXT,
+    remote_path TEXT,
+    compression INTEGER NOT NULL DEFAULT 0,
+    context TEXT,
+    identifier TEXT,
+    state TEXT NOT NULL,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transfers_session ON transfers (session);
+"""
+
+
+class TransferJournal:
+    """
+    On-disk record of queued and running transfers (SQLite, in the config dir).
+
+    Every job handed to the scheduler gets a row with its parameters, state and
+    the bytes it has moved, owned by the file manager that queued it. Completed
+    and cancelled jobs are deleted, failed ones are kept. Rows whose owner is
+    no longer alive (app quit or crashed, session closed) are the interrupted
+    ones; the next connection to the same session can claim them and resume.
+    Owners are "<pid>:<id>:<start time>", so the rows of another running
+    instance stay with it.
+    Paths that are lists (compressed batches) are stored as JSON.
+
+    kind: "file" (one TransferWorker, resumes from its partial-file checkpoint),
+    "dir" (a batch directory, resumed as a skip-unchanged sync) or "stream"
+    (a compressed tar stream, restarted).
+    """
+    _instance = None
+
+    PROGRESS_INTERVAL = 1.0  # 同一任务两次写入字节数的最小间隔（秒）
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._init()
+        return cls._instance
+
+    def _init(self):
+        self._lock = threading.Lock()
+        self._last_write = {}
+        self._owners = set()  # live owners in this process
+        self._db = None
+        try:
+            config_dir.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(journal_path), check_same_thread=False,
+                                 isolation_level=None, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        except sqlite3.Error as e:
+            print(f"Transfer journal unavailable: {e}")
+
+    def _execute(self, sql, params=()):
+        if self._db is None:
+            return None
+        with self._lock:
+            try:
+                return self._db.execute(sql, params)
+            except sqlite3.Error as e:
+                print(f"Transfer journal error: {e}")
+                return None
+
+    def _owner_alive(self, owner):
+        """Whether `owner` still runs, in this process or in another NeoSSH instance."""
+        if owner in self._owners:
+            return True
+        pid, _, rest = owner.partition(":")
+        if pid == str(os.getpid()):
+            return False  # released in this process
+        try:
+            started = float(rest.rsplit(":", 1)[-1])
+            process = psutil.Process(int(pid))
+            # 进程号被之后启动的进程复用时不算存活
+            return process.is_running() and process.create_time() <= started + 1
+        except (ValueError, psutil.Error):
+            return False
+
+    def register_owner(self, owner):
+        self._owners.add(owner)
+
+    def release_owner(self, owner):
+        """The owner's unfinished rows become claimable by the next connection."""
+        self._owners.discard(owner)
+
+    # ---------------------------
+    # Recording
+    # ---------------------------
+    def add(self, owner, session, action, kind, local_path, remote_path, compression=False,
+            context=None, identifier=None, total_bytes=0):
+        """Record a new queued job; returns its id (None if the journal is unavailable)."""
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO transfers (owner, session, action, kind, local_path, remote_path,"
+            " compression, context, identifier, state, total_bytes, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (owner, session, action, kind, _dump(local_path), _dump(remote_path),
+             int(bool(compression)), context, identifier, QUEUED, int(total_bytes or 0), now, now))
+        return cursor.lastrowid if cursor is not None else None
+
+    def progress(self, job_id, bytes_done, total_bytes):
+        """Store the bytes moved so far, at most every PROGRESS_INTERVAL per job."""
+        if job_id is None:
+            return
+        now = time.monotonic()
+        if now - self._last_write.get(job_id, 0) < self.PROGRESS_INTERVAL:
+            return
+        self._last_write[job_id] = now
+        self._execute(
+            "UPDATE transfers SET state = ?, bytes_done = ?, total_bytes = ?, updated_at = ?"
+            " WHERE id = ? AND state != ?",
+            (RUNNING, int(bytes_done), int(total_bytes), time.time(), job_id, PAUSED))
+
+    def set_state(self, job_id, state, previous=None):
+        """Change a job's state; with `previous` only if it is currently in that state."""
+        if job_id is None:
+            return
+        sql = "UPDATE transfers SET state = ?, updated_at = ? WHERE id = ?"
+        params = (state, time.time(), job_id)
+        if previous is not None:
+            sql += " AND state = ?"
+            params += (previous,)
+        self._execute(sql, params)
+
+    def finish(self, job_id, success, error=""):
+        """Completed jobs leave the journal, failed ones stay to be offered again."""
+        if job_id is None:
+            return
+        self._last_write.pop(job_id, None)
+        if success:
+            self.discard([job_id])
+        else:
+            self._execute(
+                "UPDATE transfers SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, (error or "")[:500], time.time(), job_id))
+
+    def discard(self, job_ids):
+        for job_id in job_ids:
+            self._last_write.pop(job_id, None)
+            self._execute("DELETE FROM transfers WHERE id = ?", (job_id,))
+
+    # ---------------------------
+    # Resume
+    # ---------------------------
+    def claim_interrupted(self, session, owner):
+        """
+        Take over the jobs of `session` that no live owner holds and return them
+        (oldest first) as dicts. Claimed rows belong to `owner`, so a second tab
+        of the same session, or a second running instance, does not offer them again.
+        """
+        if self._db is None:
+            return []
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                rows = self._db.execute(
+                    "SELECT id, owner, action, kind, local_path, remote_path, compression, context,"
+                    " identifier, state, bytes_done, total_bytes, error FROM transfers"
+                    " WHERE session = ? ORDER BY id", (session,)).fetchall()
+                rows = [row for row in rows if not self._owner_alive(row[1])]
+                self._db.executemany(
+                    "UPDATE transfers SET owner = ? WHERE id = ?",
+                    [(owner, row[0]) for row in rows])
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"Transfer journal error: {e}")
+                try:
+                    self._db.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                return []
+        keys = ("id", "owner", "action", "kind", "local_path", "remote_path", "compression",
+                "context", "identifier", "state", "bytes_done", "total_bytes", "error")
+        jobs = []
+        for row in rows:
+            job = dict(zip(keys, row))
+            job["local_path"] = _load(job["local_path"])
+            job["remote_path"] = _load(job["remote_path"])
+            job["compression"] = bool(job["compression"])
+            jobs.append(job)
+        return jobs
+
+
+def _dump(path):
+    return json.dumps(path) if isinstance(path, (list, tuple)) else path
+
+
+def _load(value):
+    if value and value.startswith("["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
@@ -0,0 +1,229 @@
+# transfer_scheduler.py
+import heapq
+import itertools
+import threading
+import time
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+INTERACTIVE = 2  # 双击打开、编辑器回传
+NORMAL = 1       # 单独拖入的文件 / 目录
+BULK = 0         # 目录展开后的逐个文件
+_CANCELLED = 99  # 已取消的排队任务尽快跑掉，让 worker 发出取消信号
+
+QUEUED, PAUSED, RUNNING, DONE = range(4)
+
+
+class _Job:
+    __slots__ = ("identifier", "worker", "priority", "size", "group",
+                 "seq", "queued_at", "state")
+
+    def __init__(self, identifier, worker, priority, size, group, seq):
+        self.identifier = identifier
+        self.worker = worker
+        self.priority = priority
+        self.size = size
+        self.group = group
+        self.seq = seq
+        self.queued_at = time.monotonic()
+        self.state = QUEUED
+
+
+class _JobRunner(QRunnable):
+    def __init__(self, scheduler, job):
+        super().__init__()
+        self.scheduler = scheduler
+        self.job = job
+
+    def run(self):
+        try:
+            self.job.worker.run()
+        finally:
+            self.scheduler._finished(self.job)
+
+
+class TransferScheduler(QObject):
+    """
+    Feeds transfer workers to a QThreadPool in priority order.
+
+    QThreadPool runs runnables in submission order, so a double-click open
+    waited behind every queued bulk file. Here at most maxThreadCount() jobs
+    are handed to the pool; the rest wait in per-priority, per-group heaps:
+
+    - higher priority first (INTERACTIVE > NORMAL > BULK);
+    - within a priority, groups (one dropped directory, one download) take
+      turns, a group joining late starts level with the others instead of
+      catching up on everything they already ran;
+    - within a group, shortest job first.
+
+    Queued jobs can be paused and resumed. `stats_changed(queued, oldest_wait)`
+    reports the queue depth and how long the oldest queued job has waited.
+    """
+    stats_changed = pyqtSignal(int, float)
+
+    STATS_INTERVAL = 0.25
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+        self._jobs = {}      # identifier -> _Job（排队 / 暂停 / 运行中）
+        self._queues = {}    # priority -> {group: heap of (size, seq, job)}
+        self._served = {}    # (priority, group) -> 已启动的任务数
+        self._running = 0
+        self._wait_avg = 0.0
+        self._last_stats = 0
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def submit(self, identifier, worker, priority=NORMAL, size=0, group=None):
+        """Queue `worker` (a QRunnable) under `identifier`; runs it when a slot is free."""
+        with self._lock:
+            job = _Job(identifier, worker, priority, size or 0,
+                       group if group is not None else identifier, next(self._seq))
+            self._jobs[identifier] = job
+            self._push(job)
+        self._dispatch()
+
+    def cancel(self, identifier) -> bool:
+        """
+        Move a queued or paused job to the front: its worker is already stopped
+        and only has to emit the usual cancelled signal. Returns False if the
+        job is not waiting.
+        """
+        with self._lock:
+            job = self._jobs.get(identifier)
+            if not job or job.state not in (QUEUED, PAUSED):
+                return False
+            job.state = DONE  # 旧的堆条目作废
+            job = self._requeue(job, _CANCELLED)
+        self._dispatch()
+        return True
+
+    def pause(self, identifier) -> bool:
+        with self._lock:
+            job = self._jobs.get(identifier)
+            if not job or job.state != QUEUED:
+                return False
+            job.state = PAUSED
+        self._emit_stats(force=True)
+        return True
+
+    def resume(self, identifier) -> bool:
+        with self._lock:
+            job = self._jobs.get(identifier)
+            if not job or job.state != PAUSED:
+                return False
+            job.state = DONE
+            self._requeue(job, job.priority)
+        self._dispatch()
+        return True
+
+    def pause_all(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state == QUEUED and job.priority != _CANCELLED:
+                    job.state = PAUSED
+        self._emit_stats(force=True)
+
+    def resume_all(self):
+        with self._lock:
+            for job in list(self._jobs.values()):
+                if job.state == PAUSED:
+                    job.state = DONE
+                    self._requeue(job, job.priority)
+        self._dispatch()
+
+    def is_paused(self, identifier) -> bool:
+        job = self._jobs.get(identifier)
+        return bool(job and job.state == PAUSED)
+
+    def stats(self) -> dict:
+        """Queue depth, paused / running counts and wait times in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            queued = [j for j in self._jobs.values() if j.state == QUEUED]
+            return {
+                "queued": len(queued),
+                "paused": sum(1 for j in self._jobs.values() if j.state == PAUSED),
+                "running": self._running,
+                "oldest_wait": max((now - j.queued_at for j in queued), default=0.0),
+                "avg_wait": self._wait_avg,
+            }
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _requeue(self, job, priority):
+        """Replace `job` (already marked DONE) with a fresh queued copy."""
+        fresh = _Job(job.identifier, job.worker, priority, job.size, job.group, job.seq)
+        fresh.queued_at = job.queued_at
+        self._jobs[job.identifier] = fresh
+        self._push(fresh)
+        return fresh
+
+    def _push(self, job):
+        groups = self._queues.setdefault(job.priority, {})
+        if job.group not in groups:
+            # 新加入的组从当前最低的已服务数开始，不会独占所有空位去“追赶”
+            active = [self._served.get((job.priority, g), 0) for g in groups]
+            self._served[(job.priority, job.group)] = min(active, default=0)
+            groups[job.group] = []
+        heapq.heappush(groups[job.group], (job.size, job.seq, job))
+
+    def _pop(self):
+        for priority in sorted(self._queues, reverse=True):
+            groups = self._queues[priority]
+            while groups:
+                group = min(groups, key=lambda g: self._served.get((priority, g), 0))
+                heap = groups[group]
+                job = None
+                while heap and job is None:
+                    # 暂停 / 作废的条目直接丢掉，恢复时会重新入队
+                    candidate = heapq.heappop(heap)[2]
+                    if candidate.state == QUEUED:
+                        job = candidate
+                if not heap:
+                    del groups[group]
+                    self._served.pop((priority, group), None)
+                if job is not None:
+                    if group in groups:
+                        self._served[(priority, group)] += 1
+                    return job
+        return None
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._running < self.pool.maxThreadCount():
+                job = self._pop()
+                if job is None:
+                    break
+                job.state = RUNNING
+                self._running += 1
+                wait = time.monotonic() - job.queued_at
+                self._wait_avg = wait if not self._wait_avg else self._wait_avg * 0.9 + wait * 0.1
+                started.append(job)
+        for job in started:
+            self.pool.start(_JobRunner(self, job))
+        self._emit_stats()
+
+    def _finished(self, job):
+        with self._lock:
+            job.state = DONE
+            self._running -= 1
+            if self._jobs.get(job.identifier) is job:
+                del self._jobs[job.identifier]
+            drained = not self._jobs
+        self._dispatch()
+        if drained:
+            self._emit_stats(force=True)
+
+    def _emit_stats(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_stats < self.STATS_INTERVAL:
+            return
+        self._last_stats = now
+        stats = self.stats()
+        self.stats_changed.emit(stats["queued"], stats["oldest_wait"])
@@ -2,13 +2,19 @@
 import traceback
 import paramiko
 import os
+import posixpath
+import socket
 import stat
-import tarfile
-import tempfile
 from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from tools.setting_config import SCM
+from tools.remote_dir_cache import RemoteDirCache
+from tools.sftp_pipeline import PipelinedSFTP, copy_mtime_to_local, copy_mtime_to_remote, open_transfer_sftp
+from tools.tar_stream import download_tar_stream, upload_tar_stream
+from tools.transfer_codecs import CodecSelector, sample_local, sample_remote
+from tools.bandwidth import BandwidthShaper
+from tools.delta_upload import DeltaUnavailable, DeltaUploader
+from tools.transfer_checkpoint import TransferCheckpoint, read_local_range, read_remote_range
 import time
-import random
-import string
 
 class TransferSignals(QObject):
     """
@@ -30,9 +36,11 @@ class TransferWorker(QRunnable):
     in a separate thread from the QThreadPool.
     """
 
-    def __init__(self, connection, action, local_path, remote_path, compression, download_context=None, upload_context=None, task_id=None, session_id=None):
+    def __init__(self, connection, action, local_path, remote_path, compression, download_context=None, upload_context=None, task_id=None, session_id=None, pool=None, dir_cache=None, codecs=None, bandwidth_key=None):
         super().__init__()
-        self.conn = connection
+        # With a pool the connection is leased in run(), `connection` is only the fallback
+        self.pool = pool
+        self.conn = None if pool else connection
         self.action = action
         self.local_path = local_path
         self.remote_path = remote_path
@@ -44,14 +52,30 @@ class TransferWorker(QRunnable):
         self.signals = TransferSignals()
         self.sftp = None
         self.is_stopped = False
-        self.remote_tar_path = None
+        # exec channel of a running tar stream, closed to cancel it
+        self.stream_channel = None
+        # Shared per session so parallel workers don't re-check the same directories
+        self.dir_cache = dir_cache if dir_cache is not None else RemoteDirCache()
+        # Per-session codec choice for tar streams (probe results are cached there)
+        self.codecs = codecs if codecs is not None else CodecSelector()
+        # Session key for BandwidthShaper; throttle(n) is bound to the task in run()
+        self.bandwidth_key = bandwidth_key
+        self.throttle = None
+        config = SCM().read_config()
+        self.use_pipeline = config.get("sftp_pipeline_enabled", True)
+        self.resume_enabled = config.get("transfer_resume_enabled", True)
+        self.verify_tail = config.get("transfer_resume_verify_tail", True)
+        self.max_retries = int(config.get("transfer_max_retries", 5))
+        # Set by the manager for editor re-uploads: patch the remote copy instead of resending it
+        self.delta = False
+        self.delta_enabled = config.get("transfer_delta_enabled", True)
+        self.delta_min_size = int(config.get("transfer_delta_min_size", 1048576))
 
     def stop(self):
         self.is_stopped = True
-        if self.remote_tar_path and self.conn:
+        if self.stream_channel:
             try:
-                stdin, stdout, stderr = self.conn.exec_command(f'rm -f "{self.remote_tar_path}"')
-                stdout.channel.recv_exit_status()
+                self.stream_channel.close()
             except Exception:
                 pass
         if self.sftp:
@@ -61,25 +85,37 @@ class TransferWorker(QRunnable):
                 print(f"Error closing SFTP in worker stop: {e}")
 
     def run(self):
-        """The main work of the thread. Uses a pre-established SSH connection to perform the transfer."""
-        retry_delay = 1  # Delay in seconds between retries
-        attempts = 0
+        """The main work of the thread. Leases an SSH connection from the transfer pool (or uses the shared one) to perform the transfer."""
         if self.task_id:
             identifier = self.task_id
         else:
             identifier = str(
                 self.local_path if self.action == 'upload' else self.remote_path)
         self.signals.progress.emit(identifier, -1, 0, 0)
+        shaper = BandwidthShaper()
+        self.throttle = shaper.limiter(
+            self.bandwidth_key, identifier, lambda: self.is_stopped)
+
+        try:
+            self._run_with_connection(identifier)
+        finally:
+            self._release_connection()
+            shaper.forget_task(identifier)
 
+    def _run_with_connection(self, identifier):
+        retry_delay = 1  # Delay in seconds between retries
+        attempts = 0
         while not self.is_stopped:
             try:
                 if self.is_stopped:
                     break
+                if self.pool and self.conn is None:
+                    self.conn = self.pool.acquire()
                 if not self.conn or not self.conn.get_transport() or not self.conn.get_transport().is_active():
                     raise Exception(
                         "SSH connection is not active or provided.")
                 self.conn.get_transport().set_keepalive(30)
-                self.sftp = self.conn.open_sftp()
+                self.sftp = open_transfer_sftp(self.conn)
 
                 if self.action == 'upload':
                     self._handle_upload_task(
@@ -96,10 +132,16 @@ class TransferWorker(QRunnable):
                 tb = traceback.format_exc()
                 print(
                     f"⚠️ ChannelException encountered (attempt {attempts}): {e}\n{tb}")
+                if attempts > self.max_retries:
+                    error_msg = f"TransferWorker Error: giving up after {attempts} attempts: {e}"
+                    self.signals.finished.emit(identifier, False, error_msg)
+                    return
                 print(
                     f"Retrying {identifier} in {retry_delay} second(s)...")
+                # The server refused a channel on this connection, lease another one
+                self._release_connection()
                 time.sleep(retry_delay)
-                # Loop will continue indefinitely
+                retry_delay = min(retry_delay * 2, 30)
             except Exception as e:
                 if self.is_stopped:
                     break
@@ -210,60 +252,63 @@ class TransferWorker(QRunnable):
             return False, error_msg
 
     def _upload_list_compressed(self, identifier, path_list, remote_path):
-        tmp_dir = "tmp"
-        os.makedirs(tmp_dir, exist_ok=True)
-        tmp_fd, tmp_tar_path = tempfile.mkstemp(suffix=".tar.gz", dir=tmp_dir)
-        os.close(tmp_fd)
-        self.signals.start_to_compression.emit(tmp_tar_path)
         try:
-            with tarfile.open(tmp_tar_path, mode="w:gz") as tf:
-                for path in path_list:
-                    if not os.path.exists(path):
-                        continue
-                    arcname = os.path.basename(path)
-                    tf.add(path, arcname=arcname)
-            self.signals.compression_finished.emit(
-                identifier, os.path.basename(tmp_tar_path))
-            self._upload_file(
-                identifier, tmp_tar_path, remote_path)
-            remote_zip_path = f"{remote_path.rstrip('/')}/{os.path.basename(tmp_tar_path)}"
-            self._remote_untar(remote_zip_path, remote_path)
+            self._upload_tar_stream(identifier, path_list, remote_path)
             self.signals.finished.emit(identifier, True, "")
         except Exception as e:
             tb = traceback.format_exc()
             error_msg = f"Compressed list upload error: {e}\n{tb}"
             self.signals.finished.emit(identifier, False, error_msg)
             raise e
-        finally:
-            if os.path.exists(tmp_tar_path):
-                os.remove(tmp_tar_path)
 
     def _upload_compressed(self, identifier, local_path, remote_path):
-        tmp_dir = "tmp"
-        os.makedirs(tmp_dir, exist_ok=True)
-        tmp_fd, tmp_tar_path = tempfile.mkstemp(suffix=".tar.gz", dir=tmp_dir)
-        os.close(tmp_fd)
-        self.signals.start_to_compression.emit(tmp_tar_path)
-        try:
-            with tarfile.open(tmp_tar_path, mode="w:gz") as tf:
-                arcname = os.path.basename(local_path)
-                tf.add(local_path, arcname=arcname)
-
-            self.signals.compression_finished.emit(
-                identifier, os.path.basename(tmp_tar_path))
-            self._upload_file(
-                identifier, tmp_tar_path, remote_path, emit_finish_signal=False)
-            remote_zip_path = f"{remote_path.rstrip('/')}/{os.path.basename(tmp_tar_path)}"
-            self._remote_untar(remote_zip_path, remote_path)
-            self.signals.finished.emit(identifier, True, "")
-        except Exception as e:
-            tb = traceback.format_exc()
-            error_msg = f"Compressed upload error: {e}\n{tb}"
-            self.signals.finished.emit(identifier, False, error_msg)
-            raise e
-        finally:
-            if os.path.exists(tmp_tar_path):
-                os.remove(tmp_tar_path)
+        # finished is emitted by the caller (_handle_upload_task)
+        self._upload_tar_stream(identifier, [local_path], remote_path)
+
+    def _upload_tar_stream(self, identifier, paths, remote_path):
+        """Pipe a tar of `paths` into a remote `tar -x`, no temporary archive on either side."""
+        paths = [p for p in paths if os.path.exists(p)]
+        if not paths:
+            raise FileNotFoundError("Nothing to upload.")
+        self.signals.start_to_compression.emit(remote_path)
+        name = self._stream_display_name(paths)
+        codec = self._choose_codec(identifier, name, "upload", lambda: sample_local(paths))
+
+        def progress_callback(bytes_so_far, total_bytes):
+            if total_bytes > 0:
+                progress = int((bytes_so_far / total_bytes) * 100)
+                self.signals.progress.emit(
+                    identifier, progress, bytes_so_far, total_bytes)
+
+        stats = upload_tar_stream(self.conn, paths, remote_path, progress_callback,
+                                  is_stopped=lambda: self.is_stopped, on_channel=self._set_stream_channel, codec=codec,
+                                  throttle=self.throttle)
+        self.stream_channel = None
+        self._report_codec(identifier, name, codec, stats)
+
+    def _choose_codec(self, identifier, name, direction, sampler):
+        codec, reason = self.codecs.choose(self.conn, direction, sampler)
+        print(f"🗜️ {direction} {name}: {codec.name} ({reason})")
+        self.signals.compression_finished.emit(identifier, f"{name} [{codec.name}]")
+        return codec
+
+    def _report_codec(self, identifier, name, codec, stats):
+        """Show the achieved ratio and throughput in the transfer item's name."""
+        self.codecs.record(stats["wire"], stats["seconds"])
+        ratio = stats["payload"] / stats["wire"] if stats["wire"] else 1.0
+        rate = stats["payload"] / max(stats["seconds"], 1e-6) / (1024 * 1024)
+        self.signals.compression_finished.emit(
+            identifier, f"{name} [{codec.name} {ratio:.1f}x, {rate:.0f} MB/s]")
+
+    def _set_stream_channel(self, channel):
+        self.stream_channel = channel
+
+    @staticmethod
+    def _stream_display_name(paths):
+        name = os.path.basename(str(paths[0]).rstrip("/\\"))
+        if len(paths) > 1:
+            name += f" and {len(paths) - 1} others"
+        return name
 
     def _upload_file(self, identifier, local_path, remote_path, upload_context=None):
         """
@@ -290,12 +335,38 @@ class TransferWorker(QRunnable):
                     self.signals.progress.emit(
                         identifier, progress, bytes_so_far, total_bytes)
 
-            self.sftp.put(local_path, full_remote_path,
-                          callback=progress_callback)
+            if self._delta_upload(local_path, full_remote_path, progress_callback):
+                return
+            self._put(local_path, full_remote_path, progress_callback)
 
         except Exception as e:
             raise e
 
+    def _delta_upload(self, local_path, remote_path, callback):
+        """
+        Try an rsync-style re-upload. Returns False when the whole file has to
+        be sent instead (not requested, too small, no remote python3 / old file).
+        """
+        if not (self.delta and self.delta_enabled):
+            return False
+        if os.path.getsize(local_path) < self.delta_min_size:
+            return False
+        try:
+            sent, total = DeltaUploader(self.conn, lambda: self.is_stopped, self.throttle).upload(
+                local_path, remote_path, callback)
+        except InterruptedError:
+            raise
+        except DeltaUnavailable as e:
+            print(f"Delta upload unavailable for {remote_path}: {e}")
+            return False
+        except Exception as e:
+            if self.is_stopped:
+                raise
+            print(f"Delta upload failed for {remote_path}, sending whole file: {e}")
+            return False
+        print(f"Delta upload {remote_path}: sent {sent} of {total} bytes")
+        return True
+
     def _upload_directory(self, identifier, local_dir, remote_dir):
         try:
             dir_name = os.path.basename(local_dir)
@@ -320,7 +391,9 @@ class TransferWorker(QRunnable):
                         current_remote_dir, file).replace('\\', '/')
 
                     file_size = os.path.getsize(local_file_path)
-                    self.sftp.put(local_file_path, remote_file_path)
+                    self.sftp.put(local_file_path, remote_file_path,
+                                  callback=self._throttled(None))
+                    copy_mtime_to_remote(self.sftp, local_file_path, remote_file_path)
                     uploaded_size += file_size
                     progress = int((uploaded_size / total_size)
                                    * 100) if total_size > 0 else 100
@@ -347,36 +420,22 @@ class TransferWorker(QRunnable):
         print(f"download1 : {remote_path}")
         try:
             if compression:
-                random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-                tar_name = f"{random_suffix}.tar.gz"
-                self.signals.compression_finished.emit(identifier, tar_name)
-                
-                remote_tar = self._remote_tar(paths, identifier, random_suffix)
-                if not remote_tar:
-                    raise Exception("Failed to create remote tar file.")
-                
-                self.remote_tar_path = remote_tar
-
-                local_tar_path = os.path.join(
-                    local_base, os.path.basename(remote_tar))
+                # Remote `tar -c` streamed over the exec channel and extracted while it arrives
+                name = self._stream_display_name(paths)
+                codec = self._choose_codec(
+                    identifier, name, "download", lambda: sample_remote(self.conn, paths))
 
                 def progress_callback(bytes_so_far, total_bytes):
                     if total_bytes > 0:
                         progress = int((bytes_so_far / total_bytes) * 100)
-                        # We can perhaps divide progress for different stages
-                        # Assuming download is the main part
                         self.signals.progress.emit(
                             identifier, progress, bytes_so_far, total_bytes)
 
-                self.sftp.get(remote_tar, local_tar_path,
-                              callback=progress_callback)
-
-                with tarfile.open(local_tar_path, "r:gz") as tar:
-                    tar.extractall(local_base)
-
-                self._exec_remote_command(f'rm -f "{remote_tar}"')
-                os.remove(local_tar_path)
-                self.remote_tar_path = None
+                stats = download_tar_stream(self.conn, paths, local_base, progress_callback,
+                                            is_stopped=lambda: self.is_stopped, on_channel=self._set_stream_channel, codec=codec,
+                                            throttle=self.throttle)
+                self.stream_channel = None
+                self._report_codec(identifier, name, codec, stats)
 
                 self.signals.finished.emit(identifier, True, local_base)
 
@@ -463,7 +522,201 @@ class TransferWorker(QRunnable):
                 self.signals.progress.emit(
                     identifier, progress, bytes_so_far, total_bytes)
 
-        self.sftp.get(remote_file, local_file, callback=progress_callback)
+        self._get(remote_file, local_file, progress_callback)
+
+    def _put(self, local_path, remote_path, callback=None):
+        """Upload one file, through the pipelined engine unless disabled in config."""
+        if not self.use_pipeline:
+            self.sftp.put(local_path, remote_path, callback=self._throttled(callback))
+        else:
+            self._with_retries(self._resumable_put, local_path, remote_path, callback)
+        copy_mtime_to_remote(self.sftp, local_path, remote_path)
+
+    def _get(self, remote_path, local_path, callback=None):
+        """Download one file, through the pipelined engine unless disabled in config."""
+        if not self.use_pipeline:
+            self.sftp.get(remote_path, local_path, callback=self._throttled(callback))
+        else:
+            self._with_retries(self._resumable_get, remote_path, local_path, callback)
+        copy_mtime_to_local(self.sftp, remote_path, local_path)
+
+    def _throttled(self, callback):
+        """
+        Wrap a paramiko progress callback so the plain put/get also obey the
+        rate limit: the bytes since the last call are throttled after the fact.
+        """
+        last = [0]
+
+        def wrapped(bytes_so_far, total_bytes):
+            if self.throttle and bytes_so_far > last[0]:
+                self.throttle(bytes_so_far - last[0])
+            last[0] = bytes_so_far
+            if callback:
+                callback(bytes_so_far, total_bytes)
+        return wrapped
+
+    def _with_retries(self, func, *args):
+        """
+        Run a resumable transfer step, retrying transient connection errors with
+        backoff. Each retry reopens the SFTP session and resumes from the checkpoint.
+        """
+        attempts = 0
+        delay = 1
+        while True:
+            try:
+                return func(*args)
+            except Exception as e:
+                if self.is_stopped or not self._is_transient(e) or attempts >= self.max_retries:
+                    raise
+                attempts += 1
+                print(
+                    f"⚠️ Transfer interrupted ({e}), retry {attempts}/{self.max_retries} in {delay}s")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+                self._reopen_sftp()
+
+    def _release_connection(self, broken=False):
+        if self.pool and self.conn is not None:
+            self.pool.release(self.conn, broken)
+            self.conn = None
+
+    @staticmethod
+    def _is_transient(error):
+        return isinstance(error, (paramiko.ssh_exception.SSHException, EOFError,
+                                  socket.timeout, ConnectionError))
+
+    def _reopen_sftp(self):
+        try:
+            if self.sftp:
+                self.sftp.close()
+        except Exception:
+            pass
+        self.sftp = None
+        transport = self.conn.get_transport() if self.conn else None
+        if self.pool and (not transport or not transport.is_active()):
+            self._release_connection(broken=True)
+            self.conn = self.pool.acquire()
+            transport = self.conn.get_transport() if self.conn else None
+        if not transport or not transport.is_active():
+            raise paramiko.ssh_exception.SSHException(
+                "SSH connection is not active, cannot resume transfer.")
+        self.sftp = open_transfer_sftp(self.conn)
+
+    def _resumable_put(self, local_path, remote_path, callback=None):
+        engine = PipelinedSFTP(
+            self.sftp, is_stopped=lambda: self.is_stopped, throttle=self.throttle)
+        if not self.resume_enabled:
+            engine.upload(local_path, remote_path, callback)
+            return
+
+        # Replace what a symlink points at, not the link itself
+        remote_path = self._resolve_remote_link(remote_path)
+        try:
+            existing = self.sftp.stat(remote_path)
+        except IOError:
+            existing = None
+
+        st = os.stat(local_path)
+        checkpoint = TransferCheckpoint(
+            "upload", local_path, remote_path, st.st_size, st.st_mtime, self.verify_tail)
+
+        def upload_to(target):
+            offset = checkpoint.resume_offset(
+                lambda start, length: read_remote_range(self.sftp, target, start, length))
+
+            def record(acked):
+                checkpoint.record(acked, lambda start, length: read_local_range(
+                    local_path, start, length))
+
+            engine.upload(local_path, target, callback,
+                          offset=offset, checkpoint=record)
+            if offset:
+                # A resumed write does not truncate, drop anything past the new end
+                self.sftp.truncate(target, st.st_size)
+
+        partial = remote_path + ".part"
+        try:
+            upload_to(partial)
+        except PermissionError:
+            if existing is None:
+                raise
+            # The directory does not allow new files but the target is writable:
+            # overwrite it in place, which also keeps its inode, mode and owner
+            upload_to(remote_path)
+            checkpoint.clear()
+            return
+
+        if existing is not None:
+            # Carry the replaced file's mode and ownership over to the new one
+            try:
+                self.sftp.chmod(partial, stat.S_IMODE(existing.st_mode))
+                self.sftp.chown(partial, existing.st_uid, existing.st_gid)
+            except IOError:
+                pass
+        self._replace_remote(partial, remote_path, existing is not None)
+        checkpoint.clear()
+
+    def _resolve_remote_link(self, remote_path):
+        """Return the file a remote symlink points at, or `remote_path` itself."""
+        try:
+            if not stat.S_ISLNK(self.sftp.lstat(remote_path).st_mode):
+                return remote_path
+        except IOError:
+            return remote_path
+        try:
+            return self.sftp.normalize(remote_path)
+        except IOError:
+            # Dangling link: realpath fails, follow one level by hand
+            link = self.sftp.readlink(remote_path)
+            return posixpath.join(posixpath.dirname(remote_path), link)
+
+    def _replace_remote(self, partial, remote_path, existed):
+        """Move `partial` over `remote_path`; the original stays until the new file has landed."""
+        try:
+            self.sftp.posix_rename(partial, remote_path)
+            return
+        except IOError:
+            if not existed:
+                self.sftp.rename(partial, remote_path)
+                return
+        # Server without posix-rename@openssh.com: rename refuses to overwrite,
+        # so move the original aside first and put it back if the swap fails
+        backup = remote_path + ".old"
+        self.sftp.rename(remote_path, backup)
+        try:
+            self.sftp.rename(partial, remote_path)
+        except IOError:
+            self.sftp.rename(backup, remote_path)
+            raise
+        try:
+            self.sftp.remove(backup)
+        except IOError:
+            pass
+
+    def _resumable_get(self, remote_path, local_path, callback=None):
+        engine = PipelinedSFTP(
+            self.sftp, is_stopped=lambda: self.is_stopped, throttle=self.throttle)
+        if not self.resume_enabled:
+            engine.download(remote_path, local_path, callback)
+            return
+
+        partial = local_path + ".part"
+        attr = self.sftp.stat(remote_path)
+        checkpoint = TransferCheckpoint(
+            "download", remote_path, os.path.abspath(local_path), attr.st_size, attr.st_mtime, self.verify_tail)
+        offset = 0
+        if os.path.exists(partial):
+            offset = checkpoint.resume_offset(
+                lambda start, length: read_local_range(partial, start, length))
+
+        def record(written):
+            checkpoint.record(written, lambda start, length: read_local_range(
+                partial, start, length))
+
+        engine.download(remote_path, partial, callback,
+                        offset=offset, checkpoint=record)
+        os.replace(partial, local_path)
+        checkpoint.clear()
 
     def _download_directory(self, identifier, remote_dir, local_dir):
         os.makedirs(local_dir, exist_ok=True)
@@ -476,87 +729,9 @@ class TransferWorker(QRunnable):
                 self._download_directory(identifier, remote_item, local_item)
             else:
                 # No progress for individual files in a dir download for now
-                self.sftp.get(remote_item, local_item)
-
-    def _remote_tar(self, paths, identifier=None, random_suffix=None):
-        if not paths:
-            return None
-        if random_suffix is None:
-            random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-        common_path = os.path.dirname(paths[0]).replace('\\', '/')
-        tar_name = f"{random_suffix}.tar.gz"
-        remote_tar_path = f"{common_path}/{tar_name}"
-        files_to_tar = ' '.join([f'"{os.path.basename(p)}"' for p in paths])
-        self.signals.start_to_compression.emit(remote_tar_path)
-        try:
-            total_size = 0
-            for p in paths:
-                size_cmd = f'du -sb "{p}" | cut -f1'
-                out, err = self._exec_remote_command(size_cmd)
-                if not err and out.strip().isdigit():
-                    total_size += int(out.strip())
-            if total_size == 0:
-                total_size = 1
-            cmd = f'cd "{common_path}" && tar -czf "{tar_name}" {files_to_tar} 2>&1'
-            stdin, stdout, stderr = self.conn.exec_command(cmd)
-            channel = stdout.channel
-            last_progress_time = time.time()
-            progress_interval = 0.5
-            while not channel.exit_status_ready():
-                if self.is_stopped:
-                    channel.close()
-                    try:
-                        self._exec_remote_command(f'rm -f "{remote_tar_path}"')
-                        print(f"🗑️ Cleaned up incomplete tar file: {remote_tar_path}")
-                    except Exception as cleanup_error:
-                        print(f"Failed to clean up tar file: {cleanup_error}")
-                    return None
-                current_time = time.time()
-                if current_time - last_progress_time >= progress_interval:
-                    try:
-                        stat_cmd = f'stat -c%s "{remote_tar_path}" 2>/dev/null || echo 0'
-                        size_out, _ = self._exec_remote_command(stat_cmd)
-                        current_size = int(size_out.strip()) if size_out.strip().isdigit() else 0
-                        if total_size > 0:
-                            progress = min(int((current_size / total_size) * 100), 99)
-                            if identifier:
-                                self.signals.progress.emit(identifier, progress, current_size, total_size)
-                    except Exception as e:
-                        print(f"Error checking compression progress: {e}")
-                    last_progress_time = current_time
-                time.sleep(0.1)
-            exit_status = channel.recv_exit_status()
-            err_output = stderr.read().decode(errors="ignore")
-            if exit_status != 0:
-                print(f"Error creating remote tar: {err_output}")
-                return None
-            if identifier:
-                self.signals.progress.emit(identifier, 100, total_size, total_size)
-            return remote_tar_path
-        except Exception as e:
-            print(f"Error in _remote_tar: {e}")
-            return None
+                self.sftp.get(remote_item, local_item,
+                              callback=self._throttled(None))
+                copy_mtime_to_local(self.sftp, remote_item, local_item, entry.st_mtime)
 
     def _ensure_remote_directory_exists(self, remote_dir):
-        parts = remote_dir.strip('/').split('/')
-        current_path = ''
-        for part in parts:
-            current_path = f"{current_path}/{part}" if current_path else f"/{part}"
-            try:
-                self.sftp.stat(current_path)
-            except FileNotFoundError:
-                self.sftp.mkdir(current_path)
-
-    def _remote_untar(self, remote_tar_path, target_dir):
-        self.signals.start_to_uncompression.emit(remote_tar_path)
-        self._ensure_remote_directory_exists(target_dir)
-        untar_cmd = f'tar -xzf "{remote_tar_path}" -C "{target_dir}"'
-        self._exec_remote_command(untar_cmd)
-        rm_cmd = f'rm -f "{remote_tar_path}"'
-        self._exec_remote_command(rm_cmd)
-
-    def _exec_remote_command(self, command):
-        stdin, stdout, stderr = self.conn.exec_command(command)
-        out = stdout.read().decode(errors="ignore")
-        err = stderr.read().decode(errors="ignore")
-        return out, err
+        self.dir_cache.ensure(self.sftp, remote_dir)
@@ -632,6 +632,31 @@ class AIBridge(QObject):
                     return r
                 except Exception as e:
                     return json.dumps({"status": "error", "content": f"Failed to list directory: {e}"}, ensure_ascii=False)
+
+            def get_metrics_history(series: str = None, seconds: int = 3600):
+                if not self.main_window:
+                    return json.dumps({"status": "error", "content": "Main window not available."}, ensure_ascii=False)
+                active_widget = self.main_window.get_active_ssh_widget()
+                if not active_widget:
+                    return json.dumps({"status": "error", "content": "No active SSH session found."}, ensure_ascii=False)
+                try:
+                    history = active_widget.ssh_widget.bridge.worker.monitor.history
+                except AttributeError:
+                    return json.dumps({"status": "error", "content": "Monitor history not available for this session."}, ensure_ascii=False)
+                try:
+                    seconds = max(1, int(seconds))
+                except (TypeError, ValueError):
+                    seconds = 3600
+                # 不指定 series 时返回所有序列的摘要；series 以 "." 结尾视为前缀
+                if not series or series.endswith("."):
+                    names = history.series_names(series or "")
+                else:
+                    names = [series]
+                summaries = [s for s in (history.summary(n, seconds)
+                                         for n in names) if s]
+                if not summaries:
+                    return json.dumps({"status": "error", "content": f"No history for {series or 'any series'}. Available: {history.series_names()}"}, ensure_ascii=False)
+                return json.dumps({"status": "success", "seconds": seconds, "content": summaries}, ensure_ascii=False)
             self.mcp_manager.register_tool_handler(
                 server_name="Linux终端",
                 tool_name="exe_shell",
@@ -674,6 +699,13 @@ class AIBridge(QObject):
                 description="列出目录结构",
                 auto_approve=True
             )
+            self.mcp_manager.register_tool_handler(
+                server_name="Linux终端",
+                tool_name="get_metrics_history",
+                handler=get_metrics_history,
+                description="查询当前会话的历史监控数据(min/avg/max/last)。series 如 cpu、mem、load1、cpu.core0、net.eth0.rx_kbps、disk./.used_percent，以.结尾按前缀匹配，留空返回全部；seconds 为回溯秒数",
+                auto_approve=True
+            )
         Linux终端()
         通用()
         超级内容()
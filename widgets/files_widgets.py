@@ -1,11 +1,12 @@
 
-from PyQt5.QtWidgets import (QApplication, QWidget, QLayout, QSizePolicy, QLabel,
-                             QRubberBand,  QVBoxLayout, QTableView, QHeaderView, QAbstractItemDelegate, QStyledItemDelegate, QStyle, QFileDialog)
+from PyQt5.QtWidgets import (QWidget, QLabel, QListView, QAbstractItemView,
+                             QVBoxLayout, QTableView, QHeaderView, QAbstractItemDelegate, QStyledItemDelegate, QStyle, QFileDialog)
 from PyQt5.QtGui import QFont, QPainter, QColor, QStandardItemModel, QStandardItem
-from PyQt5.QtCore import Qt, QRect, QSize, QPoint, pyqtSignal
-from qfluentwidgets import RoundMenu, Action, FluentIcon as FIF, LineEdit, ScrollArea, TableView, CheckableMenu
+from PyQt5.QtCore import Qt, QRect, QSize, QTimer, pyqtSignal, QAbstractListModel, QModelIndex
+from qfluentwidgets import RoundMenu, Action, FluentIcon as FIF, LineEdit, TableView, CheckableMenu
 import os
 import time
+from bisect import bisect_right
 from qfluentwidgets import isDarkTheme
 from tools.setting_config import SCM
 
@@ -34,6 +35,14 @@ def _format_size(size_bytes):
         return "0 B"  # Return "0 B" for any conversion errors
 
 
+# Details view: dirs-first sort key on the name column, used to merge listing pages
+DETAILS_SORT_ROLE = Qt.UserRole + 1
+
+
+def _details_sort_key(name, is_dir):
+    return ("0" if is_dir else "1") + name.lower()
+
+
 def _normalize_files_data(files):
     """Normalize different input formats to a standard list of tuples."""
     entries = []
@@ -66,65 +75,6 @@ def _normalize_files_data(files):
     return entries
 
 
-# ---------------- FlowLayout ----------------
-
-
-class FlowLayout(QLayout):
-
-    def __init__(self, parent=None, margin=10, spacing=20):
-        super().__init__(parent)
-        self.itemList = []
-        self.setContentsMargins(margin, margin, margin, margin)
-        self.setSpacing(spacing)
-
-    def addItem(self, item):
-        self.itemList.append(item)
-
-    def count(self):
-        return len(self.itemList)
-
-    def itemAt(self, index):
-        return self.itemList[index] if 0 <= index < len(self.itemList) else None
-
-    def takeAt(self, index):
-        return self.itemList.pop(index) if 0 <= index < len(self.itemList) else None
-
-    def expandingDirections(self):
-        return Qt.Orientations(Qt.Orientation(0))
-
-    def hasHeightForWidth(self):
-        return True
-
-    def heightForWidth(self, width):
-        return self.doLayout(QRect(0, 0, width, 0), True)
-
-    def setGeometry(self, rect):
-        super().setGeometry(rect)
-        self.doLayout(rect, False)
-
-    def sizeHint(self):
-        return QSize(400, 300)
-
-    def doLayout(self, rect, testOnly):
-        x, y = rect.x(), rect.y()
-        lineHeight = 0
-        for item in self.itemList:
-            wid = item.widget()
-            spaceX = self.spacing()
-            spaceY = self.spacing()
-            nextX = x + wid.sizeHint().width() + spaceX
-            if nextX - spaceX > rect.right() and lineHeight > 0:
-                x = rect.x()
-                y = y + lineHeight + spaceY
-                nextX = x + wid.sizeHint().width() + spaceX
-                lineHeight = 0
-            if not testOnly:
-                item.setGeometry(QRect(QPoint(x, y), wid.sizeHint()))
-            x = nextX
-            lineHeight = max(lineHeight, wid.sizeHint().height())
-        return y + lineHeight - rect.y()
-
-
 class FileActionsManager:
     """Manages the creation and connection of file operation actions."""
 
@@ -174,198 +124,222 @@ class FileActionsManager:
             self.info,
             self.rename
         ]
-# ---------------- FileItem ----------------
+# ---------------- Icon view ----------------
 
-# Icons mode
+# Icons mode：QListView(IconMode) + 自绘 delegate，只绘制可见的格子
 
 
-class FileItem(QWidget):
-    WIDTH, HEIGHT = 80, 100
-    selected_sign = pyqtSignal(dict)
-    # Operation type, file name, directory or not,parameter (download_compression)
-    action_triggered = pyqtSignal(str, object, bool, object)
-    # Operation type, original file name, new file name, whether it is a directory
-    rename_action = pyqtSignal(str, str, str, str)
-    # new_dir_name
-    mkdir_action = pyqtSignal(str)
-    # new file name
-    mkfile_action = pyqtSignal(str)
-
-    def __init__(self, name, is_dir, parent=None, explorer=None):
-        super().__init__(parent)
-        self.name = name
-        self.is_dir = is_dir
-        self.selected = False
-        self.parent_explorer = explorer
-        self.mkdir = False
-        self.mkfile = False
-        icons = self._get_icons()
-        self.icon = icons.Folder_Icon if is_dir else icons.File_Icon
-        self.setMinimumSize(self.WIDTH, self.HEIGHT)
-
-        self._update_style()
-        self.rename_edit = LineEdit(self)
-        self.rename_edit.setText(self.name)
-        self.rename_edit.setAlignment(Qt.AlignCenter)
-        self.rename_edit.hide()
-        # self.rename_edit.returnPressed.connect(self._apply_rename)
-        self.rename_edit.editingFinished.connect(self._apply_rename)
-        self._rename_applied = False
-        self._init_actions()
+class FileIconModel(QAbstractListModel):
+    """(name, is_dir) entries for the icon view, kept dirs-first by name."""
+    IsDirRole = Qt.UserRole
+    # None / "mkdir" / "mkfile"：新建文件夹/文件时插入的占位项
+    PendingRole = Qt.UserRole + 1
 
-    def _get_icons(self):
-        parent = self.parent()
-        while parent:
-            if hasattr(parent, 'icons'):
-                return parent.icons
-            parent = parent.parent()
-
-    def _update_style(self):
-        """Update styles based on the theme"""
-        if isDarkTheme():
-            self.setStyleSheet("""
-                FileItem {
-                    color: white;
-                    background: transparent;
-                }
-                FileItem:hover {
-                    background: rgba(255, 255, 255, 0.1);
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                FileItem {
-                    color: black;
-                    background: transparent;
-                }
-                FileItem:hover {
-                    background: rgba(0, 0, 0, 0.05);
-                }
-            """)
+    # row, old name, new name, is_dir, pending kind
+    name_committed = pyqtSignal(int, str, str, bool, object)
 
-    def sizeHint(self):
-        return QSize(self.WIDTH, self.HEIGHT)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries = []  # [name, is_dir, pending]
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
 
-        if self.selected:
-            painter.setBrush(QColor("#cce8ff"))
-            painter.setPen(Qt.NoPen)
-            painter.drawRoundedRect(self.rect(), 5, 5)
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, is_dir, pending = self._entries[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return name
+        if role == self.IsDirRole:
+            return is_dir
+        if role == self.PendingRole:
+            return pending
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """编辑器提交：不在这里改名，交给 name_committed 的处理者发起远程操作"""
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        entry = self._entries[index.row()]
+        old_name, is_dir, pending = entry
+        new_name = str(value).strip()
+        entry[2] = None
+        if pending and new_name:
+            entry[0] = new_name
+        self.dataChanged.emit(index, index)
+        self.name_committed.emit(
+            index.row(), old_name, new_name, is_dir, pending)
+        return True
 
-        painter.drawPixmap(
-            (self.width() - self.icon.width()) // 2, 5, self.icon)
+    def clear(self):
+        self.beginResetModel()
+        self._entries = []
+        self.endResetModel()
 
-        font = QFont("Segoe UI", 8)
-        painter.setFont(font)
+    def append_entries(self, entries):
+        if not entries:
+            return
+        first = len(self._entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self._entries.extend([name, is_dir, None] for name, is_dir in entries)
+        self.endInsertRows()
 
-        metrics = painter.fontMetrics()
-        text_width = metrics.width(self.name)
-        available_width = self.width() - 10
+    def merge_entries(self, entries):
+        """
+        Merge entries (sorted dirs-first by name) into the model. Listing pages
+        arrive unsorted relative to each other: the rows are appended, then
+        moved into place in one layout change so the selection follows them.
+        """
+        if not entries:
+            return
+        old_keys = [(not is_dir, name.lower())
+                    for name, is_dir, _ in self._entries]
+        positions = [bisect_right(old_keys, (not is_dir, name.lower()))
+                     for name, is_dir in entries]
+        count = len(self._entries)
+        self.append_entries(entries)
+        if positions[0] == count:
+            return
+        self.layoutAboutToBeChanged.emit()
+        merged = []
+        previous = 0
+        for offset, position in enumerate(positions):
+            merged.extend(self._entries[previous:position])
+            merged.append(self._entries[count + offset])
+            previous = position
+        merged.extend(self._entries[previous:count])
+        for index in self.persistentIndexList():
+            row = index.row()
+            if row < count:
+                row += bisect_right(positions, row)
+            else:
+                row = positions[row - count] + row - count
+            self.changePersistentIndex(index, self.index(row, 0))
+        self._entries = merged
+        self.layoutChanged.emit()
+
+    def insert_sorted(self, name, is_dir, pending=None) -> int:
+        """按 dirs-first + 名称顺序插入一项，返回行号"""
+        key = (not is_dir, name.lower())
+        row = len(self._entries)
+        for i, (other, other_is_dir, _) in enumerate(self._entries):
+            if (not other_is_dir, other.lower()) > key:
+                row = i
+                break
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._entries.insert(row, [name, is_dir, pending])
+        self.endInsertRows()
+        return row
+
+    def remove(self, row):
+        if 0 <= row < len(self._entries):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._entries[row]
+            self.endRemoveRows()
+
+    def names(self):
+        return {entry[0] for entry in self._entries}
+
+
+class FileIconDelegate(QStyledItemDelegate):
+    WIDTH, HEIGHT = 80, 100
 
-        display_text = self.name
-        if text_width > available_width:
+    def __init__(self, explorer):
+        super().__init__(explorer)
+        self.explorer = explorer
+        self._font = QFont("Segoe UI", 8)
 
-            display_text = metrics.elidedText(
-                self.name, Qt.ElideMiddle, available_width)
+    def sizeHint(self, option, index):
+        return QSize(self.WIDTH, self.HEIGHT)
 
-        if isDarkTheme():
+    def paint(self, painter, option, index):
+        icons = self.explorer._get_icons()
+        is_dir = index.data(FileIconModel.IsDirRole)
+        name = index.data(Qt.DisplayRole) or ""
+        rect = option.rect
+        dark = isDarkTheme()
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        if option.state & QStyle.State_Selected:
+            painter.setBrush(QColor("#cce8ff"))
+            painter.setPen(Qt.NoPen)
+            painter.drawRoundedRect(rect, 5, 5)
+        elif option.state & QStyle.State_MouseOver:
+            painter.setBrush(QColor(255, 255, 255, 25)
+                             if dark else QColor(0, 0, 0, 13))
+            painter.setPen(Qt.NoPen)
+            painter.drawRoundedRect(rect, 5, 5)
+
+        if icons:
+            icon = icons.Folder_Icon if is_dir else icons.File_Icon
+            painter.drawPixmap(
+                rect.x() + (rect.width() - icon.width()) // 2, rect.y() + 5, icon)
+
+        painter.setFont(self._font)
+        available_width = rect.width() - 10
+        display_text = painter.fontMetrics().elidedText(
+            name, Qt.ElideMiddle, available_width)
+        # 选中背景是浅色，文字保持黑色
+        if dark and not option.state & QStyle.State_Selected:
             painter.setPen(QColor(255, 255, 255))
         else:
             painter.setPen(QColor(0, 0, 0))
-
-        painter.drawText(QRect(5, 70, self.width()-10, 30),
+        painter.drawText(QRect(rect.x() + 5, rect.y() + 70, available_width, 30),
                          Qt.AlignCenter, display_text)
+        painter.restore()
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            ctrl = QApplication.keyboardModifiers() & Qt.ControlModifier
-            self.parent_explorer.select_item(self, ctrl)
+    def createEditor(self, parent, option, index):
+        editor = LineEdit(parent)
+        editor.setAlignment(Qt.AlignCenter)
+        return editor
 
-    def mouseDoubleClickEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.selected_sign.emit({self.name: self.is_dir})
-            print(f"Double-click to open: {self.name}")
+    def setEditorData(self, editor, index):
+        editor.setText(index.data(Qt.EditRole))
+        editor.selectAll()
 
-    def _init_actions(self):
-        self.actions_manager = FileActionsManager(
-            action_emitter=self._emit_action,
-            rename_handler=self._start_rename,
-            action_factory=self.parent_explorer._create_file_op_actions
-        )
+    def updateEditorGeometry(self, editor, option, index):
+        rect = option.rect
+        editor.setGeometry(rect.x() + 5, rect.y() + 70, rect.width() - 10, 25)
 
-    def _create_context_menu(self):
-        """Creates and returns the context menu for the file item."""
-        menu = RoundMenu(parent=self)
-        menu.addActions(self.actions_manager.get_all_actions())
-        return menu
 
-    def contextMenuEvent(self, e):
-        # Ensure the item is selected before showing the context menu
-        if not self.selected:
-            self.parent_explorer.select_item(self)
+class FileIconView(QListView):
+    """Icon mode list view; file shortcuts are left to FileExplorer.keyPressEvent."""
 
-        menu = self._create_context_menu()
-        menu.exec(e.globalPos())
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setSpacing(10)
+        # 大目录分批排版，避免一次性布局卡住界面
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(2000)
+        self.setWordWrap(False)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setSelectionRectVisible(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setDragEnabled(False)
+        self.setMouseTracking(True)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setStyleSheet(
+            "QListView { background: transparent; border: none; }")
 
-    def _emit_action(self, action_type, parameter=None):
-        if action_type == "rename":
-            self._start_rename()
-        else:
-            copy_cut_paths = []
-            if self.parent_explorer:
-                for item in self.parent_explorer.selected_items:
-                    if action_type in ("copy", "cut") or action_type == "download" and parameter:
-                        copy_cut_paths.append(item.name)
-                    else:
-                        self.action_triggered.emit(
-                            action_type, item.name, item.is_dir, parameter
-                        )
-            if copy_cut_paths:
-                if action_type != "download":
-                    self.action_triggered.emit(
-                        action_type, copy_cut_paths, False, parameter
-                    )
-                else:
-                    # if action_type == "download" and parameter:
-                    self.action_triggered.emit(
-                        action_type, copy_cut_paths, False, parameter)
-                    return
-
-    def _start_rename(self):
-        self._rename_applied = False
-        self.rename_edit.setText(self.name)
-        self.rename_edit.setGeometry(5, 70, self.width()-10, 25)
-        self.rename_edit.show()
-        self.rename_edit.setFocus()
-        self.rename_edit.selectAll()
-
-    def _apply_rename(self):
-        print("Apply rename")
-        if self._rename_applied:
+    def keyPressEvent(self, event):
+        ctrl = event.modifiers() & Qt.ControlModifier
+        if (ctrl and event.key() in (Qt.Key_C, Qt.Key_V, Qt.Key_X)) or (
+                not ctrl and event.key() in (Qt.Key_Delete, Qt.Key_F2, Qt.Key_F5, Qt.Key_Backspace)):
+            event.ignore()
             return
-
-        self._rename_applied = True
-        new_name = self.rename_edit.text().strip()
-        if self.mkdir:
-            self.mkdir_action.emit(new_name)
-            self.mkdir = False
-            self.rename_edit.hide()
-            self.update()
-        if self.mkfile:
-            self.mkfile_action.emit(new_name)
-            self.mkfile = False
-            self.rename_edit.hide()
-            self.update()
-        else:
-
-            if new_name and new_name != self.name:
-                self.rename_action.emit(
-                    "rename", self.name, new_name, str(self.is_dir))
-            self.rename_edit.hide()
-            self.update()
+        super().keyPressEvent(event)
 
 
 class NameDelegate(QStyledItemDelegate):
@@ -396,6 +370,7 @@ class DetailItem(QWidget):
         super().__init__(parent)
         # Details view
         self.details_model = QStandardItemModel(self)
+        self.details_model.setSortRole(DETAILS_SORT_ROLE)
         self.details_view = TableView(self)
         self.details_view.setAlternatingRowColors(False)
         self.details_view.verticalHeader().setDefaultSectionSize(24)
@@ -549,10 +524,16 @@ class DetailItem(QWidget):
         return menu
 
     def _add_files_to_details_view(self, files, clear_old=True):
-        self.details_model.setRowCount(0)
+        if clear_old:
+            self.details_model.setRowCount(0)
         entries = _normalize_files_data(files)
         # Sort by name, with directories first
         entries.sort(key=lambda x: (not x[1], x[0].lower()))
+        count = self.details_model.rowCount()
+        # A later listing page may belong between rows already shown
+        needs_merge = bool(entries) and count > 0 and (
+            self.details_model.item(count - 1, 0).data(DETAILS_SORT_ROLE) or ""
+        ) > _details_sort_key(entries[0][0], entries[0][1])
 
         for name, is_dir, size, mod_time, perms, owner in entries:
             # For files, always format size (even if 0 or empty)
@@ -561,6 +542,7 @@ class DetailItem(QWidget):
             item_name = QStandardItem(name)
             # Store is_dir flag in the item itself for later retrieval
             item_name.setData(is_dir, Qt.UserRole)
+            item_name.setData(_details_sort_key(name, is_dir), DETAILS_SORT_ROLE)
 
             row = [
                 item_name,
@@ -571,6 +553,8 @@ class DetailItem(QWidget):
             ]
 
             self.details_model.appendRow(row)
+        if needs_merge:
+            self.details_model.sort(0)
 
     def rename_selected_item(self):
         """Make the selected file name editable"""
@@ -711,12 +695,17 @@ class FileExplorer(QWidget):
         self.label.hide()
 
         # Icon view
-        self.scroll_area = ScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.container = QWidget()
-        self.flow_layout = FlowLayout(self.container)
-        self.container.setLayout(self.flow_layout)
-        self.scroll_area.setWidget(self.container)
+        self.icon_model = FileIconModel(self)
+        self.icon_view = FileIconView(self)
+        self.icon_view.setModel(self.icon_model)
+        self.icon_view.setItemDelegate(FileIconDelegate(self))
+        self.icon_view.doubleClicked.connect(self._on_icon_double_click)
+        self.icon_view.customContextMenuRequested.connect(
+            self._show_icon_context_menu)
+        self.icon_view.itemDelegate().closeEditor.connect(
+            self._on_icon_editor_closed)
+        self.icon_model.name_committed.connect(self._on_icon_name_committed)
+        self._icons = None
 
         # detaile
         self.details = DetailItem(self)
@@ -726,19 +715,29 @@ class FileExplorer(QWidget):
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.addWidget(self.label)
-        main_layout.addWidget(self.scroll_area)
+        main_layout.addWidget(self.icon_view)
         main_layout.addWidget(self.details.details_view)
         self.setLayout(main_layout)
-        self.selected_items = set()
-        self.rubberBand = QRubberBand(QRubberBand.Rectangle, self)
-        self.dragging = False
-        self.start_pos = None
-        self.setMouseTracking(True)
         self.setAcceptDrops(True)
 
         # self.make_dir.triggered.connect(
         #     lambda: self._handle_file_action("mkdir", "", ""))
         self._init_actions()
+        self.icon_actions = FileActionsManager(
+            action_emitter=self._emit_icon_action,
+            rename_handler=self._start_icon_rename,
+            action_factory=self._create_file_op_actions
+        )
+
+    def _get_icons(self):
+        if self._icons is None:
+            parent = self.parent()
+            while parent:
+                if hasattr(parent, 'icons'):
+                    self._icons = parent.icons
+                    break
+                parent = parent.parent()
+        return self._icons
 
     def _request_directory_change(self, item_info):
         print(item_info)
@@ -757,22 +756,14 @@ class FileExplorer(QWidget):
         new_folder_name = "NewFolder"
 
         if self.view_mode == "icon":
-            existing_names = {self.flow_layout.itemAt(
-                i).widget().name for i in range(self.flow_layout.count())}
+            existing_names = self.icon_model.names()
             counter = 1
             candidate_name = new_folder_name
             while candidate_name in existing_names:
                 candidate_name = f"{new_folder_name} ({counter})"
                 counter += 1
 
-            self.add_files([(candidate_name, True)], clear_old=False)
-
-            new_item = self.flow_layout.itemAt(
-                self.flow_layout.count() - 1).widget()
-
-            self.select_item(new_item)
-            new_item.mkdir = True
-            new_item._start_rename()
+            self._start_icon_placeholder(candidate_name, True, "mkdir")
         else:  # Details view
             model = self.details.details_model
             existing_names = {model.item(
@@ -785,6 +776,7 @@ class FileExplorer(QWidget):
 
             item_name = QStandardItem(candidate_name)
             item_name.setData(True, Qt.UserRole)  # is_dir = True
+            item_name.setData(_details_sort_key(candidate_name, True), DETAILS_SORT_ROLE)
 
             row_items = [
                 item_name, QStandardItem(""), QStandardItem(""),
@@ -821,23 +813,15 @@ class FileExplorer(QWidget):
         new_file_name = "NewFile.txt"
 
         if self.view_mode == "icon":
-            existing_names = {self.flow_layout.itemAt(
-                i).widget().name for i in range(self.flow_layout.count())}
+            existing_names = self.icon_model.names()
             counter = 1
             candidate_name = new_file_name
             while candidate_name in existing_names:
                 candidate_name = f"NewFile ({counter}).txt"
                 counter += 1
 
-            # 添加文件，第四个参数为 False 表示文件
-            self.add_files([(candidate_name, False)], clear_old=False)
-
-            new_item = self.flow_layout.itemAt(
-                self.flow_layout.count() - 1).widget()
-
-            self.select_item(new_item)
-            new_item.mkfile = True  # 标记为新建文件
-            new_item._start_rename()
+            # 占位项标记为新建文件
+            self._start_icon_placeholder(candidate_name, False, "mkfile")
         else:  # Details view
             model = self.details.details_model
             existing_names = {model.item(
@@ -850,6 +834,7 @@ class FileExplorer(QWidget):
 
             item_name = QStandardItem(candidate_name)
             item_name.setData(False, Qt.UserRole)  # is_dir = False
+            item_name.setData(_details_sort_key(candidate_name, False), DETAILS_SORT_ROLE)
 
             row_items = [
                 item_name, QStandardItem(""), QStandardItem(""),
@@ -901,11 +886,11 @@ class FileExplorer(QWidget):
         """Switch between icon and details view."""
         if view_type == "icon":
             self.view_mode = "icon"
-            self.scroll_area.setVisible(True)
+            self.icon_view.setVisible(True)
             self.details.details_view.setVisible(False)
         elif view_type == "details":
             self.view_mode = "details"
-            self.scroll_area.setVisible(False)
+            self.icon_view.setVisible(False)
             self.details.details_view.setVisible(True)
         # Refresh the view with current files
         self.refresh_action.emit()
@@ -913,11 +898,7 @@ class FileExplorer(QWidget):
     def _clear_all_items(self):
 
         if self.view_mode == "icon":
-            while self.flow_layout.count():
-                item = self.flow_layout.takeAt(0)
-                if item and item.widget():
-                    item.widget().deleteLater()
-            self.selected_items.clear()
+            self.icon_model.clear()
 
         else:
             self.details.details_model.removeRows(
@@ -952,53 +933,90 @@ class FileExplorer(QWidget):
         print(f"渲染文件列表到视图耗时: {end_time - start_time:.4f} 秒")
 
     def _add_files_to_icon_view(self, files, clear_old=True):
-        self.container.setUpdatesEnabled(False)
         if clear_old:
-            while self.flow_layout.count():
-                item = self.flow_layout.takeAt(0)
-                if item and item.widget():
-                    item.widget().deleteLater()
-            self.selected_items.clear()
-
+            self.icon_model.clear()
         entries = _normalize_files_data(files)
         entries.sort(key=lambda x: (not x[1], x[0].lower()))
+        self.icon_model.merge_entries(
+            [(name, is_dir) for name, is_dir, *_ in entries])
+
+    def _selected_icon_entries(self):
+        """[(name, is_dir), ...] of the selected icons, in view order."""
+        indexes = sorted(self.icon_view.selectionModel().selectedIndexes(),
+                         key=lambda index: index.row())
+        return [(index.data(Qt.DisplayRole), bool(index.data(FileIconModel.IsDirRole)))
+                for index in indexes]
+
+    def _select_icon_row(self, row):
+        index = self.icon_model.index(row, 0)
+        self.icon_view.selectionModel().select(
+            index, self.icon_view.selectionModel().ClearAndSelect)
+        self.icon_view.setCurrentIndex(index)
+        self.icon_view.scrollTo(index)
+        return index
+
+    def _on_icon_double_click(self, index):
+        if not index.isValid() or index.data(FileIconModel.PendingRole):
+            return
+        name = index.data(Qt.DisplayRole)
+        self._request_directory_change(
+            {name: bool(index.data(FileIconModel.IsDirRole))})
+        print(f"Double-click to open: {name}")
 
-        for name, is_dir, *_ in entries:
-            item_widget = FileItem(
-                name, is_dir, parent=self.container, explorer=self)
-            item_widget.selected_sign.connect(self._request_directory_change)
-            item_widget.action_triggered.connect(self._handle_file_action)
-            item_widget.rename_action.connect(
-                lambda type_, name, new_name, is_dir: self._handle_file_action(
-                    action_type=type_, file_name=name, is_dir=is_dir, new_name=new_name))
-            item_widget.mkdir_action.connect(
-                lambda new_dir_name: self._handle_file_action(
-                    action_type="mkdir", file_name=new_dir_name))
-            item_widget.mkfile_action.connect(
-                lambda new_file_name: self._handle_file_action(
-                    action_type="mkfile", file_name=new_file_name)
-            )
-            item_widget.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-            self.flow_layout.addWidget(item_widget)
+    def _show_icon_context_menu(self, pos):
+        index = self.icon_view.indexAt(pos)
+        if not index.isValid():
+            menu = self._get_menus()
+        else:
+            # Ensure the item is selected before showing the context menu
+            if not self.icon_view.selectionModel().isSelected(index):
+                self._select_icon_row(index.row())
+            menu = RoundMenu(parent=self)
+            menu.addActions(self.icon_actions.get_all_actions())
+        menu.exec_(self.icon_view.viewport().mapToGlobal(pos))
+
+    def _emit_icon_action(self, action_type, parameter=None):
+        if action_type == "rename":
+            self._start_icon_rename()
+            return
+        copy_cut_paths = []
+        for name, is_dir in self._selected_icon_entries():
+            if action_type in ("copy", "cut") or action_type == "download" and parameter:
+                copy_cut_paths.append(name)
+            else:
+                self._handle_file_action(action_type, name, is_dir, parameter)
+        if copy_cut_paths:
+            self._handle_file_action(
+                action_type, copy_cut_paths, False, parameter)
+
+    def _start_icon_rename(self):
+        indexes = self.icon_view.selectionModel().selectedIndexes()
+        if len(indexes) == 1:
+            self.icon_view.edit(indexes[0])
 
-        self.container.setUpdatesEnabled(True)
-        self.container.update()
+    def _start_icon_placeholder(self, name, is_dir, pending):
+        row = self.icon_model.insert_sorted(name, is_dir, pending)
+        self.label.hide()
+        self.icon_view.edit(self._select_icon_row(row))
 
-    def select_item(self, item, ctrl=False):
-        if ctrl:
-            if item in self.selected_items:
-                self.selected_items.remove(item)
-                item.selected = False
+    def _on_icon_name_committed(self, row, old_name, new_name, is_dir, pending):
+        if pending:
+            if new_name:
+                self._handle_file_action(pending, new_name)
             else:
-                self.selected_items.add(item)
-                item.selected = True
-        else:
-            for i in self.selected_items:
-                i.selected = False
-                i.update()
-            self.selected_items = {item}
-            item.selected = True
-        item.update()
+                # 仍处于编辑器提交过程中，稍后再移除占位项
+                QTimer.singleShot(0, lambda: self.icon_model.remove(row))
+        elif new_name and new_name != old_name:
+            self._handle_file_action(
+                "rename", old_name, str(is_dir), new_name=new_name)
+
+    def _on_icon_editor_closed(self, editor, hint):
+        """Esc 取消新建：移除占位项"""
+        if hint != QAbstractItemDelegate.RevertModelCache:
+            return
+        index = self.icon_view.currentIndex()
+        if index.isValid() and index.data(FileIconModel.PendingRole):
+            self.icon_model.remove(index.row())
 
     # new_name/compression
     def _handle_file_action(self, action_type, file_name, is_dir=None, new_name=None):
@@ -1097,52 +1115,6 @@ class FileExplorer(QWidget):
         menu = self.details_context_menu()
         menu.exec_(self.details_view.viewport().mapToGlobal(pos))
 
-    def mousePressEvent(self, event):
-        # This event is for the icon view's rubber band selection
-        if self.view_mode == 'details':
-            super().mousePressEvent(event)
-            return
-        if event.button() == Qt.LeftButton:
-            ctrl = QApplication.keyboardModifiers() & Qt.ControlModifier
-            in_item = False
-            for i in range(self.flow_layout.count()):
-                widget = self.flow_layout.itemAt(i).widget()
-                if widget.geometry().contains(event.pos()):
-                    in_item = True
-                    break
-            if not in_item:
-                self.dragging = True
-                self.start_pos = event.pos()
-                if not ctrl:
-                    for item in self.selected_items:
-                        item.selected = False
-                        item.update()
-                    self.selected_items.clear()
-                self.rubberBand.setGeometry(QRect(self.start_pos, QSize()))
-                self.rubberBand.show()
-
-    def mouseMoveEvent(self, event):
-        if self.dragging:
-            rect = QRect(self.start_pos, event.pos()).normalized()
-            self.rubberBand.setGeometry(rect)
-            for i in range(self.flow_layout.count()):
-                widget = self.flow_layout.itemAt(i).widget()
-                if rect.intersects(widget.geometry()):
-                    if widget not in self.selected_items:
-                        self.selected_items.add(widget)
-                        widget.selected = True
-                        widget.update()
-                else:
-                    if widget in self.selected_items and not (Qt.ControlModifier & QApplication.keyboardModifiers()):
-                        self.selected_items.remove(widget)
-                        widget.selected = False
-                        widget.update()
-
-    def mouseReleaseEvent(self, event):
-        if self.dragging:
-            self.dragging = False
-            self.rubberBand.hide()
-
     # ---------------- Drag-in file event ----------------
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -1235,9 +1207,7 @@ class FileExplorer(QWidget):
     def keyPressEvent(self, event):
         def get_selected_names():
             if self.view_mode == 'icon':
-                if not self.selected_items:
-                    return []
-                return [item.name for item in self.selected_items]
+                return [name for name, _ in self._selected_icon_entries()]
             elif self.view_mode == 'details':
                 indexes = self.details.details_view.selectionModel().selectedRows()
                 if not indexes:
@@ -1296,9 +1266,8 @@ class FileExplorer(QWidget):
 
         elif event.key() == Qt.Key_F2:
             # F2 rename should only work for a single selection
-            if self.view_mode == 'icon' and len(self.selected_items) == 1:
-                item = list(self.selected_items)[0]
-                item._start_rename()
+            if self.view_mode == 'icon':
+                self._start_icon_rename()
             elif self.view_mode == 'details' and len(self.details.details_view.selectionModel().selectedRows()) == 1:
                 self.details.rename_selected_item()
 
@@ -1308,12 +1277,7 @@ class FileExplorer(QWidget):
             self.selected.emit({'..': True})
         elif event.key() == Qt.Key_A and (event.modifiers() & Qt.ControlModifier):
             if self.view_mode == 'icon':
-                self.selected_items.clear()
-                for i in range(self.flow_layout.count()):
-                    widget = self.flow_layout.itemAt(i).widget()
-                    widget.selected = True
-                    widget.update()
-                    self.selected_items.add(widget)
+                self.icon_view.selectAll()
         else:
             super().keyPressEvent(event)
 
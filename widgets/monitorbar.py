@@ -156,6 +156,9 @@ class MonitorBar(QWidget):
             "uptime_seconds": 0,
             "load": None,
             "cpu_percent": 0.0,
+            "cpu_per_core": None,
+            "cpu_iowait": 0.0,
+            "cpu_steal": 0.0,
             "ram_percent": 0.0,
             "ram_used_mb": 0.0,
             "disk_percent": 0.0,
@@ -170,6 +173,8 @@ class MonitorBar(QWidget):
          - uptime_seconds: int
          - load: sequence of 3 floats
          - cpu_percent: float (0-100)
+         - cpu_per_core: sequence of floats (0-100), one per core
+         - cpu_iowait / cpu_steal: float (0-100)
          - ram_percent: float (0-100)
          - disk_percent: float (0-100)
          - net_up_kbps: float
@@ -206,6 +211,12 @@ class MonitorBar(QWidget):
         ram_used_show = f"{ram_used_mb/1024:.1f}GB" if ram_used_mb >= 1024 else f"{ram_used_mb:.0f}MB"
 
         self.cpu_text.setText(f"{cpu:.0f}%")
+        per_core = self._last.get("cpu_per_core")
+        if per_core:
+            cores = "  ".join(
+                f"#{i}: {v:.0f}%" for i, v in enumerate(per_core))
+            self.cpu_text.setToolTip(
+                f"{cores}\niowait: {self._last.get('cpu_iowait', 0.0):.1f}%  steal: {self._last.get('cpu_steal', 0.0):.1f}%")
         self.ram_text.setText(f"{ram:.0f}% ({ram_used_show})")
         # self.disk_text.setText(f"{disk:.0f}%")
 
@@ -10,7 +10,8 @@ Features:
 - bg_color parameter (fallback background color when transparency isn't desirable).
 - text_shadow parameter (boolean) to add subtle text shadow for readability.
 - Dynamic theme update via set_colors().
-- Bridge (TerminalBridge) relays bytes <-> base64 across the QWebChannel.
+- Terminal output reaches xterm.js as binary WebSocket frames (TerminalSocket);
+  input and the fallback output path go through the QWebChannel bridge as base64.
 
 Usage:
     widget = WebTerminal(parent, cols=120, rows=30,
@@ -21,6 +22,7 @@ Usage:
                       bg_color="rgba(0,0,0,0.6)", text_shadow=False)
 """
 import base64
+import codecs
 import json
 import html
 from collections import deque
@@ -31,6 +33,8 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWebChannel import QWebChannel
 import PyQt5.QtCore as qc
 from tools.setting_config import SCM
+from tools.terminal_socket import TerminalSocketServer
+from tools.scrollback import ScrollbackBuffer
 import re
 import os
 from PyQt5.QtWidgets import QShortcut
@@ -40,6 +44,7 @@ print("QT_VERSION:", qc.QT_VERSION_STR, "PYQT:", qc.PYQT_VERSION_STR)
 
 configer = SCM()
 config = configer.read_config()
+_ansi_osc_re = re.compile(r'\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)')
 _ansi_csi_re = re.compile(r'\x1b\[[0-9;?]*[ -/]*[@-~]')
 _ansi_esc_re = re.compile(r'\x1b.[@-~]?')
 TPL = """
@@ -287,21 +292,66 @@ document.addEventListener('drop', e => e.preventDefault());
         }
       };
 
-      // Bridge -> JS: receive base64 data and write into terminal
-      if (bridge && bridge.output) {
-        bridge.output.connect(function(b64) {
-          try {
-            var text = base64ToUtf8(b64);
-            term.write(text);
-          } catch (e) {
-            console.error('bridge.output write error', e);
+      // Flow control: report bytes xterm has actually parsed, so the worker
+      // stops reading the channel while too much output is still queued here
+      var ws = null;
+      var ackPending = 0;
+      var ackTimer = null;
+      function sendAck() {
+        ackTimer = null;
+        if (!ackPending) return;
+        var count = ackPending;
+        ackPending = 0;
+        if (ws && ws.readyState === WebSocket.OPEN) {
+          ws.send(String(count));
+        } else if (bridge && bridge.ackOutput) {
+          bridge.ackOutput(count);
+        }
+      }
+      function writeOutput(bytes) {
+        term.write(bytes, function() {
+          ackPending += bytes.length;
+          if (ackPending >= 65536) {
+            sendAck();
+          } else if (!ackTimer) {
+            ackTimer = setTimeout(sendAck, 20);
           }
         });
       }
-        function base64ToUtf8(b64) {
-const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
-return new TextDecoder("utf-8").decode(bytes);
-}
+
+      // Bridge -> JS (fallback): receive base64 data and write into terminal
+      function useBridgeOutput() {
+        if (bridge && bridge.output) {
+          bridge.output.connect(function(b64) {
+            try {
+              // xterm 自己做 UTF-8 解码，跨块的多字节字符也不会被拆坏
+              writeOutput(Uint8Array.from(atob(b64), c => c.charCodeAt(0)));
+            } catch (e) {
+              console.error('bridge.output write error', e);
+            }
+          });
+        }
+      }
+
+      // Socket -> JS: raw output bytes as binary frames, no base64
+      var socketUrl = {{socket_url}};
+      if (socketUrl && window.WebSocket) {
+        var socketOpened = false;
+        ws = new WebSocket(socketUrl);
+        ws.binaryType = 'arraybuffer';
+        ws.onopen = function() { socketOpened = true; };
+        ws.onmessage = function(e) { writeOutput(new Uint8Array(e.data)); };
+        ws.onclose = function() {
+          if (!socketOpened) {
+            console.warn('terminal socket unavailable, using QWebChannel');
+            useBridgeOutput();
+            if (bridge && bridge.socketFailed) bridge.socketFailed();
+          }
+        };
+      } else {
+        useBridgeOutput();
+        if (socketUrl && bridge && bridge.socketFailed) bridge.socketFailed();
+      }
         function utf8ToBase64(str) {
 const bytes = new TextEncoder().encode(str);
 let binary = '';
@@ -395,7 +445,8 @@ return btoa(binary);
 
 
 def _strip_ansi_sequences(s: str) -> str:
-    """移除常见的 ESC/CSI 控制序列（方向键、功能键等）"""
+    """移除常见的 ESC/CSI 控制序列（方向键、功能键等）和 OSC（标题、shell integration 标记）"""
+    s = _ansi_osc_re.sub('', s)
     s = _ansi_csi_re.sub('', s)
     s = _ansi_esc_re.sub('', s)
     return s
@@ -406,18 +457,22 @@ class TerminalBridge(QObject):
     Bridge object exposed to JavaScript via QWebChannel.
 
     Signals:
-        output(str) : emits base64-encoded bytes from SSHWorker to JS.
+        output(str) : emits base64-encoded bytes from SSHWorker to JS, only when
+            the terminal socket is unavailable.
+        raw_output(bytes) : every output chunk as received, for Python-side consumers.
         ready() : emits when frontend is ready.
         scrollPositionChanged(int) : emits scroll position from JS to Python.
         directoryChanged(str) : emits directory change events.
     """
     output = pyqtSignal(str)
+    raw_output = pyqtSignal(bytes)
     ready = pyqtSignal()
     directoryChanged = pyqtSignal(str)
 
     def __init__(self, parent=None, user_name=None, home_path=None):
         super().__init__(parent)
         self.worker = None
+        self.socket = None  # TerminalSocket，None 时走 base64
         self.current_directory = "/"
         self._input_buffer = ""  # 用户输入缓冲
         self.username = user_name
@@ -429,11 +484,20 @@ class TerminalBridge(QObject):
         if self.worker is not None:
             try:
                 self.worker.result_ready.disconnect(self._on_worker_output)
+                self.worker.cwd_changed.disconnect(self._on_shell_cwd)
             except Exception:
                 pass
+            self.worker.release_output()
         self.worker = worker
         if worker:
             worker.result_ready.connect(self._on_worker_output)
+            worker.cwd_changed.connect(self._on_shell_cwd)
+
+    def _on_shell_cwd(self, path: str):
+        """The shell reported its directory (OSC 7); exact, unlike parsing typed cd."""
+        if path != self.current_directory:
+            self.current_directory = path
+            self.directoryChanged.emit(path)
 
     def _process_user_input(self, data: bytes):
         """
@@ -500,6 +564,9 @@ class TerminalBridge(QObject):
         支持 cd <dir>、cd、cd ~、cd ~/subdir 等。
         """
         try:
+            if self.worker and self.worker.tracks_cwd():
+                # shell 自己报告目录时不再猜测
+                return
             parts = command.split()
             if not parts:
                 return
@@ -540,13 +607,36 @@ class TerminalBridge(QObject):
             print(f"_process_command error: {e}")
 
     def _on_worker_output(self, chunk: bytes):
-        """Encode bytes -> base64 and emit to JS."""
+        """Send bytes to JS over the terminal socket, or base64 via QWebChannel."""
         try:
-            b64 = base64.b64encode(chunk).decode("ascii")
-            self.output.emit(b64)
+            if self.socket is None or not self.socket.send(chunk):
+                self.output.emit(base64.b64encode(chunk).decode("ascii"))
+            self.raw_output.emit(chunk)
         except Exception as e:
             print(f"处理输出时出错: {e}")
 
+    @pyqtSlot(int)
+    def ackOutput(self, count: int):
+        """JS -> Python: xterm.js has rendered `count` more output bytes"""
+        if self.worker:
+            self.worker.acknowledge_output(count)
+
+    def set_socket(self, socket):
+        self.socket = socket
+        if socket:
+            socket.on_ack = self.ackOutput
+
+    @pyqtSlot()
+    def socketFailed(self):
+        """JS -> Python: the page cannot use the terminal socket"""
+        if self.socket is None:
+            return
+        pending = self.socket.take_pending()
+        self.socket.close()
+        self.socket = None
+        if pending:
+            self.output.emit(base64.b64encode(pending).decode("ascii"))
+
     @pyqtSlot(str)
     def sendInput(self, b64: str):
         """JS -> Python: base64-encoded user input"""
@@ -556,7 +646,11 @@ class TerminalBridge(QObject):
             data = base64.b64decode(b64)
             # print("接收到:", data.decode("utf-8", errors="ignore"))
             self._process_user_input(data)
-            self.worker.run_command(data, add_newline=False)
+            if data == b"\x03":
+                # Ctrl+C 插队：立即发送并丢弃尚未显示的输出
+                self.worker.send_interrupt()
+            else:
+                self.worker.run_command(data, add_newline=False)
         except Exception as e:
             print("TerminalBridge.sendInput error:", e)
 
@@ -664,6 +758,7 @@ class WebTerminal(QWidget):
         self.channel = QWebChannel(self.view.page())
         print(f"User name {user_name}")
         self.bridge = TerminalBridge(self, user_name=user_name)
+        self.bridge.set_socket(TerminalSocketServer().open())
         self.bridge.directoryChanged.connect(self._on_directory_changed)
         self.channel.registerObject("bridge", self.bridge)
         self.view.page().setWebChannel(self.channel)
@@ -693,11 +788,13 @@ class WebTerminal(QWidget):
 
         self.view.page().loadFinished.connect(self._on_page_loaded)
 
-        self.terminal_texts = ""
-        self._terminal_texts_max = 1500
+        # 纯文本历史（按行的环形缓冲 + 提示符索引），供 AI 工具读取
+        self.terminal_texts = ScrollbackBuffer(
+            max_chars=1500, clean=_strip_ansi_sequences)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
         if config["aigc_open"]:
             try:
-                self.bridge.output.connect(self._on_bridge_output)
+                self.bridge.raw_output.connect(self._on_bridge_output)
             except Exception:
                 pass
 
@@ -829,6 +926,8 @@ class WebTerminal(QWidget):
         final = final.replace("{{shadow}}", shadow_bool)
         final = final.replace("{{bg_css}}", self._bg_color)
         final = final.replace("{{font_family}}", self._font_family)
+        socket = self.bridge.socket
+        final = final.replace("{{socket_url}}", json.dumps(socket.url if socket else None))
 
         return final
 
@@ -920,7 +1019,7 @@ class WebTerminal(QWidget):
         except Exception:
             pass
         try:
-            self.terminal_texts = ""
+            self.terminal_texts.clear()
         except Exception:
             pass
         # 2️⃣ 注销 worker
@@ -930,8 +1029,13 @@ class WebTerminal(QWidget):
                     self.bridge._on_worker_output)
             except Exception:
                 pass
+            self.bridge.worker.release_output()
             self.bridge.worker = None
 
+        if self.bridge.socket:
+            self.bridge.socket.close()
+            self.bridge.socket = None
+
         # 3️⃣ 清空输入缓冲
         self.bridge._input_buffer = ""
         self.bridge.current_directory = "/"
@@ -962,23 +1066,18 @@ class WebTerminal(QWidget):
             parent_layout.removeWidget(self)
         self.setParent(None)
 
-    def _on_bridge_output(self, b64: str):
+    def _on_bridge_output(self, chunk_bytes: bytes):
         """
-        Slot connected to TerminalBridge.output (base64-encoded bytes).
-        Decode -> strip ANSI -> append to self.terminal_texts, trimming from head if needed.
+        Slot connected to TerminalBridge.raw_output (raw bytes).
+        Decode -> strip ANSI -> append to the self.terminal_texts scrollback.
         """
         try:
-            # decode base64 -> bytes -> text
-            chunk_bytes = base64.b64decode(b64)
-            text = chunk_bytes.decode('utf-8', errors='ignore')
+            # 增量解码：被分块拆开的多字节字符留到下一块
+            text = self._text_decoder.decode(chunk_bytes)
             # strip ANSI sequences to keep plain terminal text (optional but usually desired)
             plain = _strip_ansi_sequences(text)
 
-            # append and trim to max length (keep newest chars)
-            self.terminal_texts += plain
-            if len(self.terminal_texts) > self._terminal_texts_max:
-                # keep the last _terminal_texts_max characters
-                self.terminal_texts = self.terminal_texts[-self._terminal_texts_max:]
+            self.terminal_texts.append(plain)
 
         except Exception as e:
             # Don't crash the app for logging reasons; print for debug
@@ -989,31 +1088,19 @@ class WebTerminal(QWidget):
             self.bridge.worker.execute_command_and_capture(command)
 
     def get_latest_output(self, count=1):
-        if not self.terminal_texts:
+        worker = self.bridge.worker if self.bridge else None
+        if worker and worker.tracks_commands():
+            # shell integration：命令、退出码和输出边界都是精确的
+            outputs = [(command, output[-self.terminal_texts.max_chars:], exit_code)
+                       for command, exit_code, output in worker.latest_commands(count)]
+        else:
+            outputs = [(command, output, None)
+                       for command, output in self.terminal_texts.latest_outputs(count)]
+        if not outputs:
             return "<results></results>"
-        prompt_re = re.compile(r"[\w\d\._-]+@[\w\d\.-]+:.*[#\$]")
-        lines = self.terminal_texts.splitlines()
-        prompt_indices = [i for i, line in enumerate(
-            lines) if prompt_re.search(line)]
         results_xml = "<results>"
-        num_possible_outputs = len(prompt_indices) - 1
-        if num_possible_outputs < 1:
-            return "<results></results>"
-        actual_count = min(count, num_possible_outputs)
-        for i in range(actual_count):
-            end_prompt_index = prompt_indices[-(i + 1)]
-            start_prompt_index = prompt_indices[-(i + 2)]
-            start_prompt_line = lines[start_prompt_index]
-            cleaned_start_line = _strip_ansi_sequences(start_prompt_line)
-            command = ""
-            last_hash_pos = cleaned_start_line.rfind('#')
-            last_dollar_pos = cleaned_start_line.rfind('$')
-            split_pos = max(last_hash_pos, last_dollar_pos)
-            if split_pos != -1:
-                command = cleaned_start_line[split_pos + 1:].strip()
-            output_lines = lines[start_prompt_index + 1: end_prompt_index]
-            full_output = "\n".join(output_lines)
-            plain_output = _strip_ansi_sequences(full_output)
-            results_xml += f"""<command_{i + 1}><cmd>{command}</cmd><output>{plain_output}</output></command_{i + 1}>"""
+        for i, (command, output, exit_code) in enumerate(outputs):
+            code = "" if exit_code is None else f"<exit_code>{exit_code}</exit_code>"
+            results_xml += f"""<command_{i + 1}><cmd>{command}</cmd>{code}<output>{output}</output></command_{i + 1}>"""
         results_xml += "\n</results>"
         return results_xml
@@ -893,12 +893,13 @@ class SSHWidget(QWidget):
             self.start_loading_animation("file_explorer")
             self.file_manager.list_dir_async(path)
 
-    def _on_list_dir_finished(self, path: str, file_dict: dict):
-        # if path != self.file_explorer.path:
-        #     return
+    def _on_list_dir_finished(self, path: str, file_dict: list, append: bool = False):
+        # 大目录分页到达：后续页只追加到仍在显示该目录的视图
+        if append and path != self.file_explorer.path:
+            return
 
         try:
-            self.file_explorer.add_files(file_dict)
+            self.file_explorer.add_files(file_dict, clear_old=not append)
             if hasattr(self, '_perf_counter_start') and self._perf_counter_start:
                 end_time = time.perf_counter()
                 total_duration = end_time - self._perf_counter_start
@@ -9,6 +9,8 @@ import paramiko
 import socket
 import select
 from tools.session_manager import SessionManager
+from tools.bandwidth import BandwidthShaper
+from tools.scrollback import ScrollbackBuffer
 import re
 session_manager = SessionManager()
 
@@ -46,6 +48,8 @@ class SshClient(QThread):
 
     def __init__(self, host=None, port=22, user=None, password=None, key_path=None, channel=None):
         super().__init__()
+        # BandwidthShaper 会话键，设置后键盘输入会让同会话的传输限速
+        self.bandwidth_key = None
 
         # 模式1: 传入已打开的 channel
         if channel is not None:
@@ -128,6 +132,8 @@ class SshClient(QThread):
         """发送数据到 SSH 通道"""
         if self.channel:
             try:
+                if self.bandwidth_key:
+                    BandwidthShaper().note_interactive(self.bandwidth_key)
                 self.channel.send(data)
             except Exception as e:
                 print(f"Send Error: {e}")
@@ -145,8 +151,9 @@ class TerminalScreen(QWidget):
         super().__init__()
         self.ssh = None  # 延迟设置
         self.setFocusPolicy(Qt.StrongFocus)
-        self.terminal_texts = ""
-        self._terminal_texts_max = 15000  # 增加限制，确保不会无限增长
+        # 纯文本历史（按行的环形缓冲 + 提示符索引），供 AI 工具读取
+        self.terminal_texts = ScrollbackBuffer(
+            max_chars=15000, clean=_strip_ansi_sequences)  # 增加限制，确保不会无限增长
         # 支持通过参数传入默认文本颜色（可以传 QColor 或字符串 '#rrggbb'）
         if text_color is None:
             # 保持向后兼容的默认颜色（与原先 BRIGHT_COLORS['default'] 类似）
@@ -230,9 +237,7 @@ class TerminalScreen(QWidget):
             self.stream.feed(text)
 
             plain = _strip_ansi_sequences(text)
-            self.terminal_texts += plain
-            if len(self.terminal_texts) > self._terminal_texts_max:
-                self.terminal_texts = self.terminal_texts[-self._terminal_texts_max:]
+            self.terminal_texts.append(plain)
 
             max_rows = self._get_max_buffer_rows()
             self.scroll_offset = max(0, max_rows - self.rows)
@@ -494,51 +499,15 @@ class TerminalScreen(QWidget):
 
     def get_latest_output(self, count=1):
         """
-        Parses the last 'count' command outputs from the terminal_texts buffer.
+        Parses the last 'count' command outputs from the terminal_texts scrollback.
         Returns the result as an XML string.
         """
-        if not self.terminal_texts:
+        outputs = self.terminal_texts.latest_outputs(count)
+        if not outputs:
             return "<results></results>"
-        # 兼容 WebTerminal 的逻辑，使用正则表达式匹配常见的 Shell 提示符
-        prompt_re = re.compile(r"[\w\d\._-]+@[\w\d\.-]+:.*[#\$]")
-        lines = self.terminal_texts.splitlines()
-        prompt_indices = [i for i, line in enumerate(
-            lines) if prompt_re.search(line)]
-
         results_xml = "<results>"
-        # 至少需要两个提示符才能界定一个命令及其输出
-        num_possible_outputs = len(prompt_indices) - 1
-
-        if num_possible_outputs < 1:
-            return "<results></results>"
-
-        actual_count = min(count, num_possible_outputs)
-
-        for i in range(actual_count):
-            # 从后向前解析
-            end_prompt_index = prompt_indices[-(i + 1)]  # 当前命令执行结束后的提示符
-            start_prompt_index = prompt_indices[-(i + 2)]  # 上一个命令执行前的提示符
-
-            start_prompt_line = lines[start_prompt_index]
-            cleaned_start_line = _strip_ansi_sequences(start_prompt_line)
-
-            command = ""
-            last_hash_pos = cleaned_start_line.rfind('#')
-            last_dollar_pos = cleaned_start_line.rfind('$')
-            split_pos = max(last_hash_pos, last_dollar_pos)
-
-            # 提取命令文本 (提示符之后的内容)
-            if split_pos != -1:
-                command = cleaned_start_line[split_pos + 1:].strip()
-
-            # 提取命令输出 (从命令提示符的下一行到下一个提示符的上一行)
-            output_lines = lines[start_prompt_index + 1: end_prompt_index]
-            full_output = "\n".join(output_lines)
-            plain_output = _strip_ansi_sequences(full_output)
-
-            # 构建 XML 结果
-            results_xml += f"""<command_{i + 1}><cmd>{command}</cmd><output>{plain_output}</output></command_{i + 1}>"""
-
+        for i, (command, output) in enumerate(outputs):
+            results_xml += f"""<command_{i + 1}><cmd>{command}</cmd><output>{output}</output></command_{i + 1}>"""
         results_xml += "\n</results>"
         return results_xml
 
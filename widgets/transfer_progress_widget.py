@@ -1,8 +1,34 @@
 from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation, QEvent, pyqtSignal
 from PyQt5.QtGui import QColor, QFont
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QScrollArea, QToolTip
-from qfluentwidgets import FluentIcon as FIF, IconWidget, ToolButton
+from qfluentwidgets import FluentIcon as FIF, IconWidget, ToolButton, CheckableMenu, RoundMenu, Action, MenuIndicatorType
+from tools.bandwidth import BandwidthShaper, KB
 from tools.font_config import font_config
+from tools.setting_config import SCM
+
+# 限速菜单里的预设值（字节/秒），0 为不限速
+RATE_PRESETS = [0, 256 * KB, 1024 * KB, 5 * 1024 * KB, 10 * 1024 * KB, 50 * 1024 * KB]
+
+
+def _format_rate(rate: int) -> str:
+    if not rate:
+        return "Unlimited"
+    if rate >= 1024 * KB:
+        return f"{rate / (1024 * KB):g} MB/s"
+    return f"{rate // KB} KB/s"
+
+
+def _format_speed(rate: float) -> str:
+    if rate >= 1024 * KB:
+        return f"{rate / (1024 * KB):.1f} MB/s"
+    return f"{rate / KB:.0f} KB/s"
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
 
 
 class TransferProgressWidget(QWidget):
@@ -10,6 +36,9 @@ class TransferProgressWidget(QWidget):
     expansionChanged = pyqtSignal(bool)
     cancelRequested = pyqtSignal(str)
     open_file = pyqtSignal(str)  # file_id
+    rateLimitRequested = pyqtSignal(str, int)  # file_id, bytes per second (0 = unlimited)
+    pauseRequested = pyqtSignal(str, bool)  # file_id, pause (False = resume)
+    pauseAllRequested = pyqtSignal(bool)  # pause (False = resume) every queued transfer
 
     def __init__(self, parent=None):
         super().__init__(parent=parent)
@@ -19,6 +48,10 @@ class TransferProgressWidget(QWidget):
         self.transfer_items = {}
         self.completed_count = 0
         self.total_count = 0
+        # Session key for BandwidthShaper, set once the file manager exists
+        self.bandwidth_key = None
+        # file_id -> per-transfer limit chosen here, only for the menu check marks
+        self._task_limits = {}
 
         # Main layout
         self.main_layout = QVBoxLayout(self)
@@ -39,13 +72,32 @@ class TransferProgressWidget(QWidget):
         self.count_label = QLabel("", self.header)
         self.count_label.setObjectName("countLabel")
 
+        # 排队数量和最久等待时间，由 set_queue_stats 更新
+        self.queue_label = QLabel("", self.header)
+        self.queue_label.setObjectName("queueLabel")
+        self.queue_label.hide()
+
+        # 总速率和剩余时间，由 set_throughput 按帧更新
+        self.throughput_label = QLabel("", self.header)
+        self.throughput_label.setObjectName("throughputLabel")
+        self.throughput_label.hide()
+
         icon_widget = ToolButton(FIF.BROOM)
         icon_widget.setFixedSize(32, 32)
         icon_widget.setToolTip(self.tr("Clean finished"))
         icon_widget.clicked.connect(lambda: self.clear_completed_items())
 
+        self.speed_button = ToolButton(FIF.SPEED_HIGH)
+        self.speed_button.setFixedSize(32, 32)
+        self.speed_button.setToolTip(self.tr("Bandwidth limits and queue"))
+        self.speed_button.clicked.connect(self._show_speed_menu)
+        self._update_speed_icon()
+
         self.header_layout.addWidget(self.title_label, 0, Qt.AlignLeft)
         self.header_layout.addStretch(1)
+        self.header_layout.addWidget(self.throughput_label)
+        self.header_layout.addWidget(self.queue_label)
+        self.header_layout.addWidget(self.speed_button)
         self.header_layout.addWidget(icon_widget)
         self.header_layout.addWidget(self.count_label, 0, Qt.AlignRight)
 
@@ -204,6 +256,121 @@ class TransferProgressWidget(QWidget):
 
         self.update_transfer_item(file_id, data)
 
+    # ---------------------------
+    # Bandwidth limits
+    # ---------------------------
+    def set_bandwidth_key(self, key):
+        """Attach the session whose limit the "This session" menu changes."""
+        self.bandwidth_key = key
+        self._update_speed_icon()
+
+    def _rate_menu(self, title, current, on_pick):
+        menu = CheckableMenu(title, self, indicatorType=MenuIndicatorType.RADIO)
+        for rate in RATE_PRESETS:
+            action = Action(_format_rate(rate), checkable=True)
+            action.setChecked(rate == current)
+            action.triggered.connect(lambda _, r=rate: on_pick(r))
+            menu.addAction(action)
+        return menu
+
+    def _show_speed_menu(self):
+        shaper = BandwidthShaper()
+        menu = CheckableMenu(parent=self)
+        menu.addMenu(self._rate_menu(
+            self.tr("All transfers"), shaper.global_limit(), self._set_global_limit))
+        if self.bandwidth_key:
+            menu.addMenu(self._rate_menu(
+                self.tr("This session"), shaper.session_limit(self.bandwidth_key),
+                lambda rate: (shaper.set_session_limit(self.bandwidth_key, rate), self._update_speed_icon())))
+        menu.addSeparator()
+        interactive = Action(FIF.COMMAND_PROMPT, self.tr(
+            "Slow down while typing in the terminal"), checkable=True)
+        interactive.setChecked(shaper.interactive_priority)
+        interactive.triggered.connect(self._set_interactive_priority)
+        menu.addAction(interactive)
+        menu.addSeparator()
+        pause_all = Action(FIF.PAUSE, self.tr("Pause queued transfers"))
+        pause_all.triggered.connect(lambda: self.pauseAllRequested.emit(True))
+        resume_all = Action(FIF.PLAY, self.tr("Resume queued transfers"))
+        resume_all.triggered.connect(lambda: self.pauseAllRequested.emit(False))
+        menu.addActions([pause_all, resume_all])
+        menu.exec_(self.speed_button.mapToGlobal(
+            self.speed_button.rect().bottomLeft()))
+
+    def _set_global_limit(self, rate):
+        BandwidthShaper().set_global_limit(rate)
+        SCM().revise_config("transfer_rate_limit_kb", rate // KB)
+        self._update_speed_icon()
+
+    def _set_interactive_priority(self, checked):
+        BandwidthShaper().set_interactive_priority(checked)
+        SCM().revise_config("transfer_interactive_priority", checked)
+
+    def _update_speed_icon(self):
+        shaper = BandwidthShaper()
+        limited = shaper.global_limit() or (
+            self.bandwidth_key and shaper.session_limit(self.bandwidth_key))
+        self.speed_button.setIcon(FIF.SPEED_MEDIUM if limited else FIF.SPEED_HIGH)
+
+    def _show_item_menu(self, file_id, pos):
+        def pick(rate):
+            self._task_limits[file_id] = rate
+            self.rateLimitRequested.emit(file_id, rate)
+
+        item_widget = self.transfer_items[file_id]
+        menu = RoundMenu(parent=self)
+        paused = bool(item_widget.property("paused"))
+        if paused or (item_widget.property("last_data") or {}).get("progress") == -1:
+            # 只有还在排队的任务能暂停
+            action = Action(FIF.PLAY if paused else FIF.PAUSE,
+                            self.tr("Resume") if paused else self.tr("Pause"))
+            action.triggered.connect(
+                lambda: self.pauseRequested.emit(file_id, not paused))
+            menu.addAction(action)
+        menu.addMenu(self._rate_menu(self.tr("Limit this transfer"),
+                                     self._task_limits.get(file_id, 0), pick))
+        menu.exec_(pos)
+
+    def set_item_paused(self, file_id, paused):
+        item_widget = self.transfer_items.get(file_id)
+        if not item_widget:
+            return
+        item_widget.setProperty("paused", paused)
+        last_data = item_widget.property("last_data")
+        if last_data:
+            self.update_transfer_item(file_id, last_data)
+
+    def set_queue_stats(self, queued, oldest_wait):
+        """Show how many transfers wait for a free slot and for how long."""
+        if queued <= 0:
+            self.queue_label.hide()
+            return
+        self.queue_label.setText(
+            self.tr("{0} queued, {1:.0f}s").format(queued, oldest_wait))
+        self.queue_label.show()
+
+    def set_throughput(self, rate, eta):
+        """Show the overall transfer rate and ETA; hidden when nothing moves."""
+        if rate <= 0:
+            self.throughput_label.hide()
+            return
+        text = _format_speed(rate)
+        if eta >= 0:
+            text += f" · {_format_eta(eta)}"
+        self.throughput_label.setText(text)
+        self.throughput_label.show()
+
+    def update_transfer_items(self, items: dict):
+        """Apply one frame of updates ({file_id: data}) with a single repaint."""
+        if not items:
+            return
+        self.scroll_content.setUpdatesEnabled(False)
+        try:
+            for file_id, data in items.items():
+                self.update_transfer_item(file_id, data)
+        finally:
+            self.scroll_content.setUpdatesEnabled(True)
+
     def stop_transmission(self, file_id):
         if file_id:
             self.cancelRequested.emit(file_id)
@@ -240,10 +407,17 @@ class TransferProgressWidget(QWidget):
                 # Convert bytes to MB and format the string
                 transferred_mb = bytes_so_far / (1024 * 1024)
                 total_mb = total_bytes / (1024 * 1024)
-                filename_label.setText(
-                    f"{filename} ({transferred_mb:.2f}/{total_mb:.2f} MB)")
+                details = f"{transferred_mb:.2f}/{total_mb:.2f} MB"
+                if data.get("rate"):
+                    details += f", {_format_speed(data['rate'])}"
+                    if data.get("eta", -1) >= 0:
+                        details += f", {_format_eta(data['eta'])}"
+                filename_label.setText(f"{filename} ({details})")
             elif filename:
                 filename_label.setText(filename)
+            if item_widget.property("paused"):
+                filename_label.setText(
+                    f"{filename_label.text()} ({self.tr('Paused')})")
             item_widget.setToolTip(filename_label.text())
 
         # --- Update widgets based on transfer type ---
@@ -358,6 +532,7 @@ class TransferProgressWidget(QWidget):
         # print(
         #     f"Called from {caller_func_name} in {caller_filename}:{caller_line_no}")
         item_widget = self.transfer_items.pop(file_id, None)
+        self._task_limits.pop(file_id, None)
         if item_widget:
             if item_widget.property("is_completed"):
                 self.completed_count -= 1
@@ -395,6 +570,13 @@ class TransferProgressWidget(QWidget):
             cancel_icon = obj.findChild(ToolButton, "cancelIcon")
             open_folder_icon = obj.findChild(ToolButton, "openFolderIcon")
 
+            if event.type() == QEvent.ContextMenu:
+                file_id = next(
+                    (fid for fid, widget in self.transfer_items.items() if widget == obj), None)
+                if file_id and not obj.property("is_completed"):
+                    self._show_item_menu(file_id, event.globalPos())
+                return True
+
             if event.type() == QEvent.Enter:
                 if progress_label:
                     progress_label.hide()
@@ -436,6 +618,10 @@ class TransferProgressWidget(QWidget):
                 background-color: transparent;
                 border-bottom: 1px solid #444444;
             }
+            #queueLabel, #throughputLabel {
+                color: #A0A0A0;
+                background-color: transparent;
+            }
             #titleLabel, #countLabel {
                 font-size: 14px;
                 font-weight: bold;